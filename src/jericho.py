@@ -1,7 +1,10 @@
 from constants import MESSAGE_PROVIDER, STATE, SETTINGS
 
+import asyncio
+import math
 import discord
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from discord import app_commands
 from discord import ui
 from discord import ButtonStyle
@@ -11,21 +14,153 @@ from discord import Interaction
 from discord.utils import get
 import random
 from warframe import WarframeAPI
-from logging import info
+from utils.http import HttpCache
+from logging import info, error
 from message_provider import MessageProvider
 from pet_counter import update_pet_count
-from sources import WeaponLookup, WarframeWiki, RivenRecommendationProvider
-
+from sources import (
+    WarframeWiki,
+    RivenRecommendationProvider,
+    WeaponCache,
+    get_wiki_parser,
+    save_snapshot,
+    load_snapshot,
+    DataStore,
+    HistoryMetric,
+    RivenHistory,
+    RivenTrend,
+    StoreDelta,
+    StoreRows,
+    store_rows,
+    WeaponAttribute,
+    WeaponLookup,
+    WeaponQuery,
+)
+from model.weapon import Weapon, WeaponModType
+from typing import Optional
+from datetime import date
+
+from refresh import DataGeneration, RefreshCoordinator
+from scheduler import RefreshScheduler
+from sources.riven_history import week_of
+from settings import DEFAULT_REFRESH_SCHEDULE
 from ui import RoleView
 
 discord.utils.setup_logging()
 
-WARFRAME_API = WarframeAPI()
-WEAPON_LOOKUP = WeaponLookup()
-WARFRAME_WIKI = WarframeWiki(weapon_lookup=WEAPON_LOOKUP)
-RIVEN_PROVIDER = RivenRecommendationProvider()
+HTTP_CACHE = HttpCache(SETTINGS.HTTP_CACHE_PATH) if SETTINGS.HTTP_CACHE_ENABLED else None
+WARFRAME_API = WarframeAPI(http_cache=HTTP_CACHE)
+WEAPON_CACHE = WeaponCache(
+    SETTINGS.WIKI_CACHE_PATH,
+    ttl=SETTINGS.WIKI_CACHE_TTL,
+    max_entries=SETTINGS.WIKI_CACHE_MAX_ENTRIES,
+)
+PARSER_EXECUTOR = (
+    ProcessPoolExecutor(max_workers=SETTINGS.WIKI_PARSER_WORKERS)
+    if SETTINGS.WIKI_PARSER_PROCESSES
+    else ThreadPoolExecutor(
+        max_workers=SETTINGS.WIKI_PARSER_WORKERS, thread_name_prefix="wiki-parser"
+    )
+)
+WIKI_PARSER = get_wiki_parser(SETTINGS.WIKI_PARSER_BACKEND)
+# Shared by all data generations, so unchanged sheets are not parsed again on a refresh
+RIVEN_PROVIDER = RivenRecommendationProvider(
+    http_cache=HTTP_CACHE, executor=PARSER_EXECUTOR
+)
+
+
+def warm_start() -> tuple[Optional[WeaponLookup], dict[str, Weapon]]:
+    """
+    Load the lookup and wiki data of the last run, preferring the data store over the lookup snapshot
+    """
+    store = DataStore.open(SETTINGS.DATA_STORE_PATH, read_only=True)
+    if store is None:
+        return load_snapshot(SETTINGS.LOOKUP_SNAPSHOT_PATH), {}
+    try:
+        weapon_lookup = store.load_lookup()
+        if weapon_lookup is None:
+            return load_snapshot(SETTINGS.LOOKUP_SNAPSHOT_PATH), {}
+        RIVEN_PROVIDER.restore(store.load_sheets())
+        info(
+            f"Loaded {len(weapon_lookup)} weapons from generation {store.generation()} of the data store"
+        )
+        return weapon_lookup, store.load_weapons()
+    finally:
+        store.close()
+
+
+def load_riven_history() -> RivenHistory:
+    # Opened for writing, so a store of an older schema is migrated with its history kept
+    # instead of being ignored until the next refresh saves it
+    store = DataStore.open(SETTINGS.DATA_STORE_PATH)
+    if store is None:
+        return RivenHistory()
+    try:
+        history = store.load_history()
+        info(f"Loaded {len(history)} weeks of riven price and disposition history")
+        return history
+    finally:
+        store.close()
+
+
+def record_riven_history(
+    data: DataGeneration,
+) -> tuple[date, dict[HistoryMetric, dict[str, float]]]:
+    """
+    Record the median prices and dispositions of the generation as this week's snapshot
+    """
+    week = week_of(date.today())
+    snapshot = {
+        HistoryMetric.Price: {
+            name: record.median_plat_price
+            for name, record in data.weapon_lookup.weapon_lookup.items()
+            if record.median_plat_price is not None
+        },
+        HistoryMetric.Disposition: {
+            name: weapon.riven_disposition.disposition
+            for name, weapon in data.warframe_wiki.known_weapons().items()
+            if weapon.riven_disposition.known
+        },
+    }
+    for metric, values in snapshot.items():
+        RIVEN_HISTORY.record(week, metric, values)
+    return week, snapshot
+
+
+def save_data_store(
+    rows: StoreRows,
+    history_week: date,
+    history_snapshot: dict[HistoryMetric, dict[str, float]],
+) -> StoreDelta:
+    store = DataStore(SETTINGS.DATA_STORE_PATH)
+    try:
+        delta = store.save_rows(rows)
+        store.save_history(history_week, history_snapshot)
+        return delta
+    finally:
+        store.close()
+
+
+WARM_LOOKUP, WARM_WEAPON_DATA = warm_start()
+RIVEN_HISTORY = load_riven_history()
+DATA = RefreshCoordinator(
+    build_wiki=lambda weapon_lookup: WarframeWiki(
+        weapon_lookup=weapon_lookup,
+        cache=WEAPON_CACHE,
+        executor=PARSER_EXECUTOR,
+        parser=WIKI_PARSER,
+        http_cache=HTTP_CACHE,
+    ),
+    build_riven_provider=lambda: RIVEN_PROVIDER,
+    warframe_api=WARFRAME_API,
+    weapon_lookup=WARM_LOOKUP,
+)
+# Wiki data of the last run, served until the first refresh loads the data modules again
+DATA.current.warframe_wiki.weapon_data = WARM_WEAPON_DATA
 
 
+REFRESH_TASK = None
+
 pet_cooldowns = {}
 COOLDOWN_TIME = 10
 
@@ -38,32 +173,99 @@ tree = app_commands.CommandTree(client)
 
 
 async def refresh():
-    global WEAPON_LOOKUP
-    global WARFRAME_WIKI
-    global RIVEN_PROVIDER
-
     info("Refreshing Data...")
-    WEAPON_LOOKUP = WeaponLookup()
-    WARFRAME_WIKI = WarframeWiki(weapon_lookup=WEAPON_LOOKUP)
-    await WARFRAME_WIKI.refresh()
-    RIVEN_PROVIDER = RivenRecommendationProvider()
-    await RIVEN_PROVIDER.refresh(WEAPON_LOOKUP, force_download=True)
-    await WARFRAME_API.get_median_prices(WEAPON_LOOKUP)
-    WEAPON_LOOKUP.rebuild_weapon_relations()
+    previous = DATA.current
+    data = await DATA.refresh()
     info("Data Refreshed!")
+    query_cache = previous.weapon_lookup.stats()["query_cache"]
+    info(
+        f"Search cache of generation {previous.number}: {query_cache['hits']} hits, {query_cache['misses']} misses ({query_cache['hit_rate']:.0%})"
+    )
+
+    try:
+        save_snapshot(data.weapon_lookup, SETTINGS.LOOKUP_SNAPSHOT_PATH)
+    except OSError as e:
+        error(f"Failed to save the weapon lookup snapshot: {e}")
+    try:
+        # Recorded and copied on the event loop, commands and lookups change the live state
+        # concurrently. Only the SQL writes of the copies run in a thread.
+        week, snapshot = record_riven_history(data)
+        rows = store_rows(
+            data.weapon_lookup,
+            data.warframe_wiki.known_weapons(),
+            RIVEN_PROVIDER.parsed_sheets.values(),
+        )
+        delta = await asyncio.to_thread(save_data_store, rows, week, snapshot)
+        info(
+            f"Saved data store generation {delta.generation} in {delta.duration * 1000:.0f}ms, changed rows: {delta.written}"
+        )
+    except Exception as e:
+        error(f"Failed to save the data store: {e}")
+
+    if SETTINGS.WIKI_PREFETCH:
+        report = await data.warframe_wiki.prefetch(
+            concurrency=SETTINGS.WIKI_PREFETCH_CONCURRENCY
+        )
+        info(
+            f"Prefetched {report.fetched}/{report.total} weapons in {report.duration:.1f}s"
+        )
+    return data
+
+
+async def refresh_weapons():
+    await refresh()
+    # A new generation comes with fresh riven recommendations and prices
+    SCHEDULER.mark_fresh("rivens")
+    SCHEDULER.mark_fresh("prices")
+
+
+async def refresh_messages():
+    global MESSAGE_PROVIDER
+    MESSAGE_PROVIDER = await asyncio.to_thread(
+        MessageProvider.from_gsheets, SETTINGS.GOOGLE_SHEET_MESSAGEPROVIDER_ID
+    )
+
+
+SCHEDULER = RefreshScheduler(
+    jitter=SETTINGS.REFRESH_JITTER, retry_delay=SETTINGS.REFRESH_RETRY_DELAY
+)
+REFRESH_SOURCES = {
+    "weapons": refresh_weapons,
+    "rivens": DATA.refresh_rivens,
+    "prices": DATA.refresh_prices,
+    "messages": refresh_messages,
+}
+for name in SETTINGS.REFRESH_SCHEDULE.keys() - REFRESH_SOURCES.keys():
+    error(f"Unknown data source `{name}` in the refresh schedule")
+for name, refresh_source in REFRESH_SOURCES.items():
+    cadence = SETTINGS.REFRESH_SCHEDULE.get(name, DEFAULT_REFRESH_SCHEDULE[name])
+    SCHEDULER.add(name, refresh_source, cadence.interval, cadence.staleness_budget)
+# The messages were just loaded on import
+SCHEDULER.mark_fresh("messages")
 
 
 @client.event
 async def on_ready():
+    global REFRESH_TASK
     await tree.sync(guild=discord.Object(id=SETTINGS.GUILD_ID))
     info(f"Logged in as {client.user}!")
-    await refresh()
+    if REFRESH_TASK is not None:
+        # Reconnected, the scheduler is already running
+        return
+    elif len(DATA.current.weapon_lookup) > 0:
+        # Serve commands from the data store or snapshot while the data is refreshed
+        REFRESH_TASK = asyncio.create_task(SCHEDULER.run_now("weapons"))
+    else:
+        await SCHEDULER.run_now("weapons")
+    SCHEDULER.start()
 
 
 async def weapon_autocomplete(
     interaction: Interaction, current: str, can_have_rivens: bool = False
 ):
-    matches = WEAPON_LOOKUP.fuzzy_search(current, n=25, can_have_rivens=can_have_rivens)
+    matches = DATA.current.weapon_lookup.autocomplete(
+        current, n=25, can_have_rivens=can_have_rivens
+    )
     choices = [
         Choice(name=weapon.display_name, value=weapon.display_name)
         for weapon in matches
@@ -435,13 +637,24 @@ async def smooch(interaction: discord.Interaction):
 )
 async def weapon_look_up(interaction: discord.Interaction, weapon_name: str):
     """Look up riven stats for a given weapon."""
-    if weapon_name not in WEAPON_LOOKUP:
-        await interaction.response.send_message(
-            MESSAGE_PROVIDER("WEAPON_NOT_FOUND", weaponname=weapon_name), ephemeral=True
+    # Stick to one data generation, even if a refresh finishes while waiting for the wiki
+    data = DATA.current
+    if weapon_name not in data.weapon_lookup:
+        suggestions = [
+            weapon.display_name
+            for weapon in data.weapon_lookup.typo_search(weapon_name, max_distance=2, n=3)
+        ]
+        # The template of the suggestions renders the list of display names itself
+        message = MESSAGE_PROVIDER(
+            "WEAPON_NOT_FOUND_SUGGESTIONS" if suggestions else "WEAPON_NOT_FOUND",
+            weaponname=weapon_name,
+            suggestions=suggestions,
         )
+        await interaction.response.send_message(message, ephemeral=True)
         return
 
-    weapon = WEAPON_LOOKUP[weapon_name]
+    weapon = data.weapon_lookup[weapon_name]
+    data.weapon_lookup.record_lookup(weapon.normalized_name)
     if not weapon.riven_recommendations:
         await interaction.response.send_message(
             MESSAGE_PROVIDER("WEAPON_NO_RIVEN", weaponname=weapon.display_name),
@@ -449,7 +662,7 @@ async def weapon_look_up(interaction: discord.Interaction, weapon_name: str):
         )
         return
 
-    wiki_data = await WARFRAME_WIKI.weapon(weapon.normalized_name)
+    wiki_data = await data.warframe_wiki.weapon(weapon.normalized_name)
     if not wiki_data:
         await interaction.response.send_message(
             MESSAGE_PROVIDER("WEAPON_NO_WIKI", weaponname=weapon.display_name),
@@ -457,17 +670,12 @@ async def weapon_look_up(interaction: discord.Interaction, weapon_name: str):
         )
         return
 
-    base_weapon = weapon if weapon.is_base_weapon else WEAPON_LOOKUP[weapon.base_weapon]
-
-    weapon_variants = []
-    if base_weapon.weapon_variants:
-        weapon_variants = [WEAPON_LOOKUP[v] for v in base_weapon.weapon_variants] + [
-            base_weapon
-        ]
+    base_weapon = (
+        weapon if weapon.is_base_weapon else data.weapon_lookup[weapon.base_weapon]
+    )
 
-        weapon_variants = sorted(
-            weapon_variants, key=lambda w: (len(w.display_name), w.display_name)
-        )
+    # Already sorted for display, shortest names first
+    weapon_variants = data.weapon_lookup.weapon_family(base_weapon.normalized_name)
 
     embed = discord.Embed()
     embed.title = weapon.display_name
@@ -520,7 +728,7 @@ async def weapon_look_up(interaction: discord.Interaction, weapon_name: str):
         weapon_variants_text = ""
         for w in weapon_variants:
             weapon_variants_text += (
-                f"- [{w.display_name}]({WARFRAME_WIKI.base_url + w.wiki_url})\n"
+                f"- [{w.display_name}]({data.warframe_wiki.base_url + w.wiki_url})\n"
             )
 
         embed.add_field(
@@ -663,6 +871,168 @@ class RivenHelpView(View):
         )
 
 
+@tree.command(
+    name="weapon_search",
+    description=MESSAGE_PROVIDER("WEAPON_SEARCH_DESC"),
+    guild=discord.Object(SETTINGS.GUILD_ID),
+)
+@app_commands.describe(
+    mod_type="Only weapons using this riven type",
+    min_disposition="Lowest riven disposition, e.g. 1.3",
+    max_disposition="Highest riven disposition",
+    min_mr="Lowest mastery rank requirement",
+    max_mr="Highest mastery rank requirement",
+    min_price="Lowest median riven price in platinum",
+    max_price="Highest median riven price in platinum",
+    order_by="What to sort the weapons by, highest first",
+    ascending="Sort lowest first instead",
+)
+async def weapon_search(
+    interaction: discord.Interaction,
+    mod_type: WeaponModType = None,
+    min_disposition: float = None,
+    max_disposition: float = None,
+    min_mr: int = None,
+    max_mr: int = None,
+    min_price: float = None,
+    max_price: float = None,
+    order_by: WeaponAttribute = WeaponAttribute.Disposition,
+    ascending: bool = False,
+):
+    """Find weapons by riven type, disposition, mastery rank and median price."""
+    query = WeaponQuery(
+        mod_type=mod_type,
+        min_disposition=min_disposition,
+        max_disposition=max_disposition,
+        min_mr=min_mr,
+        max_mr=max_mr,
+        min_price=min_price,
+        max_price=max_price,
+        order_by=order_by,
+        descending=not ascending,
+        limit=20,
+    )
+    data = DATA.current
+    results = data.query_engine().search(query)
+    if not results:
+        await interaction.response.send_message(
+            MESSAGE_PROVIDER("WEAPON_SEARCH_EMPTY"), ephemeral=True
+        )
+        return
+
+    lines = []
+    for result in results:
+        details = []
+        if result.disposition is not None:
+            details.append(f"{result.disposition}x")
+        if result.mr is not None:
+            details.append(f"MR {result.mr}")
+        if result.median_plat_price is not None:
+            details.append(f"{result.median_plat_price:g}p")
+        url = data.warframe_wiki.base_url + result.weapon.wiki_url
+        lines.append(f"- [{result.weapon.display_name}]({url}): {', '.join(details)}")
+
+    embed = discord.Embed()
+    embed.title = MESSAGE_PROVIDER("WEAPON_SEARCH_TITLE")
+    embed.description = "\n".join(lines)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+def render_trend(data: DataGeneration, trend: RivenTrend, metric: HistoryMetric) -> str:
+    name = (
+        data.weapon_lookup[trend.weapon].display_name
+        if trend.weapon in data.weapon_lookup
+        else trend.weapon
+    )
+    unit = "p" if metric == HistoryMetric.Price else "x"
+    line = f"**{name}**: {trend.previous:g}{unit} → {trend.current:g}{unit}"
+    if trend.relative_change is not None:
+        line += f" ({trend.relative_change:+.0%})"
+    return line
+
+
+@tree.command(
+    name="riven_trends",
+    description=MESSAGE_PROVIDER("RIVEN_TRENDS_DESC"),
+    guild=discord.Object(SETTINGS.GUILD_ID),
+)
+@app_commands.describe(
+    weapon_name="Show the history of this weapon instead of the biggest movers",
+    metric="Median riven prices or riven dispositions",
+    weeks="Compare with this many weeks ago",
+)
+async def riven_trends(
+    interaction: discord.Interaction,
+    weapon_name: Optional[str] = None,
+    metric: HistoryMetric = HistoryMetric.Price,
+    weeks: app_commands.Range[int, 1, 52] = 1,
+):
+    """Show how riven prices and dispositions changed over the last weeks."""
+    if len(RIVEN_HISTORY) <= weeks:
+        await interaction.response.send_message(
+            MESSAGE_PROVIDER("RIVEN_TRENDS_EMPTY", weeks=weeks), ephemeral=True
+        )
+        return
+
+    data = DATA.current
+    embed = discord.Embed()
+    if weapon_name is None:
+        embed.title = MESSAGE_PROVIDER("RIVEN_TRENDS_TITLE", weeks=weeks)
+        for name, rising in (("Rising", True), ("Falling", False)):
+            movers = RIVEN_HISTORY.top_movers(metric, count=10, weeks=weeks, rising=rising)
+            embed.add_field(
+                name=name,
+                value="\n".join(render_trend(data, trend, metric) for trend in movers)
+                or "-",
+                inline=True,
+            )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    if weapon_name not in data.weapon_lookup:
+        await interaction.response.send_message(
+            MESSAGE_PROVIDER("WEAPON_NOT_FOUND", weaponname=weapon_name), ephemeral=True
+        )
+        return
+    weapon = data.weapon_lookup[weapon_name]
+    # Prices are tracked for the base weapon, dispositions for every variant
+    name = weapon.normalized_name
+    if metric == HistoryMetric.Price and not weapon.is_base_weapon:
+        name = data.weapon_lookup[weapon.base_weapon].normalized_name
+    if name not in RIVEN_HISTORY.weapon_ids:
+        await interaction.response.send_message(
+            MESSAGE_PROVIDER("RIVEN_TRENDS_NO_HISTORY", weaponname=weapon.display_name),
+            ephemeral=True,
+        )
+        return
+
+    trend = RIVEN_HISTORY.trend(name, metric, weeks)
+    unit = "p" if metric == HistoryMetric.Price else "x"
+    window = SETTINGS.RIVEN_TRENDS_MEDIAN_WEEKS
+    rolling_median = RIVEN_HISTORY.rolling_median(metric, window, recent=1)[
+        -1, RIVEN_HISTORY.weapon_ids[name]
+    ]
+    embed.title = weapon.display_name
+    lines = []
+    if trend is not None:
+        lines.append(render_trend(data, trend, metric))
+    if not math.isnan(rolling_median):
+        lines.append(f"**{window} Week Median**: {rolling_median:g}{unit}")
+    history = [
+        f"{week.isoformat()}: {value:g}{unit}"
+        for week, value in zip(RIVEN_HISTORY.weeks, RIVEN_HISTORY.series(name, metric))
+        if not math.isnan(value)
+    ]
+    embed.description = "\n".join(lines)
+    embed.add_field(name="History", value="\n".join(history[-12:]) or "-", inline=False)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+@riven_trends.autocomplete("weapon_name")
+async def autocomplete_trend_weapon_name(interaction: Interaction, current: str):
+    return await weapon_autocomplete(interaction, current, can_have_rivens=True)
+
+
 @tree.command(
     name="riven_help",
     description=MESSAGE_PROVIDER("RIVEN_HELP_DESC"),
@@ -685,6 +1055,7 @@ async def text_maintenance(interaction: discord.Interaction):
         try:
             global MESSAGE_PROVIDER
             MESSAGE_PROVIDER = MessageProvider.from_gsheets(SETTINGS.GOOGLE_SHEET_MESSAGEPROVIDER_ID)
+            SCHEDULER.mark_fresh("messages")
             await interaction.response.send_message(
                 MESSAGE_PROVIDER("MAINTENANCE_INI"), ephemeral=True
             )
@@ -707,6 +1078,47 @@ async def text_maintenance(interaction: discord.Interaction):
         )
 
 
+def render_time(timestamp: Optional[float]) -> str:
+    return f"<t:{int(timestamp)}:R>" if timestamp is not None else "never"
+
+
+@tree.command(
+    name="maintenance_status",
+    description=MESSAGE_PROVIDER("MAINTENANCE_STATUS_DESC"),
+    guild=discord.Object(SETTINGS.GUILD_ID),
+)
+async def maintenance_status(interaction: discord.Interaction):
+    if not any(
+        role.id == SETTINGS.MAINTENANCE_ROLE_ID for role in interaction.user.roles
+    ):
+        await interaction.response.send_message(
+            MESSAGE_PROVIDER(
+                "MAINTENANCE_DENIED", user=interaction.user.display_name
+            ),
+            ephemeral=True,
+        )
+        return
+
+    data = DATA.current
+    embed = discord.Embed()
+    embed.title = "Data Sources"
+    embed.description = f"Serving data generation {data.number}, built {render_time(data.built_at)} with {len(data.weapon_lookup)} weapons"
+    for status in SCHEDULER.status():
+        lines = [
+            f"**Last success**: {render_time(status.last_success)}",
+            f"**Next run**: {'running now' if status.running else render_time(status.next_run)}",
+        ]
+        if status.last_duration is not None:
+            lines.append(f"**Duration**: {status.last_duration:.1f}s")
+        if status.failures:
+            lines.append(f"**Failures**: {status.failures}, last: {status.last_error}")
+        stale = " (stale)" if status.is_stale() else ""
+        embed.add_field(
+            name=f"{status.name}{stale}", value="\n".join(lines), inline=False
+        )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
 @tree.command(
     name="maintenance_riven",
     description=MESSAGE_PROVIDER("MAINTENANCE_RIVEN_DESC"),
@@ -728,12 +1140,21 @@ async def riven_maintenance(interaction: discord.Interaction):
                 info("Failed to send maintenance message.")
                 return
 
-            # Perform the update
-            await refresh()
+            # Only the sheets, the rest of the data is refreshed in the background
+            if not await SCHEDULER.run_now("rivens"):
+                raise RuntimeError(SCHEDULER.sources["rivens"].status.last_error)
+            data = DATA.current
 
             info("Riven update completed successfully.")
+            changed_sheets = [
+                report.sheet
+                for report in data.riven_provider.last_report
+                if report.changed
+            ]
             await maintenance_message.edit(
-                content=MESSAGE_PROVIDER("MAINTENANCE_RIVEN_SUCCESS")
+                content=MESSAGE_PROVIDER(
+                    "MAINTENANCE_RIVEN_SUCCESS", changed_sheets=changed_sheets
+                )
             )
 
         except discord.errors.NotFound as e:
@@ -1,4 +1,5 @@
 from enum import Enum
+from functools import lru_cache
 from pydantic import BaseModel
 from .weapon import WeaponModType
 from typing import NamedTuple, Optional
@@ -69,11 +70,13 @@ class RivenEffect(str, Enum):
 
     @classmethod
     def try_parse(cls, value: str) -> "RivenEffect":
-        upper_value = value.upper().strip()
-        for effect in cls:
-            if effect.name == upper_value:
-                return effect
-        raise ValueError(f"Invalid RivenEffect: {value}")
+        """
+        Parse an abbreviation, long name or alias of a single effect, e.g. `CC`, `Critical Chance` or `AS`
+        """
+        effects = RIVEN_EFFECT_TOKENS.get(value.upper().strip())
+        if effects is None or len(effects) != 1:
+            raise ValueError(f"Invalid RivenEffect: {value}")
+        return effects[0]
 
     def render(self, weapon_type: WeaponModType) -> str:
         """
@@ -138,6 +141,59 @@ class RivenEffect(str, Enum):
             return with_disposition * 0.9, with_disposition * 1.1
 
 
+# Tokens used by the riven sheets besides the abbreviations and long names
+RIVEN_EFFECT_ALIASES: dict[str, tuple[RivenEffect, ...]] = {
+    "AS": (RivenEffect.FR,),
+    "RECOIL": (RivenEffect.REC,),
+    # Any of the elements is fine
+    "ELEMENT": (RivenEffect.ELEC, RivenEffect.TOX, RivenEffect.HEAT, RivenEffect.COLD),
+}
+
+
+def _build_token_table() -> dict[str, tuple[RivenEffect, ...]]:
+    """
+    Map every upper case token to the effects it stands for: the abbreviation,
+    the long name, each alternative of long names like `Fire Rate / Attack Speed` and the aliases
+    """
+    tokens: dict[str, tuple[RivenEffect, ...]] = {}
+
+    def add(token: str, effects: tuple[RivenEffect, ...]):
+        existing = tokens.setdefault(token, effects)
+        if existing != effects:
+            raise ValueError(f"Riven effect token `{token}` is ambiguous")
+
+    for effect in RivenEffect:
+        add(effect.name, (effect,))
+        add(effect.value.upper(), (effect,))
+        for alternative in effect.value.split(" / "):
+            add(alternative.upper(), (effect,))
+    for alias, effects in RIVEN_EFFECT_ALIASES.items():
+        add(alias, effects)
+    return tokens
+
+
+RIVEN_EFFECT_TOKENS = _build_token_table()
+
+
+@lru_cache(maxsize=4096)
+def parse_riven_effects(raw_stats: str) -> tuple[tuple[RivenEffect, ...], tuple[str, ...]]:
+    """
+    Parse `/` separated effect tokens like `CC/CD/-ZOOM`, ignoring the sign of negatives.
+    Returns the effects and the tokens that could not be parsed. Sheets repeat the same
+    stat strings over and over, so whole strings are memoized.
+    """
+    effects: list[RivenEffect] = []
+    unknown: list[str] = []
+    for token in raw_stats.upper().split("/"):
+        token = token.strip().removeprefix("-").strip()
+        parsed = RIVEN_EFFECT_TOKENS.get(token)
+        if parsed is None:
+            unknown.append(token)
+        else:
+            effects.extend(parsed)
+    return tuple(effects), tuple(unknown)
+
+
 class RivenAttribute(BaseModel):
     effect: RivenEffect
     prefix: str
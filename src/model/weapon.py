@@ -32,6 +32,8 @@ class WeaponModType(str, Enum):
 class RivenDisposition(BaseModel):
     disposition: float = 0.5  # Default min value
     symbol: str = "●○○○○"
+    # False for the placeholder of pages without a disposition, it must not be indexed or recorded
+    known: bool = True
 
 
 class Weapon(BaseModel):
@@ -0,0 +1,132 @@
+from sources import (
+    WarframeWiki,
+    RivenRecommendationProvider,
+    WeaponLookup,
+    WeaponQueryEngine,
+)
+from utils.http import SingleFlight
+from warframe import WarframeAPI
+from logging import info
+from typing import Callable, Optional
+import asyncio
+import time
+
+
+class DataGeneration:
+    """
+    A complete and consistent set of the data commands are served from
+    """
+
+    def __init__(
+        self,
+        number: int,
+        weapon_lookup: WeaponLookup,
+        warframe_wiki: WarframeWiki,
+        riven_provider: RivenRecommendationProvider,
+    ):
+        self.number = number
+        self.weapon_lookup = weapon_lookup
+        self.warframe_wiki = warframe_wiki
+        self.riven_provider = riven_provider
+        self.built_at = time.time()
+        self._query_engine: Optional[WeaponQueryEngine] = None
+        self._query_engine_version: Optional[tuple[int, int]] = None
+
+    def query_engine(self) -> WeaponQueryEngine:
+        """
+        Return the attribute query engine, rebuilt only after the lookup or the wiki data changed
+        """
+        version = (self.weapon_lookup.generation, self.warframe_wiki.generation)
+        if self._query_engine is None or self._query_engine_version != version:
+            self._query_engine = WeaponQueryEngine(
+                self.weapon_lookup, self.warframe_wiki.known_weapons()
+            )
+            self._query_engine_version = version
+        return self._query_engine
+
+
+class RefreshCoordinator:
+    """
+    Builds new data generations on the side and publishes them with a single swap.
+    Readers should take `current` once per command, they keep seeing the old generation until the new one is complete.
+    Full refreshes and the price and riven refreshes never overlap: they share the riven provider
+    and its sheet files, and a partial refresh must not change a generation that is being replaced.
+    """
+
+    def __init__(
+        self,
+        build_wiki: Callable[[WeaponLookup], WarframeWiki],
+        build_riven_provider: Callable[[], RivenRecommendationProvider],
+        warframe_api: WarframeAPI,
+        weapon_lookup: Optional[WeaponLookup] = None,
+    ):
+        self.build_wiki = build_wiki
+        self.build_riven_provider = build_riven_provider
+        self.warframe_api = warframe_api
+        self.single_flight = SingleFlight()
+        # Held by every refresh, see the class docstring
+        self.lock = asyncio.Lock()
+
+        weapon_lookup = weapon_lookup if weapon_lookup is not None else WeaponLookup()
+        self.current = DataGeneration(
+            0, weapon_lookup, build_wiki(weapon_lookup), build_riven_provider()
+        )
+
+    async def build(self) -> DataGeneration:
+        """
+        Build a new generation from scratch without touching the current one
+        """
+        weapon_lookup = WeaponLookup()
+        weapon_lookup.popularity = self.current.weapon_lookup.popularity
+        warframe_wiki = self.build_wiki(weapon_lookup)
+        await warframe_wiki.refresh()
+        riven_provider = self.build_riven_provider()
+        await riven_provider.refresh(weapon_lookup, force_download=True)
+        await self.warframe_api.get_median_prices(weapon_lookup)
+        weapon_lookup.rebuild_weapon_relations()
+        return DataGeneration(
+            self.current.number + 1, weapon_lookup, warframe_wiki, riven_provider
+        )
+
+    async def _refresh(self) -> DataGeneration:
+        async with self.lock:
+            start = time.perf_counter()
+            generation = await self.build()
+            self.current = generation
+        info(
+            f"Published data generation {generation.number} with {len(generation.weapon_lookup)} weapons in {time.perf_counter() - start:.1f}s"
+        )
+        return generation
+
+    async def refresh(self) -> DataGeneration:
+        """
+        Build and publish a new generation. Concurrent calls share the same build.
+        If the build fails, the current generation stays in place.
+        """
+        return await self.single_flight.do("refresh", self._refresh)
+
+    async def refresh_prices(self) -> DataGeneration:
+        """
+        Update the median prices of the current generation in place.
+        All prices are set at once after the download, readers never see a mix of old and new prices.
+        Waits for a running full refresh and then updates the generation it published.
+        """
+        async with self.lock:
+            generation = self.current
+            await self.warframe_api.get_median_prices(generation.weapon_lookup)
+            return generation
+
+    async def refresh_rivens(self) -> DataGeneration:
+        """
+        Update the riven recommendations of the current generation in place, without the wiki.
+        Recommendations of weapons removed from the sheets stay until the next full refresh.
+        Waits for a running full refresh and then updates the generation it published.
+        """
+        async with self.lock:
+            generation = self.current
+            await generation.riven_provider.refresh(
+                generation.weapon_lookup, force_download=True
+            )
+            # No await in between, so readers see the new recommendations and relations together
+            generation.weapon_lookup.rebuild_weapon_relations()
+            return generation
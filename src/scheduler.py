@@ -0,0 +1,158 @@
+from pydantic import BaseModel
+from logging import info, warning
+from typing import Awaitable, Callable, Optional
+import asyncio
+import random
+import time
+
+
+class SourceStatus(BaseModel):
+    name: str
+    interval: float
+    staleness_budget: float
+    last_success: Optional[float] = None
+    last_attempt: Optional[float] = None
+    last_duration: Optional[float] = None
+    last_error: Optional[str] = None
+    failures: int = 0
+    next_run: Optional[float] = None
+    running: bool = False
+
+    def is_stale(self, now: Optional[float] = None) -> bool:
+        """
+        Whether the last successful refresh is older than the staleness budget
+        """
+        now = time.time() if now is None else now
+        if self.last_success is None:
+            return True
+        return now - self.last_success > self.staleness_budget
+
+
+class ScheduledSource:
+    """
+    A data source refreshed on its own cadence
+    """
+
+    def __init__(
+        self,
+        name: str,
+        refresh: Callable[[], Awaitable[object]],
+        interval: float,
+        staleness_budget: float,
+    ):
+        self.name = name
+        self.refresh = refresh
+        self.status = SourceStatus(
+            name=name, interval=interval, staleness_budget=staleness_budget
+        )
+        self.lock = asyncio.Lock()
+
+
+class RefreshScheduler:
+    """
+    Refreshes every source in the background. Runs are spread out by a random jitter,
+    so sources with the same interval don't all hit their upstream at once.
+    Failing sources are retried with an exponential backoff, capped at their interval.
+    """
+
+    def __init__(
+        self,
+        jitter: float = 0.1,
+        retry_delay: float = 60,
+        clock: Callable[[], float] = time.time,
+        rng: Optional[random.Random] = None,
+    ):
+        self.jitter = jitter
+        self.retry_delay = retry_delay
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.sources: dict[str, ScheduledSource] = {}
+        self.tasks: dict[str, asyncio.Task] = {}
+
+    def add(
+        self,
+        name: str,
+        refresh: Callable[[], Awaitable[object]],
+        interval: float,
+        staleness_budget: float,
+    ):
+        self.sources[name] = ScheduledSource(name, refresh, interval, staleness_budget)
+
+    def _jittered(self, delay: float) -> float:
+        return delay * (1 + self.rng.uniform(-self.jitter, self.jitter))
+
+    def next_delay(self, status: SourceStatus) -> float:
+        """
+        Return how long to wait before the next run of a source
+        """
+        if status.failures == 0:
+            return self._jittered(status.interval)
+        backoff = self.retry_delay * 2 ** (status.failures - 1)
+        return self._jittered(min(backoff, status.interval))
+
+    async def run_now(self, name: str) -> bool:
+        """
+        Refresh a source right away and reschedule it. A source never runs twice at the same time,
+        a run requested while it is already running waits for that run and then refreshes again.
+        """
+        source = self.sources[name]
+        status = source.status
+        async with source.lock:
+            status.running = True
+            status.last_attempt = self.clock()
+            start = time.perf_counter()
+            try:
+                await source.refresh()
+            except Exception as e:
+                status.failures += 1
+                status.last_error = str(e)
+                warning(f"Refreshing {name} failed ({status.failures} in a row): {e}")
+            else:
+                status.failures = 0
+                status.last_error = None
+                status.last_success = self.clock()
+            finally:
+                status.running = False
+                status.last_duration = time.perf_counter() - start
+                status.next_run = self.clock() + self.next_delay(status)
+
+            if status.is_stale(self.clock()):
+                warning(f"{name} is over its staleness budget of {status.staleness_budget:.0f}s")
+            return status.failures == 0
+
+    def mark_fresh(self, name: str, duration: Optional[float] = None):
+        """
+        Record a successful refresh that happened outside of the scheduler, e.g. on startup
+        """
+        status = self.sources[name].status
+        status.last_success = status.last_attempt = self.clock()
+        status.last_duration = duration
+        status.failures = 0
+        status.last_error = None
+        status.next_run = self.clock() + self.next_delay(status)
+
+    async def _loop(self, name: str):
+        status = self.sources[name].status
+        while True:
+            if status.next_run is None:
+                status.next_run = self.clock() + self.next_delay(status)
+            delay = status.next_run - self.clock()
+            if delay > 0:
+                # Sleep in steps, so runs and `mark_fresh` in between move the next run
+                await asyncio.sleep(min(delay, 60))
+                continue
+            await self.run_now(name)
+
+    def start(self):
+        for name in self.sources:
+            if name not in self.tasks:
+                self.tasks[name] = asyncio.create_task(self._loop(name))
+        info(f"Scheduled background refreshes of {', '.join(self.sources)}")
+
+    def stop(self):
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+
+    def status(self) -> list[SourceStatus]:
+        return [source.status for source in self.sources.values()]
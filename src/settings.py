@@ -14,6 +14,22 @@ class Clan(BaseModel):
     roles: list[Role]
 
 
+class RefreshCadence(BaseModel):
+    # Seconds between two refreshes
+    interval: int
+    # Seconds after the last successful refresh until the data counts as stale
+    staleness_budget: int
+
+
+DEFAULT_REFRESH_SCHEDULE = {
+    # Weapon list, wiki data, riven sheets and prices as a new data generation
+    "weapons": RefreshCadence(interval=24 * 60 * 60, staleness_budget=3 * 24 * 60 * 60),
+    "rivens": RefreshCadence(interval=6 * 60 * 60, staleness_budget=2 * 24 * 60 * 60),
+    "prices": RefreshCadence(interval=6 * 60 * 60, staleness_budget=8 * 24 * 60 * 60),
+    "messages": RefreshCadence(interval=12 * 60 * 60, staleness_budget=7 * 24 * 60 * 60),
+}
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8", case_sensitive=False
@@ -59,4 +75,52 @@ class Settings(BaseSettings):
     #Milestones for pet function
     PERSONAL_MILESTONES: list[int] = [10, 25, 50]
     GLOBAL_MILESTONES: list[int] = [50, 100, 250, 500]
+
+    # Directory for the persistent cache of parsed wiki weapon pages
+    WIKI_CACHE_PATH: str = "./wiki_cache"
+
+    # Seconds until a cached wiki weapon page gets revalidated
+    WIKI_CACHE_TTL: int = 7 * 24 * 60 * 60
+
+    # Maximum amount of weapon pages kept in the cache
+    WIKI_CACHE_MAX_ENTRIES: int = 2048
+
+    # Fetch all riven capable weapons from the wiki after each refresh
+    WIKI_PREFETCH: bool = True
+
+    # Maximum amount of concurrent wiki requests while prefetching
+    WIKI_PREFETCH_CONCURRENCY: int = 8
+
+    # Amount of workers parsing wiki pages off the event loop
+    WIKI_PARSER_WORKERS: int = 2
+
+    # Parse wiki pages in worker processes instead of threads
+    WIKI_PARSER_PROCESSES: bool = False
+
+    # Backend extracting data from wiki pages: `streaming`, `html.parser` or `lxml`
+    WIKI_PARSER_BACKEND: str = "streaming"
+
+    # Revalidate downloads (wiki, riven sheets, riven prices) instead of fetching them again
+    HTTP_CACHE_ENABLED: bool = True
+
+    # Directory of the HTTP response cache
+    HTTP_CACHE_PATH: str = "./http_cache"
+
+    # File the weapon lookup is saved to after each refresh and loaded from on startup
+    LOOKUP_SNAPSHOT_PATH: str = "./lookup_snapshot.json"
+
+    # SQLite store of the weapons, riven recommendations, wiki data and prices, preferred over the snapshot on startup
+    DATA_STORE_PATH: str = "./jericho.db"
+
+    # How often each data source is refreshed in the background, sources left out keep their default
+    REFRESH_SCHEDULE: dict[str, RefreshCadence] = {}
+
+    # Background refreshes are moved by up to this fraction of their interval
+    REFRESH_JITTER: float = 0.1
+
+    # Seconds until a failed background refresh is retried, doubled after every further failure
+    REFRESH_RETRY_DELAY: int = 60
+
+    # Weeks the rolling median of /riven_trends is taken over
+    RIVEN_TRENDS_MEDIAN_WEEKS: int = 4
     
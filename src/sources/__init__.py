@@ -1,3 +1,15 @@
-from .warframe_wiki import WarframeWiki
+from .warframe_wiki import WarframeWiki, PrefetchReport
 from .riven_provider import RivenRecommendationProvider
 from .weapon_lookup import WeaponLookup
+from .weapon_cache import WeaponCache
+from .lookup_snapshot import save_snapshot, load_snapshot
+from .weapon_query import WeaponQuery, WeaponQueryEngine, WeaponAttribute
+from .data_store import DataStore, StoreDelta, StoreRows, store_rows
+from .riven_prices import RivenPrice, RivenPriceTable
+from .riven_history import HistoryMetric, RivenHistory, RivenTrend
+from .wiki_parser import (
+    WikiParser,
+    SoupWikiParser,
+    StreamingWikiParser,
+    get_wiki_parser,
+)
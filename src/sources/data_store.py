@@ -0,0 +1,436 @@
+from pydantic import BaseModel
+from model.weapon import Weapon, WeaponModType
+from sources.weapon_lookup import RivenRecommendations, WeaponLookup, WeaponLookupEntry
+from sources.riven_provider import ParsedSheet, SheetReport
+from sources.riven_history import HistoryMetric, RivenHistory
+from collections import Counter
+from datetime import date
+from pathlib import Path
+from typing import Iterable, Mapping, Optional
+import hashlib
+import logging
+import sqlite3
+import time
+
+# Bump this whenever the tables change in an incompatible way
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS weapons (
+    name TEXT PRIMARY KEY,
+    display_name TEXT NOT NULL,
+    wiki_url TEXT NOT NULL,
+    mod_type TEXT,
+    base_weapon TEXT,
+    recommendations TEXT,
+    generation INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS weapons_mod_type ON weapons (mod_type);
+CREATE INDEX IF NOT EXISTS weapons_recommendations ON weapons (recommendations);
+CREATE INDEX IF NOT EXISTS weapons_generation ON weapons (generation);
+CREATE TABLE IF NOT EXISTS recommendations (
+    sheet TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    weapon TEXT NOT NULL,
+    data TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    PRIMARY KEY (sheet, position)
+);
+CREATE INDEX IF NOT EXISTS recommendations_id ON recommendations (id);
+CREATE INDEX IF NOT EXISTS recommendations_generation ON recommendations (generation);
+CREATE TABLE IF NOT EXISTS sheets (
+    name TEXT PRIMARY KEY,
+    sha256 TEXT,
+    rows INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    generation INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dispositions (
+    name TEXT PRIMARY KEY,
+    disposition REAL NOT NULL,
+    data TEXT NOT NULL,
+    generation INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dispositions_disposition ON dispositions (disposition);
+CREATE INDEX IF NOT EXISTS dispositions_generation ON dispositions (generation);
+CREATE TABLE IF NOT EXISTS prices (
+    name TEXT PRIMARY KEY,
+    median_plat_price REAL NOT NULL,
+    generation INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS prices_median_plat_price ON prices (median_plat_price);
+CREATE INDEX IF NOT EXISTS prices_generation ON prices (generation);
+CREATE TABLE IF NOT EXISTS popularity (
+    name TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    generation INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    week TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (week, metric, name)
+);
+"""
+
+# The columns identifying a row of each table, every other column except `generation` is its content
+TABLE_KEYS = {
+    "weapons": ("name",),
+    "recommendations": ("sheet", "position"),
+    "sheets": ("name",),
+    "dispositions": ("name",),
+    "prices": ("name",),
+    "popularity": ("name",),
+}
+# Append-only, not part of a generation
+HISTORY_TABLE = "history"
+# Recommendations that were not loaded from a sheet are stored under this sheet name
+NO_SHEET = ""
+
+# The rows of every table by their key columns, see `store_rows`
+StoreRows = dict[str, dict[tuple, tuple]]
+
+
+class StoreDelta(BaseModel):
+    generation: int
+    written: dict[str, int] = {}
+    deleted: dict[str, int] = {}
+    duration: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        return any(self.written.values()) or any(self.deleted.values())
+
+
+def _recommendations_id(data: str) -> str:
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def store_rows(
+    weapon_lookup: WeaponLookup,
+    weapons: Mapping[str, Weapon],
+    sheets: Iterable[ParsedSheet],
+) -> StoreRows:
+    """
+    Return the rows every table should contain, keyed by their key columns.
+    The rows only hold strings and numbers, they don't share any state with the lookup,
+    the weapons or the sheets, so they can be saved in another thread.
+    """
+    rows: StoreRows = {table: {} for table in TABLE_KEYS}
+    # The stored id of every recommendation object of the lookup
+    ids: dict[int, str] = {}
+
+    def add_recommendations(
+        sheet: str, position: int, recommendations: RivenRecommendations
+    ):
+        data = recommendations.model_dump_json()
+        ids[id(recommendations)] = _recommendations_id(data)
+        rows["recommendations"][(sheet, position)] = (
+            ids[id(recommendations)],
+            recommendations.weapon,
+            data,
+        )
+
+    for parsed in sheets:
+        report = parsed.report
+        rows["sheets"][(report.sheet,)] = (report.sha256, report.rows, report.errors)
+        for position, recommendations in enumerate(parsed.recommendations):
+            add_recommendations(report.sheet, position, recommendations)
+    remaining = [
+        recommendations
+        for recommendations in weapon_lookup.recommendations.values()
+        if id(recommendations) not in ids
+    ]
+    for position, recommendations in enumerate(remaining):
+        add_recommendations(NO_SHEET, position, recommendations)
+
+    for name, record in weapon_lookup.weapon_lookup.items():
+        recommendations = weapon_lookup.recommendations.get(record.recommendations_id)
+        rows["weapons"][(name,)] = (
+            record.display_name,
+            record.wiki_url,
+            record.mod_type.value if record.mod_type is not None else None,
+            record.base_weapon,
+            ids[id(recommendations)] if recommendations is not None else None,
+        )
+        if record.median_plat_price is not None:
+            rows["prices"][(name,)] = (record.median_plat_price,)
+    for name, weapon in weapons.items():
+        rows["dispositions"][(name,)] = (
+            weapon.riven_disposition.disposition,
+            weapon.model_dump_json(),
+        )
+    for name, count in weapon_lookup.popularity.items():
+        rows["popularity"][(name,)] = (count,)
+    return rows
+
+
+class DataStore:
+    """
+    A local SQLite copy of the weapon lookup, riven recommendations, wiki weapon data and prices.
+    Every row carries the generation it last changed in. Saving only writes the rows that changed,
+    all in a single transaction, so readers see either the previous or the new generation.
+    """
+
+    def __init__(self, path: str, read_only: bool = False):
+        self.path = path
+        self.read_only = read_only
+        if read_only:
+            # Fails if the file does not exist, instead of creating an empty store
+            self.connection = sqlite3.connect(
+                f"{Path(path).resolve().as_uri()}?mode=ro", uri=True
+            )
+        else:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self.connection = sqlite3.connect(path)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self._migrate()
+
+    def _migrate(self):
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            logging.warning(
+                f"Recreating data store `{self.path}` with schema {version}, expected {SCHEMA_VERSION}"
+            )
+            # Only the tables of a generation are dropped, they are built again by the next refresh.
+            # The history can't be downloaded again, changes to its table need a real migration.
+            with self.connection:
+                for table in [*TABLE_KEYS, "meta"]:
+                    self.connection.execute(f"DROP TABLE IF EXISTS {table}")
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    @classmethod
+    def open(cls, path: str, read_only: bool = False) -> Optional["DataStore"]:
+        """
+        Open the store, returning `None` if it can't be used, e.g. a read-only store that was never written
+        """
+        if read_only and not Path(path).exists():
+            return None
+        try:
+            store = cls(path, read_only=read_only)
+            if read_only and store.schema_version() != SCHEMA_VERSION:
+                logging.warning(f"Ignoring data store `{path}` with an incompatible schema")
+                store.close()
+                return None
+            return store
+        except sqlite3.Error as e:
+            logging.error(f"Failed to open the data store `{path}`: {e}")
+            return None
+
+    def close(self):
+        self.connection.close()
+
+    def schema_version(self) -> int:
+        return self.connection.execute("PRAGMA user_version").fetchone()[0]
+
+    def generation(self) -> int:
+        """
+        Return the generation of the last save, `0` if nothing was saved yet
+        """
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'generation'"
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    def saved_at(self) -> Optional[float]:
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'saved_at'"
+        ).fetchone()
+        return float(row[0]) if row else None
+
+    def _columns(self, table: str) -> list[str]:
+        return [
+            row[1]
+            for row in self.connection.execute(f"PRAGMA table_info({table})")
+            if row[1] != "generation"
+        ]
+
+    def save(
+        self,
+        weapon_lookup: WeaponLookup,
+        weapons: Optional[Mapping[str, Weapon]] = None,
+        sheets: Iterable[ParsedSheet] = (),
+    ) -> StoreDelta:
+        """
+        Store a complete data generation: the lookup, the wiki data of `weapons` by normalized name
+        and the parsed riven sheets. Unchanged rows keep the generation they were written in.
+        """
+        return self.save_rows(store_rows(weapon_lookup, weapons or {}, sheets))
+
+    def save_rows(self, rows: StoreRows) -> StoreDelta:
+        """
+        Store a complete data generation from the rows built by `store_rows`, see `save`
+        """
+        if self.read_only:
+            raise ValueError(f"Data store `{self.path}` was opened read-only")
+
+        start = time.perf_counter()
+        generation = self.generation() + 1
+        delta = StoreDelta(generation=generation)
+        with self.connection:
+            for table, keys in TABLE_KEYS.items():
+                columns = self._columns(table)
+                existing = {
+                    row[: len(keys)]: row[len(keys) :]
+                    for row in self.connection.execute(
+                        f"SELECT {', '.join(columns)} FROM {table}"
+                    )
+                }
+                changed = [
+                    (*key, *values, generation)
+                    for key, values in rows[table].items()
+                    if existing.get(key) != values
+                ]
+                removed = [key for key in existing if key not in rows[table]]
+                placeholders = ", ".join("?" for _ in range(len(columns) + 1))
+                self.connection.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}, generation) VALUES ({placeholders})",
+                    changed,
+                )
+                condition = " AND ".join(f"{key} = ?" for key in keys)
+                self.connection.executemany(
+                    f"DELETE FROM {table} WHERE {condition}", removed
+                )
+                delta.written[table] = len(changed)
+                delta.deleted[table] = len(removed)
+
+            if delta.changed or generation == 1:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [("generation", str(generation)), ("saved_at", str(time.time()))],
+                )
+            else:
+                # Nothing changed, so there is no new generation
+                delta.generation = generation - 1
+        delta.duration = time.perf_counter() - start
+        return delta
+
+    def load_lookup(self) -> Optional[WeaponLookup]:
+        """
+        Build a lookup from the stored weapons, recommendations, prices and popularity.
+        Returns `None` if nothing was stored yet.
+        """
+        recommendations: dict[str, RivenRecommendations] = {}
+        for recommendations_id, data in self.connection.execute(
+            "SELECT id, data FROM recommendations"
+        ):
+            if recommendations_id not in recommendations:
+                recommendations[recommendations_id] = (
+                    RivenRecommendations.model_validate_json(data)
+                )
+
+        weapon_lookup = WeaponLookup()
+        for row in self.connection.execute(
+            """
+            SELECT weapons.name, display_name, wiki_url, mod_type, base_weapon, recommendations, median_plat_price
+            FROM weapons LEFT JOIN prices ON prices.name = weapons.name
+            """
+        ):
+            (
+                name,
+                display_name,
+                wiki_url,
+                mod_type,
+                base_weapon,
+                recommendations_id,
+                price,
+            ) = row
+            weapon_lookup.add_entry(
+                WeaponLookupEntry(
+                    display_name=display_name,
+                    wiki_url=wiki_url,
+                    normalized_name=name,
+                    riven_recommendations=recommendations.get(recommendations_id),
+                    median_plat_price=price,
+                    base_weapon=base_weapon,
+                    mod_type=WeaponModType(mod_type) if mod_type is not None else None,
+                )
+            )
+        if len(weapon_lookup) == 0:
+            return None
+
+        weapon_lookup.rebuild_weapon_relations()
+        weapon_lookup.popularity.update(
+            Counter(dict(self.connection.execute("SELECT name, count FROM popularity")))
+        )
+        return weapon_lookup
+
+    def load_weapons(self) -> dict[str, Weapon]:
+        """
+        Return the stored wiki data of every weapon by normalized name
+        """
+        return {
+            name: Weapon.model_validate_json(data)
+            for name, data in self.connection.execute("SELECT name, data FROM dispositions")
+        }
+
+    def load_sheets(self) -> list[ParsedSheet]:
+        """
+        Return the stored riven sheets with their recommendations in sheet order
+        """
+        sheets = {
+            name: ParsedSheet(
+                report=SheetReport(
+                    sheet=name, sha256=sha256, rows=rows, errors=errors, changed=False
+                )
+            )
+            for name, sha256, rows, errors in self.connection.execute(
+                "SELECT name, sha256, rows, errors FROM sheets"
+            )
+        }
+        for sheet, data in self.connection.execute(
+            "SELECT sheet, data FROM recommendations WHERE sheet != ? ORDER BY sheet, position",
+            (NO_SHEET,),
+        ):
+            if sheet in sheets:
+                sheets[sheet].recommendations.append(
+                    RivenRecommendations.model_validate_json(data)
+                )
+        return list(sheets.values())
+
+    def save_history(
+        self, week: date, snapshot: Mapping[HistoryMetric, Mapping[str, float]]
+    ) -> int:
+        """
+        Store the snapshot of a week, replacing an earlier snapshot of the same week.
+        Returns the number of rows written.
+        """
+        if self.read_only:
+            raise ValueError(f"Data store `{self.path}` was opened read-only")
+
+        rows = [
+            (week.isoformat(), metric.value, name, value)
+            for metric, values in snapshot.items()
+            for name, value in values.items()
+        ]
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO {HISTORY_TABLE} (week, metric, name, value) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def load_history(self) -> RivenHistory:
+        """
+        Build the price and disposition history from every stored week
+        """
+        history = RivenHistory()
+        week, metric, values = None, None, {}
+        for row_week, row_metric, name, value in self.connection.execute(
+            f"SELECT week, metric, name, value FROM {HISTORY_TABLE} ORDER BY week, metric"
+        ):
+            if (row_week, row_metric) != (week, metric):
+                if values:
+                    history.record(date.fromisoformat(week), HistoryMetric(metric), values)
+                week, metric, values = row_week, row_metric, {}
+            values[name] = value
+        if values:
+            history.record(date.fromisoformat(week), HistoryMetric(metric), values)
+        return history
@@ -0,0 +1,65 @@
+from pydantic import BaseModel, ValidationError
+from sources.weapon_lookup import WeaponLookup, WeaponLookupEntry
+from pathlib import Path
+from typing import Optional
+import logging
+import os
+import time
+
+# Bump this whenever `WeaponLookupEntry` changes in an incompatible way
+SNAPSHOT_VERSION = 1
+
+
+class WeaponLookupSnapshot(BaseModel):
+    version: int = SNAPSHOT_VERSION
+    created_at: float
+    entries: list[WeaponLookupEntry]
+    popularity: dict[str, int] = {}
+
+
+def save_snapshot(weapon_lookup: WeaponLookup, path: str):
+    """
+    Write the lookup, including recommendations, prices and relations, to the given file.
+    The file is replaced atomically, so a crash never leaves a half written snapshot behind.
+    """
+    snapshot = WeaponLookupSnapshot(
+        created_at=time.time(),
+        entries=list(weapon_lookup.entries()),
+        popularity=weapon_lookup.popularity,
+    )
+    file_path = Path(path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = file_path.with_name(file_path.name + ".tmp")
+    temp_path.write_text(snapshot.model_dump_json(), "utf-8")
+    os.replace(temp_path, file_path)
+
+
+def load_snapshot(path: str) -> Optional[WeaponLookup]:
+    """
+    Load a lookup from a snapshot file.
+    Returns `None` if there is no snapshot or it was written by an incompatible version.
+    """
+    file_path = Path(path)
+    if not file_path.exists():
+        return None
+
+    try:
+        snapshot = WeaponLookupSnapshot.model_validate_json(file_path.read_text("utf-8"))
+    except (OSError, ValidationError) as e:
+        logging.error(f"Ignoring unreadable weapon lookup snapshot `{path}`: {e}")
+        return None
+    if snapshot.version != SNAPSHOT_VERSION:
+        logging.warning(
+            f"Ignoring weapon lookup snapshot with version {snapshot.version}, expected {SNAPSHOT_VERSION}"
+        )
+        return None
+
+    weapon_lookup = WeaponLookup()
+    for entry in snapshot.entries:
+        weapon_lookup.add_entry(entry)
+    # Relations are cheap to rebuild and this restores the family index as well
+    weapon_lookup.rebuild_weapon_relations()
+    weapon_lookup.popularity.update(snapshot.popularity)
+    age = (time.time() - snapshot.created_at) / 3600
+    logging.info(f"Loaded {len(weapon_lookup)} weapons from a {age:.1f}h old snapshot")
+    return weapon_lookup
@@ -0,0 +1,204 @@
+from pydantic import BaseModel
+from datetime import date, timedelta
+from enum import Enum
+from typing import Mapping, Optional
+import numpy as np
+import warnings
+
+
+class HistoryMetric(str, Enum):
+    Price = "price"
+    Disposition = "disposition"
+
+
+class RivenTrend(BaseModel):
+    weapon: str
+    previous: float
+    current: float
+    change: float
+    relative_change: Optional[float]
+
+
+def week_of(day: date) -> date:
+    """
+    Return the Monday of the week of the given day, weeks are keyed by it
+    """
+    return day - timedelta(days=day.weekday())
+
+
+def _nanmedian(values: np.ndarray, axis: int) -> np.ndarray:
+    # Windows without a single value are NaN, without warning about it
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return np.nanmedian(values, axis=axis)
+
+
+class RivenHistory:
+    """
+    Append-only weekly snapshots of the median riven price and the disposition of every weapon.
+    Each metric is a matrix with one row per week and one column per weapon, so queries over all
+    weapons are single NumPy operations. Missing weeks and values are NaN.
+    Only the latest week can still be recorded again, earlier weeks are final.
+    """
+
+    def __init__(self, weeks: int = 64, weapons: int = 1024):
+        self.first_week: Optional[date] = None
+        self.week_count = 0
+        self.weapons: list[str] = []
+        self.weapon_ids: dict[str, int] = {}
+        self.values = {
+            metric: np.full((weeks, weapons), np.nan) for metric in HistoryMetric
+        }
+
+    def __len__(self):
+        return self.week_count
+
+    @property
+    def weeks(self) -> list[date]:
+        if self.first_week is None:
+            return []
+        return [self.first_week + timedelta(weeks=row) for row in range(self.week_count)]
+
+    @property
+    def last_week(self) -> Optional[date]:
+        if self.first_week is None:
+            return None
+        return self.first_week + timedelta(weeks=self.week_count - 1)
+
+    def _grow(self, weeks: int, weapons: int):
+        capacity_weeks, capacity_weapons = self.values[HistoryMetric.Price].shape
+        if weeks <= capacity_weeks and weapons <= capacity_weapons:
+            return
+        # Double the capacity, so appending stays amortized constant time
+        shape = (
+            capacity_weeks if weeks <= capacity_weeks else max(weeks, capacity_weeks * 2),
+            capacity_weapons if weapons <= capacity_weapons else max(weapons, capacity_weapons * 2),
+        )
+        for metric, values in self.values.items():
+            grown = np.full(shape, np.nan)
+            grown[:capacity_weeks, :capacity_weapons] = values
+            self.values[metric] = grown
+
+    def _row(self, week: date) -> int:
+        week = week_of(week)
+        if self.first_week is None:
+            self.first_week = week
+        row = (week - self.first_week).days // 7
+        if row < 0 or row < self.week_count - 1:
+            raise ValueError(f"The week of {week} was already recorded and is final")
+        if row >= self.week_count:
+            self._grow(row + 1, len(self.weapons))
+            self.week_count = row + 1
+        return row
+
+    def _weapon_id(self, weapon: str) -> int:
+        weapon_id = self.weapon_ids.get(weapon)
+        if weapon_id is None:
+            weapon_id = self.weapon_ids[weapon] = len(self.weapons)
+            self.weapons.append(weapon)
+        return weapon_id
+
+    def record(self, week: date, metric: HistoryMetric, values: Mapping[str, float]):
+        """
+        Record the values by normalized weapon name for the week of the given day.
+        Recording the latest week again replaces the given values.
+        """
+        row = self._row(week)
+        ids = np.fromiter(
+            (self._weapon_id(weapon) for weapon in values), dtype=np.intp, count=len(values)
+        )
+        self._grow(self.week_count, len(self.weapons))
+        self.values[metric][row, ids] = np.fromiter(
+            values.values(), dtype=np.float64, count=len(values)
+        )
+
+    def matrix(self, metric: HistoryMetric) -> np.ndarray:
+        """
+        Return a read-only view of the weeks × weapons matrix of the metric
+        """
+        view = self.values[metric][: self.week_count, : len(self.weapons)]
+        view.flags.writeable = False
+        return view
+
+    def series(self, weapon: str, metric: HistoryMetric) -> np.ndarray:
+        weapon_id = self.weapon_ids.get(weapon)
+        if weapon_id is None:
+            return np.full(self.week_count, np.nan)
+        return self.matrix(metric)[:, weapon_id]
+
+    def week_over_week(
+        self, metric: HistoryMetric, weeks: int = 1
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the values of every weapon `weeks` weeks ago and in the latest week
+        """
+        matrix = self.matrix(metric)
+        if weeks < 1 or self.week_count <= weeks:
+            empty = np.full(len(self.weapons), np.nan)
+            return empty, empty
+        return matrix[-1 - weeks], matrix[-1]
+
+    def rolling_median(
+        self, metric: HistoryMetric, window: int, recent: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Return the median of every weapon over the last `window` weeks, for every week or
+        only the `recent` latest weeks. The first weeks use the weeks there are, missing weeks are ignored.
+        """
+        matrix = self.matrix(metric)
+        rows = matrix.shape[0] if recent is None else min(recent, matrix.shape[0])
+        padded = np.vstack([np.full((window - 1, matrix.shape[1]), np.nan), matrix])
+        # Only the weeks covered by the requested windows
+        padded = padded[len(padded) - rows - window + 1 :]
+        windows = np.lib.stride_tricks.sliding_window_view(padded, window, axis=0)
+        return _nanmedian(windows, axis=-1)
+
+    def _trend(self, weapon_id: int, previous: np.ndarray, current: np.ndarray) -> RivenTrend:
+        change = float(current[weapon_id] - previous[weapon_id])
+        return RivenTrend(
+            weapon=self.weapons[weapon_id],
+            previous=float(previous[weapon_id]),
+            current=float(current[weapon_id]),
+            change=change,
+            relative_change=(
+                change / float(previous[weapon_id]) if previous[weapon_id] != 0 else None
+            ),
+        )
+
+    def trend(
+        self, weapon: str, metric: HistoryMetric, weeks: int = 1
+    ) -> Optional[RivenTrend]:
+        weapon_id = self.weapon_ids.get(weapon)
+        if weapon_id is None:
+            return None
+        previous, current = self.week_over_week(metric, weeks)
+        if np.isnan(previous[weapon_id]) or np.isnan(current[weapon_id]):
+            return None
+        return self._trend(weapon_id, previous, current)
+
+    def top_movers(
+        self,
+        metric: HistoryMetric,
+        count: int = 10,
+        weeks: int = 1,
+        rising: bool = True,
+        relative: bool = True,
+    ) -> list[RivenTrend]:
+        """
+        Return the weapons whose value rose (or fell) the most over the last `weeks` weeks,
+        by relative or absolute change. Weapons without a value in either week are left out.
+        """
+        previous, current = self.week_over_week(metric, weeks)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = current - previous
+            if relative:
+                change = np.where(previous > 0, change / previous, np.nan)
+        if not rising:
+            change = -change
+        # Ignore weapons without a change, rising and falling movers never overlap
+        candidates = np.flatnonzero(np.nan_to_num(change, nan=0.0) > 0)
+        if len(candidates) > count:
+            top = np.argpartition(change[candidates], -count)[-count:]
+            candidates = candidates[top]
+        ordered = candidates[np.argsort(-change[candidates], kind="stable")]
+        return [self._trend(weapon_id, previous, current) for weapon_id in ordered]
@@ -0,0 +1,140 @@
+from array import array
+from pydantic import BaseModel
+from typing import Iterator, Optional
+import math
+import sys
+
+# Statistics of the weekly riven prices, stored as one float column each
+PRICE_STATISTICS = ("avg", "stddev", "min", "max", "median")
+
+
+class RivenPrice(BaseModel):
+    weapon: str
+    item_type: str
+    rerolled: bool
+    avg: Optional[float]
+    stddev: Optional[float]
+    min: Optional[float]
+    max: Optional[float]
+    median: Optional[float]
+    pop: int
+
+
+def _normalize_weapon_name(weapon_name: str) -> str:
+    return weapon_name.replace(" ", "_").lower()
+
+
+class RivenPriceTable:
+    """
+    Columnar table of the weekly riven prices, with one row per weapon and rolled state.
+    Every statistic is a typed array, so the statistics of a row take a few dozen bytes instead of a dict.
+    """
+
+    def __init__(self):
+        self.weapons: list[str] = []
+        self.item_types: list[str] = []
+        self.item_type_ids: dict[str, int] = {}
+        self.rows: dict[tuple[str, bool], int] = {}
+        # Row of the item of each weapon that came last, rolled or not
+        self.latest: dict[str, int] = {}
+        self.item_type = array("H")
+        self.rerolled = array("b")
+        self.columns = {statistic: array("d") for statistic in PRICE_STATISTICS}
+        self.pop = array("L")
+        # Rivens without a weapon are veiled, they are not part of the table
+        self.skipped = 0
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+
+    def _item_type_id(self, item_type: str) -> int:
+        item_type_id = self.item_type_ids.get(item_type)
+        if item_type_id is None:
+            item_type_id = self.item_type_ids[item_type] = len(self.item_types)
+            self.item_types.append(item_type)
+        return item_type_id
+
+    def add(self, item: dict) -> bool:
+        """
+        Add an item of `weeklyRivensPC.json`, a later item for the same weapon and rolled state replaces the earlier one
+        """
+        weapon = item.get("compatibility")
+        if weapon is None:
+            self.skipped += 1
+            return False
+        rerolled = bool(item.get("rerolled"))
+        key = (_normalize_weapon_name(weapon), rerolled)
+        values = [item.get(statistic) for statistic in PRICE_STATISTICS]
+        values = [math.nan if value is None else float(value) for value in values]
+        item_type = self._item_type_id(item.get("itemType") or "")
+
+        row = self.rows.get(key)
+        if row is None:
+            self.rows[key] = len(self.weapons)
+            self.weapons.append(sys.intern(weapon))
+            self.item_type.append(item_type)
+            self.rerolled.append(rerolled)
+            for statistic, value in zip(PRICE_STATISTICS, values):
+                self.columns[statistic].append(value)
+            self.pop.append(int(item.get("pop") or 0))
+        else:
+            self.item_type[row] = item_type
+            for statistic, value in zip(PRICE_STATISTICS, values):
+                self.columns[statistic][row] = value
+            self.pop[row] = int(item.get("pop") or 0)
+        self.latest[key[0]] = self.rows[key]
+        return True
+
+    def __len__(self):
+        return len(self.weapons)
+
+    def row(self, row: int) -> RivenPrice:
+        statistics = {}
+        for statistic in PRICE_STATISTICS:
+            value = self.columns[statistic][row]
+            statistics[statistic] = None if math.isnan(value) else value
+        return RivenPrice(
+            weapon=self.weapons[row],
+            item_type=self.item_types[self.item_type[row]],
+            rerolled=bool(self.rerolled[row]),
+            pop=self.pop[row],
+            **statistics,
+        )
+
+    def get(self, weapon: str, rerolled: bool = False) -> Optional[RivenPrice]:
+        row = self.rows.get((_normalize_weapon_name(weapon), rerolled))
+        return self.row(row) if row is not None else None
+
+    def _median(self, row: int) -> Optional[float]:
+        value = self.columns["median"][row]
+        return None if math.isnan(value) else value
+
+    def median(self, weapon: str) -> Optional[float]:
+        """
+        Return the median price of the item of the weapon that comes last in the file, rolled or not,
+        the same price as when the items were applied to the lookup one by one
+        """
+        row = self.latest.get(_normalize_weapon_name(weapon))
+        return self._median(row) if row is not None else None
+
+    def medians(self) -> Iterator[tuple[str, Optional[float]]]:
+        """
+        Yield every weapon together with its median price, see `median`
+        """
+        for row in self.latest.values():
+            yield self.weapons[row], self._median(row)
+
+    def validators(self) -> dict[str, str]:
+        validators = {}
+        if self.etag is not None:
+            validators["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            validators["If-Modified-Since"] = self.last_modified
+        return validators
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size of the columns in bytes, without the weapon names and the row index
+        """
+        columns = [self.item_type, self.rerolled, self.pop, *self.columns.values()]
+        return sum(column.itemsize * len(column) for column in columns)
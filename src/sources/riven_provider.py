@@ -1,16 +1,137 @@
 import csv
 import httpx
-from utils.http import HardenedHttpClient
-from model.rivens import RivenEffect
+from utils.http import HardenedHttpClient, HttpCache
+from model.rivens import RivenEffect, parse_riven_effects
+from model.weapon import WeaponModType
 from sources.weapon_lookup import WantedRivenStats, RivenRecommendations, WeaponLookup
+from pydantic import BaseModel
+from concurrent.futures import Executor
 from pathlib import Path
 import asyncio
+import hashlib
 import logging
-from typing import Optional
+import time
+from typing import Iterator, Optional
+
+
+class SheetReport(BaseModel):
+    sheet: str
+    rows: int = 0
+    errors: int = 0
+    unknown_weapons: int = 0
+    duration: float = 0.0
+    sha256: Optional[str] = None
+    # False if the sheet was identical to the last one, so its parsed rows were reused
+    changed: bool = True
+
+
+class ParsedSheet(BaseModel):
+    report: SheetReport
+    recommendations: list[RivenRecommendations] = []
+
+
+def parse_stats(
+    raw_stats: str, errors: Optional[list[str]] = None
+) -> Optional[list[RivenEffect]]:
+    """
+    Parse `/` separated stat abbreviations, unknown ones are logged and collected in `errors`
+    """
+    if raw_stats == "":
+        return None
+
+    stats, unknown = parse_riven_effects(raw_stats)
+    for stat in unknown:
+        logging.error(f"Failed to parse stat: {stat}")
+        if errors is not None:
+            errors.append(stat)
+    return list(stats) if len(stats) > 0 else None
+
+
+def _sheet_rows(sheet_name: str, lines: Iterator[str]) -> Iterator[Optional[list[str]]]:
+    """
+    Yield the weapon, positive stats, negative stats and comment of every row.
+    Rows missing any of them are yielded as `None`.
+    The columns are found by their header, so they can move around in the sheet.
+    """
+    reader = csv.reader(lines)
+    headers = next(reader, [])
+    try:
+        columns = [
+            headers.index("WEAPON"),
+            headers.index("POSITIVE STATS:"),
+            headers.index("NEGATIVE STATS:"),
+            headers.index("Notes:"),
+        ]
+    except ValueError as e:
+        raise Exception(f"Missing expected columns in sheet {sheet_name}: {e}")
+
+    last_column = max(columns)
+    for row in reader:
+        yield [row[column] for column in columns] if len(row) > last_column else None
+
+
+def _parse_row(
+    weapon: str,
+    raw_positive_stats: str,
+    raw_negative_stats: str,
+    comment: str,
+    errors: list[str],
+) -> RivenRecommendations:
+    weapon = weapon.upper()
+    comment = comment if comment != "" else None
+    if comment:
+        comment = comment.strip().replace("(NOTE: ", "").replace(")", "")
+
+    negatives = parse_stats(raw_negative_stats.upper(), errors)
+
+    parsed_stats = []
+    for positive_slices in raw_positive_stats.upper().split(" OR "):
+        try:
+            splits = positive_slices.split(" ")
+            raw_best = "/".join(splits[:-1])
+            raw_desired = splits[-1]
+            best = parse_stats(raw_best, errors)
+            desired = parse_stats(raw_desired, errors)
+            parsed_stats.append(
+                WantedRivenStats(best=best, wanted=desired, wanted_negatives=negatives)
+            )
+        except Exception as e:
+            logging.error(f"Failed to parse stats for {weapon}: {e}")
+            errors.append(str(e))
+    return RivenRecommendations(weapon=weapon, comment=comment, stats=parsed_stats)
+
+
+def parse_sheet(sheet_name: str, input_file: str) -> ParsedSheet:
+    """
+    Parse a downloaded sheet row by row without touching a weapon lookup,
+    so it can run in a worker thread or process.
+    """
+    start = time.perf_counter()
+    report = SheetReport(sheet=sheet_name)
+    recommendations = []
+    with open(input_file, "r", encoding="utf-8", newline="") as infile:
+        for row in _sheet_rows(sheet_name, infile):
+            report.rows += 1
+            if row is None:
+                logging.error(
+                    f"Skipping row {report.rows} of sheet {sheet_name}, it is missing columns"
+                )
+                report.errors += 1
+                continue
+            errors = []
+            recommendations.append(_parse_row(*row, errors))
+            report.errors += 1 if errors else 0
+    report.duration = time.perf_counter() - start
+    return ParsedSheet(report=report, recommendations=recommendations)
 
 
 class RivenRecommendationProvider:
-    def __init__(self, path: str = "./riven_data") -> None:
+    def __init__(
+        self,
+        path: str = "./riven_data",
+        http_cache: Optional[HttpCache] = None,
+        executor: Optional[Executor] = None,
+    ) -> None:
         self.base_url = "https://docs.google.com/spreadsheets/d/1zbaeJBuBn44cbVKzJins_E3hTDpnmvOk8heYN-G8yy8/export?format=csv&gid="
         self.sheets = {
             "Primary": "0",
@@ -19,128 +140,123 @@ class RivenRecommendationProvider:
             "Archgun": "289737427",
             "Robotic": "965095749",
         }
-        self.client = HardenedHttpClient(httpx.AsyncClient(follow_redirects=True))
+        # Mod types implied by a sheet, used if the wiki did not provide one.
+        # Primary and robotic weapons can be rifles or shotguns, so their sheets imply nothing.
+        self.sheet_mod_types = {
+            "Secondary": WeaponModType.Pistol,
+            "Melee": WeaponModType.Melee,
+            "Archgun": WeaponModType.Archgun,
+        }
+        self.client = HardenedHttpClient(
+            httpx.AsyncClient(follow_redirects=True), cache=http_cache
+        )
         self.directory = Path(path)
         if not self.directory.exists():
             self.directory.mkdir(parents=True, exist_ok=True)
+        # Sheets are parsed in this executor, `None` uses the default thread pool of the event loop
+        self.executor = executor
+        self.last_report: list[SheetReport] = []
+        # The last parsed version of every sheet, reused as long as the content hash matches
+        self.parsed_sheets: dict[str, ParsedSheet] = {}
 
-    def parse_stats(self, raw_stats: str) -> Optional[list[RivenEffect]]:
-        if raw_stats == "":
-            return None
-
-        stats = []
-        for stat in raw_stats.split("/"):
-            try:
-                stat = stat.strip()
-                if stat.startswith("-"):
-                    stat = stat[1:]
-                if stat == "ELEMENT":
-                    stats.append(RivenEffect.ELEC)
-                    stats.append(RivenEffect.TOX)
-                    stats.append(RivenEffect.HEAT)
-                    stats.append(RivenEffect.COLD)
-                elif stat == "RECOIL":
-                    stats.append(RivenEffect.REC)
-                elif stat == "AS":
-                    stats.append(RivenEffect.FR)
-                else:
-                    stats.append(RivenEffect.try_parse(stat))
-            except ValueError:
-                logging.error(f"Failed to parse stat: {stat}")
-        return stats if len(stats) > 0 else None
-
-    def normalize_sheet(
-        self, sheet_name: str, input_file: str, weapon_lookup: WeaponLookup
-    ):
+    def restore(self, sheets: list[ParsedSheet]):
         """
-        Normalize the given sheet, ensuring rows are consistent and extracting best stats.
-        This function dynamically adjusts to column positions based on the header row.
+        Reuse sheets parsed before a restart, e.g. from the data store, while their content is unchanged
         """
-        with open(input_file, "r", encoding="utf-8") as infile:
-            reader = csv.reader(infile)
-            data = list(reader)
-
-        # The first row should contain headers, so we inspect it
-        headers = data[0]
-        try:
-            # Dynamically find the column indices for each important field
-            weapon_col = headers.index(
-                "WEAPON"
-            )  # Adjust to correct header name if needed
-            best_stats_col = headers.index("POSITIVE STATS:")  # Adjust as needed
-            negative_stats_col = headers.index("NEGATIVE STATS:")
-            comment_col = headers.index("Notes:")
-
-        except ValueError as e:
-            raise Exception(f"Missing expected columns in sheet {sheet_name}: {e}")
-
-        # Process all rows after the header
-        for row in data[1:]:
-            weapon = row[weapon_col].upper()
-            raw_positive_stats = row[best_stats_col].upper()
-            raw_negative_stats = row[
-                negative_stats_col
-            ].upper()  # Default to empty list if no negative stats column is found
-
-            comment = row[comment_col]
-            comment = comment if comment != "" else None
-            if comment:
-                comment = comment.strip().replace("(NOTE: ", "").replace(")", "")
-
-            negatives = self.parse_stats(raw_negative_stats)
-
-            parsed_stats = []
-            for positive_slices in raw_positive_stats.split(" OR "):
-                try:
-                    splits = positive_slices.split(" ")
-                    raw_best = "/".join(splits[:-1])
-                    raw_desired = splits[-1]
-                    best = self.parse_stats(raw_best)
-                    desired = self.parse_stats(raw_desired)
-
-                    parsed_stats.append(
-                        WantedRivenStats(
-                            best=best, wanted=desired, wanted_negatives=negatives
-                        )
-                    )
-                except Exception as e:
-                    logging.error(f"Failed to parse stats for {weapon}: {e}")
-                    continue
+        for parsed in sheets:
+            self.parsed_sheets[parsed.report.sheet] = parsed
 
+    def apply_sheet(self, parsed: ParsedSheet, weapon_lookup: WeaponLookup):
+        """
+        Store the parsed recommendations of a sheet in the weapon lookup
+        """
+        sheet_name = parsed.report.sheet
+        parsed.report.unknown_weapons = 0
+        for recommendations in parsed.recommendations:
+            weapon = recommendations.weapon
             if weapon not in weapon_lookup:
                 logging.error(f"Unknown weapon `{weapon}` in sheet {sheet_name}")
+                parsed.report.unknown_weapons += 1
                 continue
 
-            weapon_lookup[weapon].riven_recommendations = RivenRecommendations(
-                weapon=weapon, comment=comment, stats=parsed_stats
-            )
+            weapon_lookup.set_riven_recommendations(weapon, recommendations)
+            mod_type = self.sheet_mod_types.get(sheet_name)
+            if mod_type is not None and weapon_lookup[weapon].mod_type is None:
+                weapon_lookup.set_mod_type(weapon, mod_type)
+
+    def normalize_sheet(
+        self, sheet_name: str, input_file: str, weapon_lookup: WeaponLookup
+    ) -> SheetReport:
+        """
+        Normalize the given sheet, ensuring rows are consistent and extracting best stats.
+        This function dynamically adjusts to column positions based on the header row.
+        """
+        parsed = parse_sheet(sheet_name, input_file)
+        self.apply_sheet(parsed, weapon_lookup)
+        return parsed.report
 
-    async def refresh(self, weapon_lookup: WeaponLookup, force_download: bool = False):
+    async def refresh(
+        self, weapon_lookup: WeaponLookup, force_download: bool = False
+    ) -> list[SheetReport]:
         """
         Download and normalize all sheets from the Google Sheets URL.
+        Sheets with the same content as last time reuse their parsed recommendations.
+        Returns which sheets changed, how long they took to parse and how many of their rows had errors.
         """
 
-        async def download_sheet(sheet_name, gid) -> Path:
+        async def download_sheet(sheet_name, gid) -> tuple[Path, str]:
             """
-            Download the sheet with the given name and GID.
+            Download the sheet with the given name and GID and return its path and content hash.
             Supports local caching to avoid redundant downloads.
             """
             file_path = self.directory / f"{sheet_name}.csv"
             if file_path.exists() and not force_download:
                 logging.info(f"Skipping download of {sheet_name}.csv")
-                return file_path
+                return file_path, hashlib.sha256(file_path.read_bytes()).hexdigest()
             url = f"{self.base_url}{gid}"
             response = await self.client.get(url)
             response.raise_for_status()
-            with open(file_path, "w", newline="", encoding="utf-8") as file:
-                file.write(response.text)
-            return file_path
+            content = response.text.encode("utf-8")
+            with open(file_path, "wb") as file:
+                file.write(content)
+            return file_path, hashlib.sha256(content).hexdigest()
+
+        async def parse(path: Path, sha256: str) -> ParsedSheet:
+            previous = self.parsed_sheets.get(path.stem)
+            if previous is not None and previous.report.sha256 == sha256:
+                return previous.model_copy(
+                    update={"report": previous.report.model_copy(update={"changed": False})}
+                )
+            parsed = await loop.run_in_executor(
+                self.executor, parse_sheet, path.stem, str(path)
+            )
+            parsed.report.sha256 = sha256
+            return parsed
 
         tasks = [
             download_sheet(sheet_name, gid) for sheet_name, gid in self.sheets.items()
         ]
-        paths = await asyncio.gather(*tasks)
+        downloads = await asyncio.gather(*tasks)
 
-        for path in paths:
-            sheet_name = path.stem
-            self.normalize_sheet(sheet_name, path, weapon_lookup)
+        # All changed sheets are parsed at the same time off the event loop, only storing them happens on it
+        loop = asyncio.get_running_loop()
+        parsed_sheets = await asyncio.gather(
+            *[parse(path, sha256) for path, sha256 in downloads]
+        )
+        reports = []
+        for parsed in parsed_sheets:
+            self.apply_sheet(parsed, weapon_lookup)
+            self.parsed_sheets[parsed.report.sheet] = parsed
+            report = parsed.report
+            if report.changed:
+                logging.info(
+                    f"Parsed riven sheet {report.sheet}: {report.rows} rows in {report.duration * 1000:.0f}ms, "
+                    f"{report.errors} with errors, {report.unknown_weapons} unknown weapons"
+                )
+            reports.append(report)
+        changed = [report.sheet for report in reports if report.changed]
+        logging.info(
+            f"Changed riven sheets: {', '.join(changed) if changed else 'none'}"
+        )
+        self.last_report = reports
+        return reports
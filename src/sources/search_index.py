@@ -0,0 +1,356 @@
+import re
+from collections import Counter, OrderedDict, defaultdict
+from difflib import SequenceMatcher
+from typing import Callable, Hashable, Iterable, Optional
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    Return the trigrams of the lowercased text, padded so that short words still get some
+    """
+    padded = f"  {text.lower()} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    An inverted index from trigrams to keys, used to shortlist fuzzy search candidates.
+    Only the shortlist is scored with `difflib`, instead of every indexed name.
+    """
+
+    def __init__(self, shortlist_size: int = 64):
+        self.shortlist_size = shortlist_size
+        self.keys: list[str] = []
+        self.names: list[str] = []
+        self.postings: dict[str, list[int]] = defaultdict(list)
+
+    def build(self, items: Iterable[tuple[str, str]]):
+        """
+        Index the given `(key, name)` pairs, replacing everything indexed before
+        """
+        self.keys.clear()
+        self.names.clear()
+        self.postings.clear()
+        for key, name in items:
+            index = len(self.keys)
+            self.keys.append(key)
+            self.names.append(name.lower())
+            for trigram in trigrams(name):
+                self.postings[trigram].append(index)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(
+        self,
+        query: str,
+        n: int = 20,
+        cutoff: float = 0.35,
+    ) -> list[str]:
+        """
+        Return the keys of the best matching names, scored like `difflib.get_close_matches`.
+        Only names sharing the most trigrams with the query are scored.
+        """
+        query = query.lower()
+        overlaps: Counter[int] = Counter()
+        for trigram in trigrams(query):
+            overlaps.update(self.postings.get(trigram, ()))
+
+        limit = max(self.shortlist_size, n * 4)
+        shortlist = [index for index, _ in overlaps.most_common(limit)]
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(query)
+        scored = []
+        for index in shortlist:
+            matcher.set_seq1(self.names[index])
+            if (
+                matcher.real_quick_ratio() >= cutoff
+                and matcher.quick_ratio() >= cutoff
+                and (score := matcher.ratio()) >= cutoff
+            ):
+                scored.append((-score, self.names[index], self.keys[index]))
+        scored.sort()
+        return [key for _, _, key in scored[:n]]
+
+
+_TOKEN_SPLITTER = re.compile(r"[\s_\-]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split a name into its lowercased tokens, e.g. `MK1-Braton` into `mk1` and `braton`
+    """
+    return [token for token in _TOKEN_SPLITTER.split(text.lower()) if token]
+
+
+class _TrieNode:
+    __slots__ = ("children", "keys", "ranked", "ranked_version")
+
+    def __init__(self):
+        self.children: dict[str, "_TrieNode"] = {}
+        # All keys with a token starting with the prefix of this node
+        self.keys: set[str] = set()
+        # `keys` sorted by rank, computed on demand and reused until the ranking changes
+        self.ranked: list[str] = []
+        self.ranked_version = -1
+
+
+class PrefixTrie:
+    """
+    A trie over the tokens of names, completing queries where every token is a prefix of a name token.
+    Completions are ranked by the given score, higher first, and then by shorter names.
+    """
+
+    def __init__(self):
+        self.root = _TrieNode()
+        self.names: dict[str, str] = {}
+        # Position of every key in the overall ranking, computed once per version
+        self.order: dict[str, int] = {}
+        self.order_version = -1
+
+    def build(self, items: Iterable[tuple[str, str]]):
+        """
+        Index the given `(key, name)` pairs, replacing everything indexed before
+        """
+        self.root = _TrieNode()
+        self.names = {}
+        self.order = {}
+        self.order_version = -1
+        for key, name in items:
+            self.names[key] = name
+            self.root.keys.add(key)
+            for token in tokenize(name):
+                node = self.root
+                for char in token:
+                    node = node.children.setdefault(char, _TrieNode())
+                    node.keys.add(key)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _find(self, prefix: str) -> Optional[_TrieNode]:
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def _ranked(
+        self, node: _TrieNode, score: Callable[[str], float], version: int
+    ) -> list[str]:
+        if self.order_version != version:
+            # Scores are only evaluated here, nodes sort by the integer positions
+            ranked = sorted(
+                self.names,
+                key=lambda key: (-score(key), len(self.names[key]), self.names[key]),
+            )
+            self.order = {key: position for position, key in enumerate(ranked)}
+            self.order_version = version
+        if node.ranked_version != version:
+            node.ranked = sorted(node.keys, key=self.order.__getitem__)
+            node.ranked_version = version
+        return node.ranked
+
+    def complete(
+        self,
+        query: str,
+        n: int = 25,
+        score: Callable[[str], float] = lambda key: 0,
+        version: int = 0,
+    ) -> list[str]:
+        """
+        Return the keys of the best ranked names matching all tokens of the query.
+        `version` has to change whenever `score` does, it invalidates the cached rankings.
+        Each node is sorted once per version, after that a completion walks at most its
+        first matches, so the score should change on a schedule and not with every lookup.
+        """
+        nodes = []
+        for token in tokenize(query) or [""]:
+            node = self._find(token)
+            if node is None:
+                return []
+            nodes.append(node)
+
+        # Walk the smallest ranked candidate list and check the other tokens against it
+        nodes.sort(key=lambda node: len(node.keys))
+        others = [node.keys for node in nodes[1:]]
+        matches = []
+        for key in self._ranked(nodes[0], score, version):
+            if any(key not in keys for keys in others):
+                continue
+            matches.append(key)
+            if len(matches) >= n:
+                break
+        return matches
+
+
+def damerau_levenshtein(a: str, b: str, limit: Optional[int] = None) -> int:
+    """
+    Return the optimal string alignment distance: insertions, deletions, substitutions and
+    transpositions of adjacent characters each count as one edit.
+    With a `limit`, any distance above it is returned as `limit + 1`, which is much faster.
+    """
+    if a == b:
+        return 0
+    if limit is not None and abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if not a or not b:
+        distance = len(a) + len(b)
+        return distance if limit is None else min(distance, limit + 1)
+    if limit is not None:
+        return _bounded_damerau_levenshtein(a, b, limit)
+
+    previous_previous: list[int] = []
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            cost = 0 if char_a == char_b else 1
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + cost,
+            )
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+def _bounded_damerau_levenshtein(a: str, b: str, limit: int) -> int:
+    # Cells further than `limit` from the diagonal always exceed it, so only the band in
+    # between is computed and everything outside counts as `limit + 1`
+    too_far = limit + 1
+    previous_previous: list[int] = []
+    previous = [j if j <= limit else too_far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        char_a = a[i - 1]
+        current = [too_far] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        row_minimum = current[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            char_b = b[j - 1]
+            distance = previous[j - 1] + (char_a != char_b)
+            if previous[j] + 1 < distance:
+                distance = previous[j] + 1
+            if current[j - 1] + 1 < distance:
+                distance = current[j - 1] + 1
+            if (
+                i > 1
+                and j > 1
+                and char_a == b[j - 2]
+                and a[i - 2] == char_b
+                and previous_previous[j - 2] + 1 < distance
+            ):
+                distance = previous_previous[j - 2] + 1
+            current[j] = distance if distance < too_far else too_far
+            if current[j] < row_minimum:
+                row_minimum = current[j]
+        # Distances never shrink from one row to the next, once all are too large it is over
+        if row_minimum > limit:
+            return too_far
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class TypoIndex:
+    """
+    Finds every name within an edit distance of the query by scanning the names of a similar length.
+    The bounded distance gives up on most names after a row or two, which makes the scan cheaper
+    than a BK-tree, whose routing needs far more full distance computations.
+    """
+
+    def __init__(self):
+        self.by_length: dict[int, list[tuple[str, str]]] = defaultdict(list)
+        self.size = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(tokenize(text))
+
+    def build(self, items: Iterable[tuple[str, str]]):
+        """
+        Index the given `(key, name)` pairs, replacing everything indexed before
+        """
+        self.by_length.clear()
+        self.size = 0
+        for key, name in items:
+            text = self.normalize(name)
+            self.by_length[len(text)].append((text, key))
+            self.size += 1
+
+    def __len__(self):
+        return self.size
+
+    def search(self, query: str, max_distance: int = 2) -> list[tuple[int, str]]:
+        """
+        Return `(distance, key)` for every name within `max_distance` edits, closest first
+        """
+        query = self.normalize(query)
+        matches = []
+        # Names differing in length by more than `max_distance` are always too far away
+        for length in range(len(query) - max_distance, len(query) + max_distance + 1):
+            for text, key in self.by_length.get(length, ()):
+                distance = damerau_levenshtein(query, text, max_distance)
+                if distance <= max_distance:
+                    matches.append((distance, key))
+        matches.sort()
+        return matches
+
+
+class QueryCache:
+    """
+    A size bounded LRU cache for search results.
+    Results are only valid for one version of the searched data, a new version drops all of them.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[Hashable, list[str]] = OrderedDict()
+        self.version: Hashable = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self, version: Hashable):
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[list[str]]:
+        self._check_version(version)
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: Hashable, version: Hashable, result: list[str]):
+        self._check_version(version)
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
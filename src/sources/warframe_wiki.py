@@ -1,10 +1,29 @@
 import httpx
-from utils.http import HardenedHttpClient, DEFAULT_SUCCESS_CODES
-from model.weapon import Weapon, RivenDisposition, WeaponModType
-from bs4 import BeautifulSoup
-from typing import Optional
-import re
-from .weapon_lookup import WeaponLookup
+from utils.http import (
+    HardenedHttpClient,
+    HttpCache,
+    SingleFlight,
+    REVALIDATION_SUCCESS_CODES,
+)
+from model.weapon import Weapon
+from pydantic import BaseModel
+from typing import Callable, Optional, TypeVar
+from concurrent.futures import Executor
+import asyncio
+import logging
+import time
+from .weapon_lookup import RivenRecommendations, WeaponLookup
+from .weapon_cache import WeaponCache
+from .wiki_parser import WikiParser, StreamingWikiParser
+
+T = TypeVar("T")
+
+
+class PrefetchReport(BaseModel):
+    total: int = 0
+    fetched: int = 0
+    failed: dict[str, str] = {}
+    duration: float = 0.0
 
 
 class WarframeWiki:
@@ -13,13 +32,38 @@ class WarframeWiki:
     """
 
     def __init__(
-        self, weapon_lookup: WeaponLookup = WeaponLookup(), timeout: int = 10_000
+        self,
+        weapon_lookup: WeaponLookup = WeaponLookup(),
+        timeout: int = 10_000,
+        cache: Optional[WeaponCache] = None,
+        executor: Optional[Executor] = None,
+        parser: Optional[WikiParser] = None,
+        http_cache: Optional[HttpCache] = None,
     ):
         self.base_url = "https://wiki.warframe.com"
         self.client = HardenedHttpClient(
-            httpx.AsyncClient(timeout=timeout), success_codes=DEFAULT_SUCCESS_CODES
+            httpx.AsyncClient(timeout=timeout),
+            success_codes=REVALIDATION_SUCCESS_CODES,
+            cache=http_cache,
         )  # Initialize the HTTP client
         self.weapon_lookup = weapon_lookup
+        self.cache = cache
+        self.single_flight = SingleFlight()
+        # Parsing large pages blocks for a long time, so it runs in this executor.
+        # `None` uses the default thread pool of the event loop.
+        self.executor = executor
+        self.parser = parser or StreamingWikiParser()
+        # Wiki data of the last run restored from the data store, keyed by normalized name
+        self.weapon_data: dict[str, Weapon] = {}
+        # Bumped whenever the wiki data of a weapon is loaded
+        self.generation = 0
+
+    async def _run_parser(self, parser: Callable[..., T], *args) -> T:
+        """
+        Run a parsing function off the event loop
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, parser, *args)
 
     async def weapon(self, weapon_name: str) -> Weapon:
         """
@@ -28,88 +72,150 @@ class WarframeWiki:
         if weapon_name not in self.weapon_lookup:
             return None
 
-        url = self.base_url + self.weapon_lookup[weapon_name].wiki_url
-        response = await self.client.get(url)
-        response.raise_for_status()
+        entry = self.weapon_lookup[weapon_name]
+        key = entry.normalized_name
+        if key in self.weapon_data:
+            return self.weapon_data[key]
 
-        soup = BeautifulSoup(response.text, features="html.parser")
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
 
-        header_contanier = soup.find("h1", id="firstHeading").find("span")
-        name = header_contanier.text
+        # Concurrent lookups of the same weapon share a single download and parse
+        return await self.single_flight.do(
+            key, lambda: self._fetch_weapon(key, entry.wiki_url)
+        )
 
-        image_span = soup.find("span", class_="main-image")
-        image_link = None
-        if image_span:
-            image_container = image_span.find("img")
-            image_link = (
-                self.base_url + image_container.attrs["src"]
-                if image_container and "src" in image_container.attrs
-                else None
-            )
+    async def _fetch_weapon(self, key: str, wiki_url: str) -> Weapon:
+        """
+        Download and parse a weapon page, revalidating a stale cache entry if present
+        """
+        # Revalidate stale entries instead of downloading the whole page again
+        stale = self.cache.peek(key) if self.cache is not None else None
+        headers = stale.revalidation_headers() if stale else {}
 
-        def extract_data(data_source: str) -> Optional[str]:
-            link_a = soup.find("a", string=data_source)
-            if link_a:
-                row = link_a.find_parent("div").find_parent("div")
-                value_column = row.find("div", class_="value")
-                if value_column:
-                    return value_column.text
-            return None
+        url = self.base_url + wiki_url
+        # Parsed pages are already cached, there is no need to keep their HTML as well
+        response = await self.client.get(
+            url, headers=headers, use_cache=self.cache is None
+        )
+        if stale and response.status_code == 304:
+            return self.cache.revalidated(key)
+        response.raise_for_status()
 
-        raw_disposition = extract_data("Disposition")
-        match = re.search(r"([●○]+)\s\(([\d\.]+)x\)", raw_disposition)
-        if match:
-            disposition_symbol = match.group(1)
-            disposition_value = float(match.group(2))
-            disposition = RivenDisposition(
-                disposition=disposition_value, symbol=disposition_symbol
-            )
-        else:
-            disposition = RivenDisposition()
-        weapon_type = extract_data("Type")
-        slot = extract_data("Slot")
-        raw_mastery = extract_data("Mastery Rank Requirement")
-        if raw_mastery:
-            mastery = int(raw_mastery)
-        else:
-            mastery = None
-        mod_type = WeaponModType.from_raw_data(slot, weapon_type)
-
-        return Weapon(
-            name=name,
-            url=url,
-            image=image_link,
-            riven_disposition=disposition,
-            mr=mastery,
-            weapon_type=weapon_type,
-            slot=slot,
-            mod_type=mod_type,
+        weapon = await self._run_parser(
+            self.parser.parse_weapon_page, response.text, url, self.base_url
         )
+        if self.cache is not None:
+            self.cache.put(
+                key,
+                weapon,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+        self.generation += 1
+        return weapon
+
+    def known_weapons(self) -> dict[str, Weapon]:
+        """
+        Return the wiki data of every weapon that is available without a request, by normalized name.
+        Stale cache entries are included, dispositions rarely change.
+        """
+        weapons = {}
+        for key in self.weapon_lookup.weapon_lookup:
+            if key in self.weapon_data:
+                weapons[key] = self.weapon_data[key]
+            elif self.cache is not None:
+                entry = self.cache.peek(key)
+                if entry is not None:
+                    weapons[key] = entry.weapon
+        return weapons
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """
+        Report the cache and request coalescing metrics
+        """
+        stats = {"single_flight": self.single_flight.stats()}
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
 
     def mark_riven_capable(self, weapon_name: str):
         """
         Mark a weapon as riven capable
         """
-        if weapon_name in self.weapon_lookup:
-            self.weapon_lookup[weapon_name].can_have_rivens = True
+        if weapon_name not in self.weapon_lookup:
+            return
+        entry = self.weapon_lookup[weapon_name]
+        # Entries are copies and riven capability follows from the recommendations,
+        # so a weapon without any gets an empty set through the setter
+        if not entry.can_have_rivens:
+            self.weapon_lookup.set_riven_recommendations(
+                weapon_name,
+                RivenRecommendations(
+                    weapon=entry.display_name.upper(), comment=None, stats=[]
+                ),
+            )
+
+    async def prefetch(
+        self,
+        concurrency: int = 8,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> PrefetchReport:
+        """
+        Fetch and parse every riven capable weapon, so later lookups are served from the cache.
+        Failing weapons are reported and skipped, they will be fetched on demand instead.
+        """
+        report = PrefetchReport()
+        if self.cache is None:
+            logging.warning("Skipping wiki prefetch, no weapon cache is configured")
+            return report
+
+        weapon_names = [
+            weapon.normalized_name for weapon in self.weapon_lookup.riven_capable_weapons()
+        ]
+        report.total = len(weapon_names)
+        semaphore = asyncio.Semaphore(concurrency)
+        start = time.perf_counter()
+        done = 0
+
+        async def fetch(weapon_name: str):
+            nonlocal done
+            async with semaphore:
+                try:
+                    await self.weapon(weapon_name)
+                    report.fetched += 1
+                except Exception as e:
+                    report.failed[weapon_name] = str(e)
+            done += 1
+            if progress:
+                progress(done, report.total)
+            if done % 50 == 0 or done == report.total:
+                logging.info(f"Prefetched {done}/{report.total} wiki weapon pages")
+
+        await asyncio.gather(*[fetch(weapon_name) for weapon_name in weapon_names])
+        report.duration = time.perf_counter() - start
+
+        if report.failed:
+            logging.warning(
+                f"Failed to prefetch {len(report.failed)} weapons: {', '.join(report.failed)}"
+            )
+        return report
 
     async def refresh(self):
         """
-        Refresh the wiki data
+        Refresh the wiki data. Weapon pages are fetched on demand, or by `prefetch`
+        once the riven recommendations are attached to the lookup.
         """
         weapon_base_url = f"{self.base_url}/w/Weapons#Primary"
         response = await self.client.get(weapon_base_url)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, features="html.parser")
-        table = soup.find("div", class_="tabbertab")
-        if table:
-            weapons = table.find_all("span", style="border-bottom:2px dotted; color:;")
-            for weapon in weapons:
-                link = weapon.find_parent("a")
-                if link and "href" in link.attrs:
-                    self.weapon_lookup.add(
-                        weapon.get_text().replace("\xa0", " "), link["href"]
-                    )
+        weapons = await self._run_parser(
+            self.parser.parse_weapon_list, response.text
+        )
+        for weapon_name, href in weapons:
+            self.weapon_lookup.add(weapon_name, href)
 
         # Manually add the kitgun chambers since they are not in the weapon list
         self.weapon_lookup.add("Catchmoon", "/w/Catchmoon")
@@ -0,0 +1,167 @@
+from pydantic import BaseModel
+from model.weapon import Weapon
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+import logging
+import time
+
+DEFAULT_WEAPON_CACHE_TTL = 7 * 24 * 60 * 60  # one week, dispositions change roughly once a quarter
+DEFAULT_WEAPON_CACHE_SIZE = 2048
+
+
+class WeaponCacheEntry(BaseModel):
+    weapon: Weapon
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def revalidation_headers(self) -> dict[str, str]:
+        """
+        Return the headers needed to make a conditional request for this entry
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class WeaponCache:
+    """
+    A size bounded cache for parsed wiki weapon pages.
+    Entries are served from memory and mirrored to disk, so they survive restarts.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = "./wiki_cache",
+        ttl: float = DEFAULT_WEAPON_CACHE_TTL,
+        max_entries: int = DEFAULT_WEAPON_CACHE_SIZE,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, WeaponCacheEntry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+        self.directory = Path(path) if path else None
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._load()
+
+    def _file_path(self, key: str) -> Path:
+        return self.directory / f"{key.replace('/', '%2F')}.json"
+
+    def _load(self):
+        """
+        Load all persisted entries, oldest first so the LRU order survives restarts
+        """
+        loaded = []
+        for file_path in self.directory.glob("*.json"):
+            try:
+                entry = WeaponCacheEntry.model_validate_json(file_path.read_text("utf-8"))
+            except Exception as e:
+                logging.error(f"Dropping unreadable weapon cache file `{file_path}`: {e}")
+                file_path.unlink(missing_ok=True)
+                continue
+            key = file_path.stem.replace("%2F", "/")
+            loaded.append((entry.fetched_at, key, entry))
+
+        for _, key, entry in sorted(loaded, key=lambda e: e[0]):
+            self.entries[key] = entry
+        self._evict()
+
+    def _persist(self, key: str, entry: WeaponCacheEntry):
+        if not self.directory:
+            return
+        try:
+            self._file_path(key).write_text(entry.model_dump_json(), "utf-8")
+        except OSError as e:
+            logging.error(f"Failed to persist weapon cache entry `{key}`: {e}")
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            key, _ = self.entries.popitem(last=False)
+            self.evictions += 1
+            if self.directory:
+                self._file_path(key).unlink(missing_ok=True)
+
+    def is_fresh(self, entry: WeaponCacheEntry, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return now - entry.fetched_at < self.ttl
+
+    def get(self, key: str) -> Optional[Weapon]:
+        """
+        Return the cached weapon if it is still fresh, counting hits and misses
+        """
+        entry = self.entries.get(key)
+        if entry is None or not self.is_fresh(entry):
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry.weapon
+
+    def peek(self, key: str) -> Optional[WeaponCacheEntry]:
+        """
+        Return the entry for the key even if it is stale, e.g. to revalidate it
+        """
+        return self.entries.get(key)
+
+    def put(
+        self,
+        key: str,
+        weapon: Weapon,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        entry = WeaponCacheEntry(
+            weapon=weapon,
+            fetched_at=time.time(),
+            etag=etag,
+            last_modified=last_modified,
+        )
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        self._persist(key, entry)
+        self._evict()
+
+    def revalidated(self, key: str) -> Optional[Weapon]:
+        """
+        Mark a stale entry as fresh again after the server confirmed it is unchanged
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        entry.fetched_at = time.time()
+        self.entries.move_to_end(key)
+        self.revalidations += 1
+        self._persist(key, entry)
+        return entry.weapon
+
+    def clear(self):
+        if self.directory:
+            for key in self.entries:
+                self._file_path(key).unlink(missing_ok=True)
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -1,7 +1,22 @@
 from pydantic import BaseModel
-import difflib
 from model.rivens import RivenEffect
-from typing import Optional
+from model.weapon import WeaponModType
+from sources.search_index import (
+    PrefixTrie,
+    QueryCache,
+    TrigramIndex,
+    TypoIndex,
+    tokenize,
+)
+from collections import Counter
+from typing import Callable, Iterator, Optional, TypeVar, Union
+import re
+import sys
+import time
+
+
+T = TypeVar("T")
+SearchIndex = Union[TrigramIndex, PrefixTrie, TypoIndex]
 
 
 class WantedRivenStats(BaseModel):
@@ -24,6 +39,7 @@ class WeaponLookupEntry(BaseModel):
     median_plat_price: Optional[float] = None
     weapon_variants: Optional[list[str]] = None
     base_weapon: Optional[str] = None
+    mod_type: Optional[WeaponModType] = None
 
     @property
     def is_base_weapon(self):
@@ -46,26 +62,165 @@ class WeaponLookupEntry(BaseModel):
         return f"https://warframe.market/auctions/search?type=riven&weapon_url_name={wf_market_weapon_name}&polarity=any&sort_by=price_asc"
 
 
+class WeaponRecord:
+    """
+    Compact storage of a lookup entry. Names are interned and recommendations are referenced by id,
+    so variants sharing the recommendations of their base weapon don't hold their own copy.
+    """
+
+    __slots__ = (
+        "display_name",
+        "wiki_url",
+        "normalized_name",
+        "recommendations_id",
+        "median_plat_price",
+        "weapon_variants",
+        "base_weapon",
+        "mod_type",
+    )
+
+    def __init__(self, display_name: str, wiki_url: str, normalized_name: str):
+        self.display_name = sys.intern(display_name)
+        self.wiki_url = sys.intern(wiki_url)
+        self.normalized_name = sys.intern(normalized_name)
+        self.recommendations_id: Optional[int] = None
+        self.median_plat_price: Optional[float] = None
+        self.weapon_variants: Optional[tuple[str, ...]] = None
+        self.base_weapon: Optional[str] = None
+        self.mod_type: Optional[WeaponModType] = None
+
+
 class WeaponLookup:
     """
-    A unified weapon lokup class to collect displaynames and URLs for weapons
+    A unified weapon lokup class to collect displaynames and URLs for weapons.
+    Weapons are stored as compact records and returned as `WeaponLookupEntry` models, so changes
+    have to go through the setters. They also keep the secondary indexes up to date.
     """
 
-    def __init__(self):
-        self.weapon_lookup: dict[str, WeaponLookupEntry] = {}
+    def __init__(self, query_cache_size: int = 1024, rerank_interval: float = 300):
+        self.weapon_lookup: dict[str, WeaponRecord] = {}
+        # Every distinct recommendation set, keyed by the id the records refer to
+        self.recommendations: dict[int, RivenRecommendations] = {}
+        # Bumped on every change that can affect search or query results
+        self.generation = 0
+        # Secondary indexes of normalized names
+        self.riven_capable: set[str] = set()
+        self.by_mod_type: dict[WeaponModType, set[str]] = {}
+        # Base weapon to the whole family, sorted for display: shortest names first
+        self.families: dict[str, list[str]] = {}
+        # Search indexes by type and scope, `True` only covers riven capable weapons. Built on demand.
+        self._search_indexes: dict[tuple[type, bool], SearchIndex] = {}
+        # How often each weapon was looked up, shared with the lookups of later refreshes
+        self.popularity: Counter[str] = Counter()
+        # Searches rank by a snapshot of the popularity, taken at most every `rerank_interval` seconds.
+        # Every new snapshot invalidates the cached results and rankings, so it must not happen per lookup.
+        self.ranking: dict[str, int] = {}
+        self.rerank_interval = rerank_interval
+        self._ranking_version = 0
+        self._ranked_at: Optional[float] = None
+        self._popularity_changed = False
+        self.query_cache = QueryCache(query_cache_size)
 
     def _normalize_weapon_name(self, weapon_name: str) -> str:
         return weapon_name.replace(" ", "_").lower()
 
+    def _entry(self, record: WeaponRecord) -> WeaponLookupEntry:
+        # Built without validation, every value was validated when it was stored
+        return WeaponLookupEntry.model_construct(
+            display_name=record.display_name,
+            wiki_url=record.wiki_url,
+            normalized_name=record.normalized_name,
+            riven_recommendations=self.recommendations.get(record.recommendations_id),
+            median_plat_price=record.median_plat_price,
+            weapon_variants=(
+                list(record.weapon_variants)
+                if record.weapon_variants is not None
+                else None
+            ),
+            base_weapon=record.base_weapon,
+            mod_type=record.mod_type,
+        )
+
+    def _record(self, weapon_name: str) -> WeaponRecord:
+        return self.weapon_lookup[self._normalize_weapon_name(weapon_name)]
+
+    def _store_recommendations(
+        self, recommendations: Optional[RivenRecommendations]
+    ) -> Optional[int]:
+        if recommendations is None:
+            return None
+        recommendations_id = id(recommendations)
+        self.recommendations.setdefault(recommendations_id, recommendations)
+        return recommendations_id
+
     def add(self, weapon_name: str, url: str):
         normalized_name = self._normalize_weapon_name(weapon_name)
-        self.weapon_lookup[normalized_name] = WeaponLookupEntry(
-            display_name=weapon_name, wiki_url=url, normalized_name=normalized_name
+        self._add_record(WeaponRecord(weapon_name, url, normalized_name))
+
+    def add_entry(self, entry: WeaponLookupEntry):
+        """
+        Add a complete entry, e.g. from a snapshot, and index it
+        """
+        record = WeaponRecord(entry.display_name, entry.wiki_url, entry.normalized_name)
+        record.recommendations_id = self._store_recommendations(
+            entry.riven_recommendations
         )
+        record.median_plat_price = entry.median_plat_price
+        if entry.weapon_variants is not None:
+            record.weapon_variants = tuple(map(sys.intern, entry.weapon_variants))
+        if entry.base_weapon is not None:
+            record.base_weapon = sys.intern(entry.base_weapon)
+        record.mod_type = entry.mod_type
+        self._add_record(record)
+
+    def _add_record(self, record: WeaponRecord):
+        self._unindex(record.normalized_name)
+        self.weapon_lookup[record.normalized_name] = record
+        if record.recommendations_id is not None:
+            self.riven_capable.add(record.normalized_name)
+        if record.mod_type is not None:
+            self.by_mod_type.setdefault(record.mod_type, set()).add(
+                record.normalized_name
+            )
+        self._drop_search_indexes()
+        self.generation += 1
+
+    def _unindex(self, normalized_name: str):
+        previous = self.weapon_lookup.get(normalized_name)
+        if previous is None:
+            return
+        self.riven_capable.discard(normalized_name)
+        if previous.mod_type is not None:
+            self.by_mod_type.get(previous.mod_type, set()).discard(normalized_name)
+
+    def set_riven_recommendations(
+        self, weapon_name: str, recommendations: Optional[RivenRecommendations]
+    ):
+        record = self._record(weapon_name)
+        record.recommendations_id = self._store_recommendations(recommendations)
+        if recommendations is None:
+            self.riven_capable.discard(record.normalized_name)
+        else:
+            self.riven_capable.add(record.normalized_name)
+        self._drop_search_indexes(can_have_rivens=True)
+        self.generation += 1
+
+    def set_mod_type(self, weapon_name: str, mod_type: Optional[WeaponModType]):
+        record = self._record(weapon_name)
+        self._unindex(record.normalized_name)
+        record.mod_type = mod_type
+        if record.recommendations_id is not None:
+            self.riven_capable.add(record.normalized_name)
+        if mod_type is not None:
+            self.by_mod_type.setdefault(mod_type, set()).add(record.normalized_name)
+        self.generation += 1
+
+    def set_median_plat_price(self, weapon_name: str, price: Optional[float]):
+        self._record(weapon_name).median_plat_price = price
+        self.generation += 1
 
     def __getitem__(self, key: str) -> WeaponLookupEntry:
-        normalized = self._normalize_weapon_name(key)
-        return self.weapon_lookup[normalized]
+        return self._entry(self._record(key))
 
     def __contains__(self, key: str) -> bool:
         normalized = self._normalize_weapon_name(key)
@@ -74,50 +229,210 @@ class WeaponLookup:
     def __len__(self):
         return len(self.weapon_lookup)
 
+    def entries(self) -> Iterator[WeaponLookupEntry]:
+        for record in self.weapon_lookup.values():
+            yield self._entry(record)
+
+    def _entries(self, names) -> list[WeaponLookupEntry]:
+        return [self._entry(self.weapon_lookup[name]) for name in names]
+
+    def riven_capable_weapons(self) -> list[WeaponLookupEntry]:
+        return self._entries(self.riven_capable)
+
+    def weapons_by_mod_type(self, mod_type: WeaponModType) -> list[WeaponLookupEntry]:
+        return self._entries(self.by_mod_type.get(mod_type, ()))
+
+    def weapon_family(self, weapon_name: str) -> list[WeaponLookupEntry]:
+        """
+        Return the base weapon and all its variants, or only the weapon if it has no family
+        """
+        record = self._record(weapon_name)
+        base = record.base_weapon or record.normalized_name
+        return self._entries(self.families.get(base, [record.normalized_name]))
+
+    def _search_index(self, index_type: type[T], can_have_rivens: bool) -> T:
+        # The indexes are rebuilt at most once per refresh, on the first search after weapons were added
+        index = self._search_indexes.get((index_type, can_have_rivens))
+        if index is None:
+            keys = self.riven_capable if can_have_rivens else self.weapon_lookup
+            index = index_type()
+            index.build((key, self.weapon_lookup[key].display_name) for key in keys)
+            self._search_indexes[(index_type, can_have_rivens)] = index
+        return index
+
+    def _drop_search_indexes(self, can_have_rivens: Optional[bool] = None):
+        for key in list(self._search_indexes):
+            if can_have_rivens is None or key[1] == can_have_rivens:
+                del self._search_indexes[key]
+
+    def record_lookup(self, weapon_name: str):
+        """
+        Count a lookup of the weapon, popular weapons are ranked first in `autocomplete`
+        once the ranking is refreshed
+        """
+        self.popularity[self._normalize_weapon_name(weapon_name)] += 1
+        self._popularity_changed = True
+
+    def rerank(self):
+        """
+        Rank searches by the current popularity right away
+        """
+        self.ranking = dict(self.popularity)
+        self._ranking_version += 1
+        self._ranked_at = time.monotonic()
+        self._popularity_changed = False
+
+    def _update_ranking(self):
+        if self._ranked_at is None or (
+            self._popularity_changed
+            and time.monotonic() - self._ranked_at >= self.rerank_interval
+        ):
+            self.rerank()
+
+    def _rank(self, key: str) -> int:
+        return self.ranking.get(key, 0)
+
+    def _cached_search(
+        self, key: tuple, search: Callable[[], list[str]]
+    ) -> list[WeaponLookupEntry]:
+        self._update_ranking()
+        version = (self.generation, self._ranking_version)
+        matches = self.query_cache.get(key, version)
+        if matches is None:
+            matches = search()
+            self.query_cache.put(key, version, matches)
+        return self._entries(matches)
+
+    def autocomplete(
+        self, query: str, n: int = 25, can_have_rivens: bool = False
+    ) -> list[WeaponLookupEntry]:
+        """
+        Return the most popular weapons where every token of the query starts a token of the name,
+        e.g. `kuva b` matches `Kuva Bramma`. Falls back to `fuzzy_search` if nothing matches.
+        """
+        query = " ".join(tokenize(query))
+
+        def search() -> list[str]:
+            prefix_trie = self._search_index(PrefixTrie, can_have_rivens)
+            matches = prefix_trie.complete(
+                query,
+                n=n,
+                score=self._rank,
+                version=self._ranking_version,
+            )
+            if not matches:
+                search_index = self._search_index(TrigramIndex, can_have_rivens)
+                matches = search_index.search(query, n=n)
+            return matches
+
+        key = ("autocomplete", query, n, can_have_rivens)
+        return self._cached_search(key, search)
+
     def fuzzy_search(
         self, weapon_name: str, n: int = 20, cutoff=0.35, can_have_rivens: bool = False
     ) -> list[WeaponLookupEntry]:
-        if can_have_rivens:
-            weapon_names = [
-                w.display_name for w in self.weapon_lookup.values() if w.can_have_rivens
-            ]
-        else:
-            weapon_names = [w.display_name for w in self.weapon_lookup.values()]
-        matches = difflib.get_close_matches(
-            weapon_name, weapon_names, n=n, cutoff=cutoff
+        def search() -> list[str]:
+            search_index = self._search_index(TrigramIndex, can_have_rivens)
+            return search_index.search(weapon_name, n=n, cutoff=cutoff)
+
+        key = ("fuzzy", weapon_name.lower(), n, cutoff, can_have_rivens)
+        return self._cached_search(key, search)
+
+    def typo_search(
+        self,
+        weapon_name: str,
+        max_distance: int = 2,
+        n: int = 5,
+        can_have_rivens: bool = False,
+    ) -> list[WeaponLookupEntry]:
+        """
+        Return the weapons at most `max_distance` typos away, counting swapped letters as one typo.
+        Closest weapons come first, equally close ones are ranked by popularity.
+        """
+
+        def search() -> list[str]:
+            typo_index = self._search_index(TypoIndex, can_have_rivens)
+            matches = typo_index.search(weapon_name, max_distance=max_distance)
+            matches.sort(key=lambda match: (match[0], -self._rank(match[1]), match[1]))
+            return [key for _, key in matches[:n]]
+
+        key = ("typo", TypoIndex.normalize(weapon_name), max_distance, n, can_have_rivens)
+        return self._cached_search(key, search)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """
+        Report the search cache metrics
+        """
+        return {"query_cache": self.query_cache.stats()}
+
+    def _set_family(self, base: str, variants: list[str]):
+        self.families[base] = sorted(
+            [base, *variants],
+            key=lambda name: (
+                len(self.weapon_lookup[name].display_name),
+                self.weapon_lookup[name].display_name,
+            ),
         )
-        if len(matches) > 0:
-            return [self[match] for match in matches]
-        return []
+
+    def _base_candidates(self, weapon_name: str) -> list[str]:
+        """
+        Return every name left after stripping leading and/or trailing tokens, longest first
+        and names from the start before later ones of the same length.
+        `prisma_dual_cleavers` yields `prisma_dual`, `dual_cleavers`, `prisma`, `dual` and `cleavers`.
+        """
+        # Tokens with the separator in front of them, so stripped names keep their separators
+        parts = re.findall(r"[_-]?[^_-]+", weapon_name)
+        candidates = []
+        for length in range(len(parts) - 1, 0, -1):
+            for start in range(len(parts) - length + 1):
+                candidates.append("".join(parts[start : start + length]).lstrip("_-"))
+        return candidates
 
     def rebuild_weapon_relations(self):
         """
-        Rebuild the weapon relations for all weapons in the lookup
-        """
-        for weapon in self.weapon_lookup.values():
-            weapon_name = weapon.normalized_name
-            for splitter in ["_", "-"]:
-                without_prefix = splitter.join(weapon_name.split(splitter)[1:])
-                without_postfix = splitter.join(weapon_name.split(splitter)[:-1])
-
-                for potential_base in [without_prefix, without_postfix]:
-                    # Handle weapons without prefixes or postfixes
-                    if potential_base == weapon_name:
-                        continue
-
-                    # check if the potential_base is in the lookup
-                    if potential_base in self.weapon_lookup:
-                        base_weapon = self.weapon_lookup[potential_base]
-                        # link the weapon to the base weapon
-                        weapon.base_weapon = base_weapon.normalized_name
-
-                        # set the riven recommendations of the weapon if the base weapon has riven recommendations
-                        if base_weapon.riven_recommendations is not None:
-                            weapon.riven_recommendations = (
-                                base_weapon.riven_recommendations
-                            )
-
-                        # add the weapon variant to the base weapons variants
-                        if base_weapon.weapon_variants is None:
-                            base_weapon.weapon_variants = []
-                        base_weapon.weapon_variants.append(weapon.normalized_name)
+        Rebuild the weapon relations for all weapons in the lookup.
+        Each weapon is linked to the longest weapon name left after stripping its prefixes or
+        postfixes, and then to the base of that weapon. Rebuilding gives the same result every time.
+        """
+        parents = {}
+        for weapon_name in self.weapon_lookup:
+            for candidate in self._base_candidates(weapon_name):
+                if candidate in self.weapon_lookup:
+                    parents[weapon_name] = candidate
+                    break
+
+        def root(weapon_name: str) -> str:
+            seen = {weapon_name}
+            while weapon_name in parents and parents[weapon_name] not in seen:
+                weapon_name = parents[weapon_name]
+                seen.add(weapon_name)
+            return weapon_name
+
+        variants: dict[str, list[str]] = {}
+        for weapon_name, record in self.weapon_lookup.items():
+            record.weapon_variants = None
+            base = root(weapon_name) if weapon_name in parents else None
+            record.base_weapon = base if base != weapon_name else None
+            if record.base_weapon is not None:
+                variants.setdefault(record.base_weapon, []).append(weapon_name)
+
+        self.families = {}
+        for base, names in variants.items():
+            base_record = self.weapon_lookup[base]
+            base_record.weapon_variants = tuple(sorted(names))
+            self._set_family(base, names)
+            # Variants share the riven recommendations of their base weapon
+            if base_record.recommendations_id is not None:
+                for weapon_name in names:
+                    self.weapon_lookup[weapon_name].recommendations_id = (
+                        base_record.recommendations_id
+                    )
+                    self.riven_capable.add(weapon_name)
+
+        # Drop recommendation sets no weapon refers to anymore
+        used = {record.recommendations_id for record in self.weapon_lookup.values()}
+        self.recommendations = {
+            key: value for key, value in self.recommendations.items() if key in used
+        }
+        self._drop_search_indexes(can_have_rivens=True)
+        self.generation += 1
@@ -0,0 +1,203 @@
+from pydantic import BaseModel
+from model.weapon import Weapon, WeaponModType
+from bisect import bisect_left, bisect_right
+from enum import Enum
+from typing import Iterable, Iterator, Mapping, Optional
+import heapq
+from .weapon_lookup import WeaponLookup, WeaponLookupEntry
+
+
+class WeaponAttribute(str, Enum):
+    Disposition = "disposition"
+    MasteryRank = "mr"
+    Price = "price"
+
+
+class WeaponQuery(BaseModel):
+    """
+    Filters over the weapon attributes, all bounds are inclusive and `None` means unbounded
+    """
+
+    mod_type: Optional[WeaponModType] = None
+    min_disposition: Optional[float] = None
+    max_disposition: Optional[float] = None
+    min_mr: Optional[int] = None
+    max_mr: Optional[int] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    order_by: WeaponAttribute = WeaponAttribute.Disposition
+    descending: bool = True
+    limit: int = 25
+
+    def ranges(self) -> dict[WeaponAttribute, tuple[Optional[float], Optional[float]]]:
+        """
+        Return the bounds of every attribute this query filters on
+        """
+        ranges = {
+            WeaponAttribute.Disposition: (self.min_disposition, self.max_disposition),
+            WeaponAttribute.MasteryRank: (self.min_mr, self.max_mr),
+            WeaponAttribute.Price: (self.min_price, self.max_price),
+        }
+        return {
+            attribute: bounds
+            for attribute, bounds in ranges.items()
+            if bounds != (None, None)
+        }
+
+
+class WeaponQueryResult(BaseModel):
+    weapon: WeaponLookupEntry
+    mod_type: Optional[WeaponModType] = None
+    disposition: Optional[float] = None
+    mr: Optional[int] = None
+    median_plat_price: Optional[float] = None
+
+
+class SortedIndex:
+    """
+    Weapon names sorted by one attribute, so ranges are found by bisection instead of a scan.
+    Weapons without a value for the attribute are not part of the index.
+    """
+
+    def __init__(self, values: Iterable[tuple[float, str]]):
+        ordered = sorted(values)
+        self.values = [value for value, _ in ordered]
+        self.keys = [key for _, key in ordered]
+
+    def bounds(self, low: Optional[float], high: Optional[float]) -> tuple[int, int]:
+        start = 0 if low is None else bisect_left(self.values, low)
+        end = len(self.values) if high is None else bisect_right(self.values, high)
+        return start, max(start, end)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class WeaponQueryEngine:
+    """
+    Answers attribute queries over the weapon lookup joined with the wiki data, e.g.
+    all pistols with a disposition of at least 1.3 and a median price below 100 platinum.
+    Every query starts from its most selective filter, so it only touches the weapons in that range.
+    """
+
+    def __init__(self, weapon_lookup: WeaponLookup, weapons: Mapping[str, Weapon]):
+        """
+        `weapons` holds the wiki data by normalized weapon name, weapons without it have no disposition or mastery rank
+        """
+        self.weapon_lookup = weapon_lookup
+        self.rows: dict[str, dict[WeaponAttribute, float]] = {}
+        self.mod_types: dict[str, WeaponModType] = {}
+        self.by_mod_type: dict[WeaponModType, set[str]] = {}
+
+        for key, record in weapon_lookup.weapon_lookup.items():
+            weapon = weapons.get(key)
+            price = record.median_plat_price
+            if price is None and record.base_weapon is not None:
+                # Variants are traded as their base weapon
+                price = weapon_lookup.weapon_lookup[record.base_weapon].median_plat_price
+            row = {WeaponAttribute.Price: price}
+            if weapon is not None:
+                if weapon.riven_disposition.known:
+                    row[WeaponAttribute.Disposition] = weapon.riven_disposition.disposition
+                row[WeaponAttribute.MasteryRank] = weapon.mr
+            self.rows[key] = {
+                attribute: value for attribute, value in row.items() if value is not None
+            }
+
+            mod_type = record.mod_type or (weapon.mod_type if weapon else None)
+            if mod_type is not None:
+                self.mod_types[key] = mod_type
+                self.by_mod_type.setdefault(mod_type, set()).add(key)
+
+        self.indexes = {
+            attribute: SortedIndex(
+                (row[attribute], key) for key, row in self.rows.items() if attribute in row
+            )
+            for attribute in WeaponAttribute
+        }
+
+    def _matches(
+        self,
+        key: str,
+        query: WeaponQuery,
+        ranges: dict[WeaponAttribute, tuple[Optional[float], Optional[float]]],
+    ) -> bool:
+        if query.mod_type is not None and self.mod_types.get(key) != query.mod_type:
+            return False
+        row = self.rows[key]
+        for attribute, (low, high) in ranges.items():
+            value = row.get(attribute)
+            if value is None:
+                return False
+            if low is not None and value < low:
+                return False
+            if high is not None and value > high:
+                return False
+        return True
+
+    def _ordered(self, query: WeaponQuery, start: int, end: int) -> Iterator[str]:
+        keys = self.indexes[query.order_by].keys
+        if query.descending:
+            return (keys[i] for i in range(end - 1, start - 1, -1))
+        return (keys[i] for i in range(start, end))
+
+    def search(self, query: WeaponQuery) -> list[WeaponQueryResult]:
+        """
+        Return the weapons matching every filter, ordered by `order_by`.
+        Weapons without a value for the ordered attribute are left out.
+        """
+        ranges = query.ranges()
+        # Candidates of every filter, the smallest one drives the query
+        drivers: list[tuple[int, WeaponAttribute | WeaponModType, tuple[int, int]]] = []
+        for attribute, (low, high) in ranges.items():
+            start, end = self.indexes[attribute].bounds(low, high)
+            drivers.append((end - start, attribute, (start, end)))
+        if query.mod_type is not None:
+            size = len(self.by_mod_type.get(query.mod_type, ()))
+            drivers.append((size, query.mod_type, (0, size)))
+        order_index = self.indexes[query.order_by]
+        order_bounds = (0, len(order_index))
+        if query.order_by in ranges:
+            order_bounds = order_index.bounds(*ranges[query.order_by])
+        drivers.append((order_bounds[1] - order_bounds[0], query.order_by, order_bounds))
+        # Prefer walking the ordered index on ties, it can stop after `limit` matches
+        _, driver, (start, end) = min(
+            drivers, key=lambda driver: (driver[0], driver[1] != query.order_by)
+        )
+
+        if driver == query.order_by:
+            matches = []
+            for key in self._ordered(query, start, end):
+                if self._matches(key, query, ranges):
+                    matches.append(key)
+                    if len(matches) == query.limit:
+                        break
+        else:
+            if isinstance(driver, WeaponModType):
+                candidates = self.by_mod_type.get(driver, ())
+            else:
+                candidates = self.indexes[driver].keys[start:end]
+            candidates = [
+                key
+                for key in candidates
+                if query.order_by in self.rows[key] and self._matches(key, query, ranges)
+            ]
+            select = heapq.nlargest if query.descending else heapq.nsmallest
+            # Ordered like a walk over the sorted index, ties by name
+            top = select(
+                query.limit,
+                ((self.rows[key][query.order_by], key) for key in candidates),
+            )
+            matches = [key for _, key in top]
+        return [self._result(key) for key in matches]
+
+    def _result(self, key: str) -> WeaponQueryResult:
+        row = self.rows[key]
+        mr = row.get(WeaponAttribute.MasteryRank)
+        return WeaponQueryResult(
+            weapon=self.weapon_lookup[key],
+            mod_type=self.mod_types.get(key),
+            disposition=row.get(WeaponAttribute.Disposition),
+            mr=int(mr) if mr is not None else None,
+            median_plat_price=row.get(WeaponAttribute.Price),
+        )
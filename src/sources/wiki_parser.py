@@ -0,0 +1,388 @@
+from model.weapon import Weapon, RivenDisposition, WeaponModType
+from abc import ABC, abstractmethod
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+from html.parser import HTMLParser
+from typing import Optional
+import logging
+import re
+
+WEAPON_DATA_LABELS = ("Disposition", "Type", "Slot", "Mastery Rank Requirement")
+WEAPON_LIST_SPAN_STYLE = "border-bottom:2px dotted; color:;"
+
+
+def build_weapon(
+    name: str,
+    url: str,
+    image_link: Optional[str],
+    data: dict[str, Optional[str]],
+) -> Weapon:
+    """
+    Build a weapon from the raw infobox values of its wiki page
+    """
+    raw_disposition = data.get("Disposition")
+    match = (
+        re.search(r"([●○]+)\s\(([\d\.]+)x\)", raw_disposition)
+        if raw_disposition
+        else None
+    )
+    if match:
+        disposition_symbol = match.group(1)
+        disposition_value = float(match.group(2))
+        disposition = RivenDisposition(
+            disposition=disposition_value, symbol=disposition_symbol
+        )
+    else:
+        disposition = RivenDisposition(known=False)
+    weapon_type = data.get("Type")
+    slot = data.get("Slot")
+    raw_mastery = data.get("Mastery Rank Requirement")
+    if raw_mastery:
+        mastery = int(raw_mastery)
+    else:
+        mastery = None
+    mod_type = WeaponModType.from_raw_data(slot, weapon_type)
+
+    return Weapon(
+        name=name,
+        url=url,
+        image=image_link,
+        riven_disposition=disposition,
+        mr=mastery,
+        weapon_type=weapon_type,
+        slot=slot,
+        mod_type=mod_type,
+    )
+
+
+class WikiParser(ABC):
+    """
+    Base class for the backends extracting data from wiki pages
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def parse_weapon_page(self, html: str, url: str, base_url: str) -> Weapon:
+        """
+        Extract the weapon data from a wiki page
+        """
+
+    @abstractmethod
+    def parse_weapon_list(self, html: str) -> list[tuple[str, str]]:
+        """
+        Extract the names and wiki URLs of all weapons from the weapon overview page
+        """
+
+
+class SoupWikiParser(WikiParser):
+    """
+    Builds the full DOM with BeautifulSoup, using the given tree builder
+    """
+
+    def __init__(self, features: str = "html.parser"):
+        self.features = features
+        self.name = features
+
+    def parse_weapon_page(self, html: str, url: str, base_url: str) -> Weapon:
+        soup = BeautifulSoup(html, features=self.features)
+
+        header_contanier = soup.find("h1", id="firstHeading").find("span")
+        name = header_contanier.text
+
+        image_span = soup.find("span", class_="main-image")
+        image_link = None
+        if image_span:
+            image_container = image_span.find("img")
+            image_link = (
+                base_url + image_container.attrs["src"]
+                if image_container and "src" in image_container.attrs
+                else None
+            )
+
+        def extract_data(data_source: str) -> Optional[str]:
+            link_a = soup.find("a", string=data_source)
+            if link_a:
+                row = link_a.find_parent("div").find_parent("div")
+                value_column = row.find("div", class_="value")
+                if value_column:
+                    return value_column.text
+            return None
+
+        data = {label: extract_data(label) for label in WEAPON_DATA_LABELS}
+        return build_weapon(name, url, image_link, data)
+
+    def parse_weapon_list(self, html: str) -> list[tuple[str, str]]:
+        soup = BeautifulSoup(html, features=self.features)
+        table = soup.find("div", class_="tabbertab")
+        weapons = []
+        if table:
+            spans = table.find_all("span", style=WEAPON_LIST_SPAN_STYLE)
+            for span in spans:
+                link = span.find_parent("a")
+                if link and "href" in link.attrs:
+                    weapons.append((span.get_text().replace("\xa0", " "), link["href"]))
+        return weapons
+
+
+# Elements without content, they never get an end tag
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+}
+# BeautifulSoup leaves the text of these elements out of `.text`
+HIDDEN_TEXT_ELEMENTS = {"script", "style", "template"}
+
+
+class _TextCapture:
+    """
+    Collects the text of an element until it is closed
+    """
+
+    def __init__(self):
+        self.parts: list[str] = []
+        self.closed = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+class _Element:
+    def __init__(self, tag: str, attrs: dict[str, Optional[str]]):
+        self.tag = tag
+        self.attrs = attrs
+        self.classes = (attrs.get("class") or "").split()
+        self.closed = False
+        self.capture: Optional[_TextCapture] = None
+        # Only used for divs: the first `div.value` inside, like `row.find("div", class_="value")`
+        self.value: Optional[_TextCapture] = None
+        # Only used for links: how many text nodes they contain, to emulate `.string`
+        self.text_nodes = 0
+
+
+class _StreamingExtractor(HTMLParser):
+    """
+    Walks the document without building a DOM, keeping only the stack of open elements.
+    End tags close every element up to the matching start tag, like BeautifulSoup does.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack: list[_Element] = []
+        self.captures: list[_TextCapture] = []
+        self.hidden_text = 0
+        self.done = False
+
+    def extract(self, html: str, chunk_size: int = 16_384):
+        """
+        Feed the document in chunks and stop as soon as everything was found
+        """
+        for start in range(0, len(html), chunk_size):
+            self.feed(html[start : start + chunk_size])
+            if self.done:
+                return
+        self.close()
+
+    def capture(self, element: _Element) -> _TextCapture:
+        element.capture = _TextCapture()
+        self.captures.append(element.capture)
+        return element.capture
+
+    def closest(self, tag: str, skip: int = 0) -> Optional[_Element]:
+        """
+        Return the closest open element with the given tag, skipping the first `skip` matches
+        """
+        for element in reversed(self.stack):
+            if element.tag == tag:
+                if skip == 0:
+                    return element
+                skip -= 1
+        return None
+
+    def handle_starttag(self, tag, attrs):
+        element = _Element(tag, dict(attrs))
+        if tag in HIDDEN_TEXT_ELEMENTS:
+            self.hidden_text += 1
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(element)
+        self.opened(element)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if not any(element.tag == tag for element in self.stack):
+            return
+        while self.stack:
+            element = self.stack.pop()
+            element.closed = True
+            if element.tag in HIDDEN_TEXT_ELEMENTS:
+                self.hidden_text -= 1
+            if element.capture is not None:
+                element.capture.closed = True
+                self.captures.remove(element.capture)
+            self.closed(element)
+            if element.tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.hidden_text:
+            return
+        for capture in self.captures:
+            capture.parts.append(data)
+        for element in self.stack:
+            if element.tag == "a":
+                element.text_nodes += 1
+
+    def opened(self, element: _Element):
+        pass
+
+    def closed(self, element: _Element):
+        pass
+
+
+class _WeaponPageExtractor(_StreamingExtractor):
+    """
+    Extracts the name, image and infobox values of a weapon page
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.heading: Optional[_Element] = None
+        self.name: Optional[_TextCapture] = None
+        self.image_span: Optional[_Element] = None
+        self.image_decided = False
+        self.image_src: Optional[str] = None
+        self.links: dict[_Element, Optional[_Element]] = {}
+        self.rows: dict[str, Optional[_Element]] = {}
+
+    def opened(self, element: _Element):
+        if element.tag == "div" and "value" in element.classes:
+            capture = self.capture(element)
+            for parent in self.stack[:-1]:
+                if parent.tag == "div" and parent.value is None:
+                    parent.value = capture
+        elif element.tag == "a":
+            # The second closest div, like `find_parent("div").find_parent("div")`
+            self.links[element] = self.closest("div", skip=1)
+            self.capture(element)
+        elif element.tag == "h1":
+            if self.heading is None and element.attrs.get("id") == "firstHeading":
+                self.heading = element
+        elif element.tag == "span":
+            if self.name is None and self.heading is not None and not self.heading.closed:
+                self.name = self.capture(element)
+            if self.image_span is None and "main-image" in element.classes:
+                self.image_span = element
+        elif element.tag == "img":
+            if self.image_span is not None and not self.image_decided:
+                self.image_src = element.attrs.get("src")
+                self.image_decided = True
+
+    def closed(self, element: _Element):
+        if element.tag == "a":
+            row = self.links.pop(element, None)
+            label = element.capture.text
+            # `soup.find("a", string=...)` only matches links with a single text node
+            if label in WEAPON_DATA_LABELS and label not in self.rows:
+                if element.text_nodes == 1:
+                    self.rows[label] = row
+        elif element is self.image_span:
+            self.image_decided = True
+        self.done = self.is_done()
+
+    def is_done(self) -> bool:
+        if self.name is None or not self.name.closed or not self.image_decided:
+            return False
+        for label in WEAPON_DATA_LABELS:
+            if label not in self.rows:
+                return False
+            row = self.rows[label]
+            if row is None:
+                continue
+            if row.value is None and not row.closed:
+                return False
+            if row.value is not None and not row.value.closed:
+                return False
+        return True
+
+    def value(self, label: str) -> Optional[str]:
+        row = self.rows.get(label)
+        if row is None or row.value is None:
+            return None
+        return row.value.text
+
+
+class _WeaponListExtractor(_StreamingExtractor):
+    """
+    Extracts the dotted weapon names from the first tab of the weapon overview page
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.table: Optional[_Element] = None
+        self.spans: dict[_Element, Optional[_Element]] = {}
+        self.weapons: list[tuple[str, str]] = []
+
+    def opened(self, element: _Element):
+        if element.tag == "div" and self.table is None and "tabbertab" in element.classes:
+            self.table = element
+        elif (
+            element.tag == "span"
+            and self.table is not None
+            and not self.table.closed
+            and element.attrs.get("style") == WEAPON_LIST_SPAN_STYLE
+        ):
+            self.spans[element] = self.closest("a")
+            self.capture(element)
+
+    def closed(self, element: _Element):
+        if element in self.spans:
+            link = self.spans.pop(element)
+            if link is not None and "href" in link.attrs:
+                text = element.capture.text.replace("\xa0", " ")
+                self.weapons.append((text, link.attrs["href"] or ""))
+        elif element is self.table:
+            self.done = True
+
+
+class StreamingWikiParser(WikiParser):
+    """
+    Extracts only the needed values in a single pass and stops once all of them are found.
+    Falls back to BeautifulSoup if a page does not look like a weapon page.
+    """
+
+    name = "streaming"
+
+    def __init__(self, fallback: Optional[WikiParser] = None):
+        self.fallback = fallback or SoupWikiParser()
+
+    def parse_weapon_page(self, html: str, url: str, base_url: str) -> Weapon:
+        extractor = _WeaponPageExtractor()
+        extractor.extract(html)
+        if extractor.name is None:
+            return self.fallback.parse_weapon_page(html, url, base_url)
+
+        image_link = base_url + extractor.image_src if extractor.image_src else None
+        data = {label: extractor.value(label) for label in WEAPON_DATA_LABELS}
+        return build_weapon(extractor.name.text, url, image_link, data)
+
+    def parse_weapon_list(self, html: str) -> list[tuple[str, str]]:
+        extractor = _WeaponListExtractor()
+        extractor.extract(html)
+        return extractor.weapons
+
+
+def get_wiki_parser(name: str) -> WikiParser:
+    """
+    Return the parser backend with the given name: `streaming`, `html.parser` or `lxml`
+    """
+    if name == StreamingWikiParser.name:
+        return StreamingWikiParser()
+    if builder_registry.lookup(name) is None:
+        logging.warning(f"Wiki parser backend `{name}` is not available, using `html.parser`")
+        return SoupWikiParser()
+    return SoupWikiParser(name)
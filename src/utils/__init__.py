@@ -1 +1,8 @@
-from .http import HardenedHttpClient, DEFAULT_SUCCESS_CODES, WARFRAME_API_SUCCESS_CODES
+from .http import (
+    HardenedHttpClient,
+    DEFAULT_SUCCESS_CODES,
+    WARFRAME_API_SUCCESS_CODES,
+    REVALIDATION_SUCCESS_CODES,
+    SingleFlight,
+    HttpCache,
+)
@@ -1,9 +1,177 @@
 import httpx
 import asyncio
+import hashlib
+import json
 import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
 
 DEFAULT_SUCCESS_CODES = [200, 201, 202, 203, 204, 205, 206, 207, 208]
 WARFRAME_API_SUCCESS_CODES = [200, 201, 202, 203, 204, 205, 206, 207, 208, 409]
+# Conditional requests answer with `304 Not Modified`, which must not be retried
+REVALIDATION_SUCCESS_CODES = DEFAULT_SUCCESS_CODES + [304]
+CONDITIONAL_HEADERS = ("if-none-match", "if-modified-since")
+# httpx already decoded the body, so these headers no longer describe the cached content
+DROPPED_CACHE_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+class CachedResponse:
+    """
+    A response body together with the validators needed to revalidate it
+    """
+
+    def __init__(self, url: str, headers: list[tuple[str, str]], content: bytes):
+        self.url = url
+        self.headers = headers
+        self.content = content
+
+    @classmethod
+    def from_response(cls, response: httpx.Response) -> "CachedResponse":
+        headers = [
+            (key, value)
+            for key, value in response.headers.items()
+            if key.lower() not in DROPPED_CACHE_HEADERS
+        ]
+        return cls(str(response.url), headers, response.content)
+
+    def validators(self) -> dict[str, str]:
+        headers = httpx.Headers(self.headers)
+        validators = {}
+        if "etag" in headers:
+            validators["If-None-Match"] = headers["etag"]
+        if "last-modified" in headers:
+            validators["If-Modified-Since"] = headers["last-modified"]
+        return validators
+
+    def to_response(self, request: httpx.Request) -> httpx.Response:
+        response = httpx.Response(
+            200, headers=self.headers, content=self.content, request=request
+        )
+        response.extensions["from_cache"] = True
+        return response
+
+
+class HttpCache:
+    """
+    An opt-in cache for GET responses with an ETag or Last-Modified header.
+    Cached responses are revalidated with a conditional request and a `304 Not Modified`
+    is answered with the cached body, so callers always see a normal `200` response.
+    Both the memory and the directory keep at most `max_entries` responses, the least recently used are dropped.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        # Names of the stored files, least recently used first
+        self.files: OrderedDict[str, None] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.directory = Path(path) if path else None
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._scan_files()
+
+    @staticmethod
+    def key(url: str, params=None) -> str:
+        return str(httpx.URL(url, params=params))
+
+    def _file_path(self, key: str) -> Path:
+        return self.directory / hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _scan_files(self):
+        """
+        Pick up the files of earlier runs, oldest first, and drop those over the limit
+        """
+        try:
+            stored = sorted(
+                self.directory.glob("*.json"), key=lambda file_path: file_path.stat().st_mtime
+            )
+        except OSError as e:
+            logging.error(f"Failed to list the cached responses in `{self.directory}`: {e}")
+            return
+        for file_path in stored:
+            self.files[file_path.stem] = None
+        self._prune_files()
+
+    def _touch_file(self, key: str):
+        name = self._file_path(key).name
+        if name in self.files:
+            self.files.move_to_end(name)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self.entries.get(key)
+        if entry is None and self.directory:
+            entry = self._load(key)
+        if entry is not None:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self._evict()
+            if self.directory:
+                self._touch_file(key)
+        return entry
+
+    def put(self, key: str, response: httpx.Response):
+        entry = CachedResponse.from_response(response)
+        if not entry.validators():
+            # Without validators the response can't be revalidated
+            return
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        self._evict()
+        if self.directory:
+            self._store(key, entry)
+
+    def _load(self, key: str) -> Optional[CachedResponse]:
+        file_path = self._file_path(key)
+        try:
+            meta = json.loads(file_path.with_suffix(".json").read_text("utf-8"))
+            content = file_path.with_suffix(".body").read_bytes()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"Failed to read cached response for `{key}`: {e}")
+            return None
+        return CachedResponse(meta["url"], [tuple(h) for h in meta["headers"]], content)
+
+    def _store(self, key: str, entry: CachedResponse):
+        file_path = self._file_path(key)
+        try:
+            file_path.with_suffix(".body").write_bytes(entry.content)
+            file_path.with_suffix(".json").write_text(
+                json.dumps({"url": entry.url, "headers": entry.headers}), "utf-8"
+            )
+        except OSError as e:
+            logging.error(f"Failed to store cached response for `{key}`: {e}")
+        self.files[file_path.name] = None
+        self.files.move_to_end(file_path.name)
+        self._prune_files()
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _prune_files(self):
+        while len(self.files) > self.max_entries:
+            name, _ = self.files.popitem(last=False)
+            file_path = self.directory / name
+            try:
+                file_path.with_suffix(".json").unlink(missing_ok=True)
+                file_path.with_suffix(".body").unlink(missing_ok=True)
+            except OSError as e:
+                logging.error(f"Failed to remove cached response `{name}`: {e}")
+
+    def stats(self) -> dict[str, float]:
+        requests = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+        }
 
 
 class HardenedHttpClient:
@@ -17,13 +185,42 @@ class HardenedHttpClient:
         success_codes: list[int] = DEFAULT_SUCCESS_CODES,
         retries: int = 5,
         wait_time: int = 1,
+        cache: Optional[HttpCache] = None,
     ):
         self.client = client
         self.success_codes = success_codes
         self.retries = retries
         self.wait_time = wait_time
+        self.cache = cache
+
+    async def get(self, url: str, use_cache: bool = True, **kwargs) -> httpx.Response:
+        headers = httpx.Headers(kwargs.get("headers"))
+        # Callers doing their own revalidation bypass the cache
+        if (
+            self.cache is None
+            or not use_cache
+            or any(h in headers for h in CONDITIONAL_HEADERS)
+        ):
+            return await self._get(url, self.success_codes, **kwargs)
+
+        key = self.cache.key(url, kwargs.get("params"))
+        cached = self.cache.get(key)
+        if cached is None:
+            result = await self._get(url, self.success_codes, **kwargs)
+        else:
+            headers.update(cached.validators())
+            kwargs["headers"] = headers
+            result = await self._get(url, self.success_codes + [304], **kwargs)
+            if result.status_code == 304:
+                self.cache.hits += 1
+                return cached.to_response(result.request)
+
+        self.cache.misses += 1
+        if result.status_code == 200:
+            self.cache.put(key, result)
+        return result
 
-    async def get(self, url: str, **kwargs) -> httpx.Response:
+    async def _get(self, url: str, success_codes: list[int], **kwargs) -> httpx.Response:
         retries = 0
         while retries < self.retries:
             try:
@@ -34,13 +231,44 @@ class HardenedHttpClient:
                 retries += 1
                 continue
 
-            if result.status_code in self.success_codes:
+            if result.status_code in success_codes:
                 return result
             else:
                 await asyncio.sleep(self.wait_time)
                 retries += 1
         return result
 
+    @asynccontextmanager
+    async def stream(self, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """
+        GET the url without reading the body, which can then be streamed from the response.
+        Only the request is retried, not the download of the body. The cache is bypassed
+        and a `304 Not Modified` to a conditional request is returned as is.
+        """
+        success_codes = self.success_codes + [304]
+        retries = 0
+        while True:
+            retries += 1
+            try:
+                request = self.client.build_request("GET", url, **kwargs)
+                result = await self.client.send(request, stream=True)
+            except Exception as e:
+                if retries >= self.retries:
+                    raise
+                logging.debug(f"An error occurred while trying to GET `{url}`: {e}")
+                await asyncio.sleep(self.wait_time)
+                continue
+
+            if result.status_code in success_codes or retries >= self.retries:
+                break
+            await result.aclose()
+            await asyncio.sleep(self.wait_time)
+
+        try:
+            yield result
+        finally:
+            await result.aclose()
+
     async def post(self, url: str, **kwargs) -> httpx.Response:
         retries = 0
         while retries < self.retries:
@@ -58,3 +286,39 @@ class HardenedHttpClient:
                 await asyncio.sleep(self.wait_time)
                 retries += 1
         return result
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key, so only one of them does the actual work.
+    All callers await the same in-flight task and receive its result or exception.
+    """
+
+    def __init__(self):
+        self.in_flight: dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            self.shared += 1
+        # Shield the shared task, a cancelled caller must not cancel it for the others
+        return await asyncio.shield(task)
+
+    @property
+    def dedup_rate(self) -> float:
+        return self.shared / self.calls if self.calls else 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "in_flight": len(self.in_flight),
+            "dedup_rate": self.dedup_rate,
+        }
@@ -0,0 +1,86 @@
+import json
+from typing import Any, AsyncIterator, Iterator
+
+
+class JsonArrayDecoder:
+    """
+    Incrementally decode the items of a top level JSON array from text chunks.
+    Only the item currently being received is buffered, not the whole document.
+    """
+
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.started = False
+        self.finished = False
+        self.items = 0
+
+    def _skip_whitespace(self, position: int) -> int:
+        while position < len(self.buffer) and self.buffer[position] in " \t\n\r":
+            position += 1
+        return position
+
+    def feed(self, chunk: str) -> Iterator[Any]:
+        """
+        Add a chunk of text and yield every item that is complete now
+        """
+        if self.finished:
+            if chunk.strip():
+                raise ValueError("Unexpected data after the end of the JSON array")
+            return
+        self.buffer += chunk
+        position = self._skip_whitespace(0)
+        if not self.started:
+            if position == len(self.buffer):
+                self.buffer = ""
+                return
+            if self.buffer[position] != "[":
+                raise ValueError("Expected a JSON array")
+            self.started = True
+            position = self._skip_whitespace(position + 1)
+
+        while position < len(self.buffer):
+            if self.buffer[position] == "]":
+                if self.buffer[position + 1 :].strip():
+                    raise ValueError("Unexpected data after the end of the JSON array")
+                self.finished = True
+                position = len(self.buffer)
+                break
+            cursor = position
+            if self.items > 0:
+                if self.buffer[cursor] != ",":
+                    raise ValueError(f"Expected `,` between array items, got `{self.buffer[cursor]}`")
+                cursor = self._skip_whitespace(cursor + 1)
+            try:
+                item, end = self.decoder.raw_decode(self.buffer, cursor)
+            except json.JSONDecodeError:
+                # The item is cut off, wait for the next chunk
+                break
+            # A number at the end of the buffer may continue in the next chunk
+            end = self._skip_whitespace(end)
+            if end == len(self.buffer):
+                break
+            self.items += 1
+            position = end
+            yield item
+
+        # Drop everything up to the next item, so the buffer only ever holds one item
+        self.buffer = self.buffer[position:]
+
+    def close(self):
+        """
+        Check that the whole array was received
+        """
+        if not self.finished:
+            raise ValueError("The JSON array ended early")
+
+
+async def iter_json_array(chunks: AsyncIterator[str]) -> AsyncIterator[Any]:
+    """
+    Yield the items of a JSON array streamed in text chunks, e.g. from `httpx.Response.aiter_text`
+    """
+    decoder = JsonArrayDecoder()
+    async for chunk in chunks:
+        for item in decoder.feed(chunk):
+            yield item
+    decoder.close()
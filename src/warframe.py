@@ -1,6 +1,11 @@
 import httpx
-from sources import WeaponLookup
-from utils.http import HardenedHttpClient, WARFRAME_API_SUCCESS_CODES
+from logging import info
+from sources import RivenPriceTable, WeaponLookup
+from utils.http import HardenedHttpClient, HttpCache, WARFRAME_API_SUCCESS_CODES
+from utils.json_stream import iter_json_array
+from typing import Optional
+
+RIVEN_PRICES_URL = "https://www-static.warframe.com/repos/weeklyRivensPC.json"
 
 
 class WarframeAPI:
@@ -8,24 +13,38 @@ class WarframeAPI:
     Class to interface with the Warframe API.
     """
 
-    def __init__(self, timeout: int = 10_000):
+    def __init__(self, timeout: int = 10_000, http_cache: Optional[HttpCache] = None):
         self.client = HardenedHttpClient(
-            httpx.AsyncClient(timeout=timeout), success_codes=WARFRAME_API_SUCCESS_CODES
+            httpx.AsyncClient(timeout=timeout),
+            success_codes=WARFRAME_API_SUCCESS_CODES,
+            cache=http_cache,
         )  # Initialize the HTTP client
+        self.riven_prices: Optional[RivenPriceTable] = None
 
-    async def get_median_prices(self, weapon_lookup: WeaponLookup):
-        result = await self.client.get(
-            "https://www-static.warframe.com/repos/weeklyRivensPC.json"
+    async def get_riven_prices(self) -> RivenPriceTable:
+        """
+        Stream the weekly riven prices into a price table, without loading the whole file.
+        The previous table is kept if the prices didn't change since it was downloaded.
+        """
+        headers = self.riven_prices.validators() if self.riven_prices is not None else {}
+        async with self.client.stream(RIVEN_PRICES_URL, headers=headers) as result:
+            if result.status_code == 304:
+                return self.riven_prices
+            result.raise_for_status()
+            table = RivenPriceTable()
+            async for item in iter_json_array(result.aiter_text()):
+                table.add(item)
+            table.etag = result.headers.get("etag")
+            table.last_modified = result.headers.get("last-modified")
+
+        info(
+            f"Loaded {len(table)} riven prices ({table.nbytes} bytes), skipped {table.skipped} veiled rivens"
         )
-        result.raise_for_status()
-        data = result.json()
-        for item in data:
-            if "compatibility" not in item:
-                continue
-            if (
-                item["compatibility"] is None
-                or item["compatibility"] not in weapon_lookup
-            ):
-                continue
+        self.riven_prices = table
+        return table
 
-            weapon_lookup[item["compatibility"]].median_plat_price = item["median"]
+    async def get_median_prices(self, weapon_lookup: WeaponLookup):
+        table = await self.get_riven_prices()
+        for weapon, median in table.medians():
+            if weapon in weapon_lookup:
+                weapon_lookup.set_median_plat_price(weapon, median)
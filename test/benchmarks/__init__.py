@@ -0,0 +1,57 @@
+"""
+Offline benchmarks, run them from the repository root, e.g.
+`python -m test.benchmarks.event_loop_stall`.
+They are not collected by pytest.
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Optional
+
+SRC = Path(__file__).parents[2] / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+
+def percentile(values: list[float], p: float) -> float:
+    """
+    Nearest rank percentile of the given values
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return None
+
+
+def report(name: str, results: dict[str, dict], output: Optional[str] = None):
+    """
+    Print the results as a table and optionally write them as JSON,
+    tagged with the git revision so runs can be compared across commits
+    """
+    print(f"## {name} ({git_revision() or 'unknown revision'})")
+    for case, metrics in results.items():
+        rendered = ", ".join(
+            f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in metrics.items()
+        )
+        print(f"{case:>24}: {rendered}")
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"benchmark": name, "revision": git_revision(), "results": results},
+                f,
+                indent=4,
+            )
@@ -0,0 +1,92 @@
+"""
+Measure how long wiki page parsing stalls the event loop,
+parsing inline in the coroutine versus in a thread or process pool.
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from test.benchmarks import percentile, report
+from test.fixtures import WIKI_FIXTURES
+from sources.wiki_parser import SoupWikiParser
+
+BASE_URL = "https://wiki.warframe.com"
+PAGES = ["Boltor", "Ack_&_Brunt", "Tombfinger", "Sweeper"]
+parse_weapon_page = SoupWikiParser().parse_weapon_page
+
+
+def load_pages(scale: int) -> list[str]:
+    """
+    Load the fixture pages, padded to roughly the size of real wiki pages
+    """
+    pages = []
+    for page in PAGES:
+        html = (WIKI_FIXTURES / f"{page}.html").read_text("utf-8")
+        filler = html[html.index('<table class="navbox">') : html.index("</table>") + 8]
+        pages.append(html.replace("</body>", filler * scale + "</body>"))
+    return pages
+
+
+async def measure(pages: list[str], executor: Optional[Executor], inline: bool) -> dict:
+    loop = asyncio.get_running_loop()
+    interval = 0.001
+    stalls: list[float] = []
+    running = True
+
+    async def ticker():
+        while running:
+            before = loop.time()
+            await asyncio.sleep(interval)
+            stalls.append(max(0.0, loop.time() - before - interval))
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+
+    start = time.perf_counter()
+    for html in pages:
+        if inline:
+            parse_weapon_page(html, BASE_URL, BASE_URL)
+            await asyncio.sleep(0)
+        else:
+            await loop.run_in_executor(executor, parse_weapon_page, html, BASE_URL, BASE_URL)
+    duration = time.perf_counter() - start
+
+    running = False
+    await task
+    return {
+        "pages": len(pages),
+        "duration_s": duration,
+        "max_stall_ms": max(stalls) * 1000,
+        "p99_stall_ms": percentile(stalls, 99) * 1000,
+        "total_stall_ms": sum(stalls) * 1000,
+    }
+
+
+async def main(rounds: int, scale: int, workers: int, output: Optional[str]):
+    pages = load_pages(scale) * rounds
+    results = {"inline": await measure(pages, None, inline=True)}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results["thread_pool"] = await measure(pages, executor, inline=False)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Warm up the worker processes so their start up is not measured
+        await asyncio.gather(
+            *[
+                asyncio.get_running_loop().run_in_executor(executor, time.sleep, 0)
+                for _ in range(workers)
+            ]
+        )
+        results["process_pool"] = await measure(pages, executor, inline=False)
+    report("event loop stall while parsing wiki pages", results, output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.scale, args.workers, args.output))
@@ -0,0 +1,87 @@
+"""
+Measure the trend queries of `/riven_trends` on a synthetic price history,
+the vectorized history queries against plain Python loops over the same values.
+"""
+
+import argparse
+import math
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Callable, Optional
+
+from test.benchmarks import percentile, report
+from sources import HistoryMetric, RivenHistory
+
+MONDAY = date(2020, 1, 6)
+
+
+def build_history(weeks: int, weapons: int) -> RivenHistory:
+    rng = random.Random(0)
+    history = RivenHistory()
+    prices = [rng.uniform(10, 500) for _ in range(weapons)]
+    for week in range(weeks):
+        prices = [max(1.0, price * rng.uniform(0.8, 1.25)) for price in prices]
+        history.record(
+            MONDAY + timedelta(weeks=week),
+            HistoryMetric.Price,
+            {f"weapon_{weapon}": price for weapon, price in enumerate(prices) if rng.random() < 0.9},
+        )
+    return history
+
+
+def loop_top_movers(history: RivenHistory, count: int) -> list[str]:
+    changes = []
+    for weapon in history.weapons:
+        series = history.series(weapon, HistoryMetric.Price)
+        previous, current = float(series[-2]), float(series[-1])
+        if not math.isnan(previous) and not math.isnan(current) and previous > 0:
+            changes.append(((current - previous) / previous, weapon))
+    return [weapon for _, weapon in sorted(changes, reverse=True)[:count]]
+
+
+def loop_rolling_median(history: RivenHistory, window: int) -> list[list[float]]:
+    medians = []
+    for weapon in history.weapons:
+        series = [float(value) for value in history.series(weapon, HistoryMetric.Price)]
+        row = []
+        for week in range(len(series)):
+            values = [v for v in series[max(0, week - window + 1) : week + 1] if not math.isnan(v)]
+            row.append(statistics.median(values) if values else math.nan)
+        medians.append(row)
+    return medians
+
+
+def measure(query: Callable[[], object], repeat: int) -> dict:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query()
+        durations.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": percentile(durations, 50), "p95_ms": percentile(durations, 95)}
+
+
+def run(weeks: int, weapons: int, repeat: int, output: Optional[str]):
+    history = build_history(weeks, weapons)
+    vectorized = [t.weapon for t in history.top_movers(HistoryMetric.Price, count=10)]
+    assert vectorized == loop_top_movers(history, 10)
+
+    results = {
+        "top_movers numpy": measure(lambda: history.top_movers(HistoryMetric.Price, count=10), repeat),
+        "top_movers loop": measure(lambda: loop_top_movers(history, 10), repeat),
+        "rolling_median numpy": measure(lambda: history.rolling_median(HistoryMetric.Price, 4), repeat),
+        "rolling_median loop": measure(lambda: loop_rolling_median(history, 4), max(1, repeat // 10)),
+        "latest_median numpy": measure(lambda: history.rolling_median(HistoryMetric.Price, 4, recent=1), repeat),
+    }
+    report(f"riven trends over {weeks} weeks of {weapons} weapons", results, output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--weeks", type=int, default=260)
+    parser.add_argument("--weapons", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    run(args.weeks, args.weapons, args.repeat, args.output)
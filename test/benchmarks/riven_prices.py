@@ -0,0 +1,107 @@
+"""
+Compare the peak memory and duration of loading the weekly riven prices with `json.loads`
+against streaming them into the columnar price table, for growing synthetic price files.
+"""
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from typing import Callable, Iterator, Optional
+
+from test.benchmarks import report
+from sources import RivenPriceTable
+from utils.json_stream import JsonArrayDecoder
+
+ITEM_TYPES = ["Rifle Riven Mod", "Pistol Riven Mod", "Melee Riven Mod", "Shotgun Riven Mod"]
+CHUNK_SIZE = 64 * 1024
+
+
+def price_items(weapons: int, seed: int = 0) -> Iterator[dict]:
+    rng = random.Random(seed)
+    for weapon in range(weapons):
+        for rerolled in (False, True):
+            low = rng.uniform(5, 100)
+            yield {
+                "itemType": rng.choice(ITEM_TYPES),
+                "compatibility": f"WEAPON {weapon}",
+                "rerolled": rerolled,
+                "avg": low * 2.5,
+                "stddev": low,
+                "min": round(low),
+                "max": round(low * 10),
+                "pop": rng.randint(1, 100),
+                "median": round(low * 2),
+            }
+
+
+def price_file_chunks(weapons: int) -> Iterator[str]:
+    """
+    Produce the price file in chunks as it arrives over the network, never as a whole
+    """
+    pending = ["["]
+    size = 1
+    for index, item in enumerate(price_items(weapons)):
+        text = ("," if index else "") + json.dumps(item)
+        pending.append(text)
+        size += len(text)
+        if size >= CHUNK_SIZE:
+            yield "".join(pending)
+            pending, size = [], 0
+    pending.append("]")
+    yield "".join(pending)
+
+
+def load_whole(weapons: int) -> dict[str, float]:
+    # The previous ingest: the whole body is read and decoded, only the medians are kept
+    data = json.loads("".join(price_file_chunks(weapons)))
+    medians = {}
+    for item in data:
+        if item.get("compatibility") is not None:
+            medians[item["compatibility"]] = item["median"]
+    return medians
+
+
+def load_streamed(weapons: int) -> RivenPriceTable:
+    decoder = JsonArrayDecoder()
+    table = RivenPriceTable()
+    for chunk in price_file_chunks(weapons):
+        for item in decoder.feed(chunk):
+            table.add(item)
+    decoder.close()
+    return table
+
+
+def measure(load: Callable[[int], object], weapons: int) -> dict:
+    """
+    Peak memory during the ingest, split into what the result keeps and the ingest's own overhead
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load(weapons)
+    duration = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "rows": len(result),
+        "retained_mb": retained / 1024 / 1024,
+        "overhead_mb": (peak - retained) / 1024 / 1024,
+        "total_ms": duration * 1000,
+    }
+
+
+def run(sizes: list[int], output: Optional[str]):
+    results = {}
+    for weapons in sizes:
+        results[f"json.loads {weapons}"] = measure(load_whole, weapons)
+        results[f"streamed {weapons}"] = measure(load_streamed, weapons)
+    report("weekly riven price ingest", results, output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 5_000, 50_000])
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    run(args.sizes, args.output)
@@ -0,0 +1,104 @@
+"""
+Compare parsing the stat strings of the riven sheets with a linear scan over the effects,
+with the shared token table and with the memoized whole string parser.
+Uses the sheets in `./riven_data` if they were downloaded, the test fixture otherwise.
+"""
+
+import argparse
+import csv
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from test.benchmarks import report
+from test.fixtures import RIVEN_FIXTURES
+from model.rivens import RIVEN_EFFECT_TOKENS, RivenEffect, parse_riven_effects
+
+STAT_COLUMNS = ("POSITIVE STATS:", "NEGATIVE STATS:")
+
+
+def sheet_vocabulary(directory: Path) -> list[str]:
+    """
+    Return every `/` separated stat string of the sheets, in sheet order with repetitions
+    """
+    stat_strings = []
+    for path in sorted(directory.glob("*.csv")):
+        with open(path, "r", encoding="utf-8", newline="") as file:
+            reader = csv.reader(file)
+            headers = next(reader, [])
+            columns = [headers.index(column) for column in STAT_COLUMNS]
+            for row in reader:
+                for column in columns:
+                    if column >= len(row) or not row[column]:
+                        continue
+                    for stat_slice in row[column].upper().split(" OR "):
+                        splits = stat_slice.split(" ")
+                        stat_strings.extend(["/".join(splits[:-1]), splits[-1]])
+    return [stat_string for stat_string in stat_strings if stat_string]
+
+
+def linear_scan(raw_stats: str) -> tuple[tuple[RivenEffect, ...], tuple[str, ...]]:
+    """
+    The previous parser: special cases first, then a scan over every effect per token
+    """
+    effects, unknown = [], []
+    for token in raw_stats.upper().split("/"):
+        token = token.strip().removeprefix("-")
+        if token == "ELEMENT":
+            effects.extend(RIVEN_EFFECT_TOKENS["ELEMENT"])
+        elif token == "RECOIL":
+            effects.append(RivenEffect.REC)
+        elif token == "AS":
+            effects.append(RivenEffect.FR)
+        else:
+            for effect in RivenEffect:
+                if effect.name == token:
+                    effects.append(effect)
+                    break
+            else:
+                unknown.append(token)
+    return tuple(effects), tuple(unknown)
+
+
+def measure(parse: Callable[[str], object], stat_strings: list[str], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for stat_string in stat_strings:
+            parse(stat_string)
+    return time.perf_counter() - start
+
+
+def run(directory: Path, rounds: int, output: Optional[str]):
+    stat_strings = sheet_vocabulary(directory)
+    for stat_string in stat_strings:
+        assert linear_scan(stat_string) == parse_riven_effects.__wrapped__(stat_string)
+
+    parse_riven_effects.cache_clear()
+    parsers = {
+        "linear_scan": linear_scan,
+        "token_table": parse_riven_effects.__wrapped__,
+        "memoized": parse_riven_effects,
+    }
+    results = {}
+    for name, parse in parsers.items():
+        duration = measure(parse, stat_strings, rounds)
+        results[name] = {
+            "stat_strings": len(stat_strings) * rounds,
+            "unique": len(set(stat_strings)),
+            "total_ms": duration * 1000,
+            "per_string_us": duration / (len(stat_strings) * rounds) * 1_000_000,
+        }
+    report(f"stat token parsing on {directory}", results, output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sheets", type=Path, default=None)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    directory = args.sheets
+    if directory is None:
+        downloaded = Path("riven_data")
+        directory = downloaded if any(downloaded.glob("*.csv")) else RIVEN_FIXTURES
+    run(directory, args.rounds, args.output)
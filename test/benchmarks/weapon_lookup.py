@@ -0,0 +1,194 @@
+"""
+Measure how WeaponLookup scales on synthetic catalogues: build time, memory,
+relation and index build time, and the latency of the search modes.
+Catalogues are generated from a fixed seed, so runs are comparable across commits.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+from test.benchmarks import percentile, report
+from model.rivens import RivenEffect
+from sources import WeaponLookup
+from sources.search_index import PrefixTrie, TrigramIndex, TypoIndex
+from sources.weapon_lookup import RivenRecommendations, WantedRivenStats
+
+PREFIXES = ["Prisma", "Kuva", "Tenet", "Vaykor", "Rakta", "Sancti", "Secura", "Telos"]
+PREFIXES += ["Synoid", "MK1", "Dex", "Coda", "Dual", "Twin"]
+SUFFIXES = ["Prime", "Vandal", "Wraith"]
+SYLLABLES = ["bra", "ton", "kor", "lex", "so", "ma", "hek", "gra", "ka", "ta", "ni"]
+SYLLABLES += ["zar", "rub", "ico", "vec", "tis", "ig", "nis", "glax", "ion", "ogr"]
+SYLLABLES += ["lan", "ka", "bol", "tor", "stru", "ne", "dre", "ad", "qua", "op"]
+
+
+def synthetic_catalogue(size: int, seed: int = 0) -> list[str]:
+    """
+    Generate `size` unique weapon names: base weapons and their prefixed or suffixed variants
+    """
+    rng = random.Random(seed)
+    names: dict[str, None] = {}
+    while len(names) < size:
+        base = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+        if base in names:
+            continue
+        names[base] = None
+        for _ in range(rng.randint(0, 4)):
+            if rng.random() < 0.6:
+                names[f"{rng.choice(PREFIXES)} {base}"] = None
+            else:
+                names[f"{base} {rng.choice(SUFFIXES)}"] = None
+    return list(names)[:size]
+
+
+def queries(names: list[str], count: int, seed: int = 1) -> dict[str, list[str]]:
+    """
+    Generate what users type: prefixes of names for autocomplete and names with typos
+    """
+    rng = random.Random(seed)
+    prefixes, typos = [], []
+    for name in rng.sample(names, min(count, len(names))):
+        prefixes.append(name[: rng.randint(1, min(8, len(name)))])
+        chars = list(name.lower())
+        position = rng.randrange(len(chars))
+        chars[position] = rng.choice("aeioukrt")
+        typos.append("".join(chars))
+    return {"prefix": prefixes, "typo": typos}
+
+
+def build(names: list[str], seed: int = 2, query_cache_size: int = 0) -> WeaponLookup:
+    rng = random.Random(seed)
+    # No query cache by default, every search is measured uncached
+    lookup = WeaponLookup(query_cache_size=query_cache_size)
+    for name in names:
+        lookup.add(name, "/w/" + name.replace(" ", "_"))
+    effects = list(RivenEffect)
+    for name in names:
+        if " " not in name and rng.random() < 0.8:
+            lookup.set_riven_recommendations(
+                name,
+                RivenRecommendations(
+                    weapon=name.upper(),
+                    comment=None,
+                    stats=[
+                        WantedRivenStats(
+                            best=rng.sample(effects, 2),
+                            wanted=rng.sample(effects, 2),
+                            wanted_negatives=rng.sample(effects, 1),
+                        )
+                    ],
+                ),
+            )
+            lookup.set_median_plat_price(name, rng.randint(10, 2000))
+    return lookup
+
+
+def timed(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def latencies(fn: Callable[[str], object], inputs: list[str]) -> dict[str, float]:
+    timings = [timed(lambda: fn(value)) for value in inputs]
+    return {
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "p99_ms": percentile(timings, 99) * 1000,
+    }
+
+
+def serving(names: list[str], prefixes: list[str], seed: int = 3) -> dict[str, float]:
+    """
+    Replay autocompletes like the bot serves them: popular prefixes repeat and every
+    served command records a lookup, with the query cache enabled
+    """
+    rng = random.Random(seed)
+    lookup = build(names, query_cache_size=1024)
+    lookup.rebuild_weapon_relations()
+    lookup.autocomplete("warmup")
+    weights = [1 / (rank + 1) for rank in range(len(prefixes))]
+    replayed = rng.choices(prefixes, weights=weights, k=len(prefixes) * 10)
+
+    def serve(prefix: str):
+        matches = lookup.autocomplete(prefix)
+        if matches:
+            lookup.record_lookup(matches[0].normalized_name)
+
+    metrics = latencies(serve, replayed)
+    metrics["hit_rate"] = lookup.stats()["query_cache"]["hit_rate"]
+    return metrics
+
+
+def run(sizes: list[int], count: int, output: Optional[str]):
+    results = {}
+    for size in sizes:
+        names = synthetic_catalogue(size)
+        inputs = queries(names, count)
+
+        tracemalloc.start()
+        lookup = build(names)
+        lookup.rebuild_weapon_relations()
+        lookup_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        build_time = timed(lambda: build(names))
+        lookup = build(names)
+        relations_time = timed(lookup.rebuild_weapon_relations)
+        # A second rebuild has to give the same result, it is timed to catch regressions
+        relations_again_time = timed(lookup.rebuild_weapon_relations)
+
+        items = [(key, record.display_name) for key, record in lookup.weapon_lookup.items()]
+        trie_time = timed(lambda: PrefixTrie().build(items))
+        trigram_time = timed(lambda: TrigramIndex().build(items))
+        tracemalloc.start()
+        indexes = (PrefixTrie(), TrigramIndex())
+        for index in indexes:
+            index.build(items)
+        index_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del indexes
+        # Build the indexes the lookup uses outside of the measurements
+        lookup.autocomplete("warmup")
+
+        metrics = {
+            "weapons": len(lookup),
+            "build_ms": build_time * 1000,
+            "relations_ms": relations_time * 1000,
+            "relations_again_ms": relations_again_time * 1000,
+            "trie_build_ms": trie_time * 1000,
+            "trigram_build_ms": trigram_time * 1000,
+            "lookup_bytes_per_weapon": lookup_bytes // len(lookup),
+            "index_bytes_per_weapon": index_bytes // len(lookup),
+        }
+        cases = {
+            "getitem": (lambda value: value in lookup and lookup[value], names[:count]),
+            "autocomplete": (lookup.autocomplete, inputs["prefix"]),
+            "autocomplete_rivens": (
+                lambda value: lookup.autocomplete(value, can_have_rivens=True),
+                inputs["prefix"],
+            ),
+            "fuzzy_search": (lookup.fuzzy_search, inputs["typo"]),
+        }
+        metrics["typo_index_build_ms"] = timed(lambda: TypoIndex().build(items)) * 1000
+        lookup.typo_search("warmup")
+        cases["typo_search"] = (lookup.typo_search, inputs["typo"])
+        for case, (fn, values) in cases.items():
+            for key, value in latencies(fn, values).items():
+                metrics[f"{case}_{key}"] = value
+        for key, value in serving(names, inputs["prefix"]).items():
+            metrics[f"serving_{key}"] = value
+        results[f"{size} names"] = metrics
+
+    report("weapon lookup scaling", results, output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    run(args.sizes, args.queries, args.output)
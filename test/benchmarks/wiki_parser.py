@@ -0,0 +1,63 @@
+"""
+Compare the wiki parser backends on the saved wiki pages
+and check that all of them extract identical weapons.
+"""
+
+import argparse
+import time
+from typing import Optional
+
+from bs4.builder import builder_registry
+from test.benchmarks import percentile, report
+from test.benchmarks.event_loop_stall import PAGES, load_pages
+from test.fixtures import WIKI_FIXTURES
+from sources.wiki_parser import SoupWikiParser, StreamingWikiParser, WikiParser
+
+BASE_URL = "https://wiki.warframe.com"
+
+
+def backends() -> list[WikiParser]:
+    parsers = [SoupWikiParser(), StreamingWikiParser()]
+    if builder_registry.lookup("lxml") is not None:
+        parsers.insert(1, SoupWikiParser("lxml"))
+    return parsers
+
+
+def run(rounds: int, scale: int, output: Optional[str]):
+    pages = load_pages(scale)
+    weapon_list = (WIKI_FIXTURES / "Weapons.html").read_text("utf-8")
+    reference = SoupWikiParser()
+    expected = [reference.parse_weapon_page(html, BASE_URL, BASE_URL) for html in pages]
+    expected_list = reference.parse_weapon_list(weapon_list)
+
+    results = {}
+    for parser in backends():
+        timings = []
+        for _ in range(rounds):
+            for html, weapon in zip(pages, expected):
+                start = time.perf_counter()
+                parsed = parser.parse_weapon_page(html, BASE_URL, BASE_URL)
+                timings.append(time.perf_counter() - start)
+                assert parsed == weapon, f"{parser.name} differs on {weapon.name}"
+
+        start = time.perf_counter()
+        assert parser.parse_weapon_list(weapon_list) == expected_list
+        list_time = time.perf_counter() - start
+
+        results[parser.name] = {
+            "pages": len(timings),
+            "mean_ms": sum(timings) / len(timings) * 1000,
+            "p50_ms": percentile(timings, 50) * 1000,
+            "p95_ms": percentile(timings, 95) * 1000,
+            "weapon_list_ms": list_time * 1000,
+        }
+    report(f"wiki parser backends on {len(PAGES)} pages", results, output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    run(args.rounds, args.scale, args.output)
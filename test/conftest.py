@@ -0,0 +1,7 @@
+import pytest
+from test.fixtures import WikiFixtureTransport
+
+
+@pytest.fixture
+def wiki_transport() -> WikiFixtureTransport:
+    return WikiFixtureTransport()
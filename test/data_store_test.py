@@ -0,0 +1,147 @@
+import pytest
+import shutil
+from test.fixtures import RIVEN_FIXTURES
+from model.rivens import RivenEffect
+from model.weapon import RivenDisposition, Weapon, WeaponModType
+from sources import DataStore, RivenRecommendationProvider, WeaponLookup, store_rows
+from sources.riven_provider import ParsedSheet, SheetReport
+from sources.weapon_lookup import RivenRecommendations, WantedRivenStats
+
+
+def recommendations(weapon: str) -> RivenRecommendations:
+    return RivenRecommendations(
+        weapon=weapon.upper(),
+        comment=None,
+        stats=[
+            WantedRivenStats(
+                best=[RivenEffect.CC, RivenEffect.CD],
+                wanted=[RivenEffect.MS],
+                wanted_negatives=None,
+            )
+        ],
+    )
+
+
+def build() -> tuple[WeaponLookup, dict[str, Weapon], list[ParsedSheet]]:
+    lookup = WeaponLookup()
+    for weapon in ["Boltor", "Boltor Prime", "Lex"]:
+        lookup.add(weapon, "/w/" + weapon.replace(" ", "_"))
+    sheet = ParsedSheet(
+        report=SheetReport(sheet="Primary", rows=1, sha256="abc"),
+        recommendations=[recommendations("Boltor")],
+    )
+    lookup.set_riven_recommendations("Boltor", sheet.recommendations[0])
+    lookup.set_mod_type("Boltor", WeaponModType.Rifle)
+    lookup.set_median_plat_price("Boltor", 120)
+    lookup.rebuild_weapon_relations()
+    lookup.record_lookup("Boltor Prime")
+    weapons = {
+        "boltor": Weapon(
+            name="Boltor",
+            url="https://wiki.warframe.com/w/Boltor",
+            riven_disposition=RivenDisposition(disposition=1.3, symbol="●●●●○"),
+            mr=2,
+            mod_type=WeaponModType.Rifle,
+        )
+    }
+    return lookup, weapons, [sheet]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "jericho.db")
+    lookup, weapons, sheets = build()
+    store = DataStore(path)
+    delta = store.save(lookup, weapons, sheets)
+    assert delta.generation == 1
+    assert delta.written["weapons"] == 3
+    store.close()
+
+    store = DataStore.open(path, read_only=True)
+    loaded = store.load_lookup()
+    assert [entry for entry in loaded.entries()] == [entry for entry in lookup.entries()]
+    assert loaded.popularity == lookup.popularity
+    # Variants keep sharing the recommendations of their base weapon
+    assert loaded["Boltor Prime"].riven_recommendations is loaded["Boltor"].riven_recommendations
+    assert store.load_weapons() == weapons
+
+    [sheet] = store.load_sheets()
+    assert sheet.report.sha256 == "abc"
+    assert not sheet.report.changed
+    assert sheet.recommendations == sheets[0].recommendations
+
+    with pytest.raises(ValueError):
+        store.save(lookup)
+
+
+def test_only_changes_are_written(tmp_path):
+    store = DataStore(str(tmp_path / "jericho.db"))
+    lookup, weapons, sheets = build()
+    store.save(lookup, weapons, sheets)
+
+    delta = store.save(lookup, weapons, sheets)
+    assert not delta.changed
+    assert delta.generation == 1
+    assert store.generation() == 1
+
+    lookup.set_median_plat_price("Lex", 30)
+    del weapons["boltor"]
+    delta = store.save(lookup, weapons, sheets)
+    assert delta.generation == 2
+    assert delta.written == {
+        "weapons": 0,
+        "recommendations": 0,
+        "sheets": 0,
+        "dispositions": 0,
+        "prices": 1,
+        "popularity": 0,
+    }
+    assert delta.deleted["dispositions"] == 1
+    rows = store.connection.execute("SELECT name, generation FROM prices ORDER BY name")
+    assert rows.fetchall() == [("boltor", 1), ("lex", 2)]
+
+
+def test_missing_store(tmp_path):
+    assert DataStore.open(str(tmp_path / "missing.db"), read_only=True) is None
+    store = DataStore(str(tmp_path / "empty.db"))
+    assert store.load_lookup() is None
+    assert store.generation() == 0
+
+
+@pytest.mark.asyncio
+async def test_restored_sheets_are_not_parsed_again(tmp_path):
+    sheets = tmp_path / "sheets"
+    sheets.mkdir()
+    provider = RivenRecommendationProvider(path=sheets)
+    provider.sheets = {"Secondary": provider.sheets["Secondary"]}
+    shutil.copy(RIVEN_FIXTURES / "Secondary.csv", sheets / "Secondary.csv")
+    lookup = WeaponLookup()
+    lookup.add("Lex", "/w/Lex")
+    await provider.refresh(lookup)
+
+    store = DataStore(str(tmp_path / "jericho.db"))
+    store.save(lookup, sheets=provider.parsed_sheets.values())
+    restarted = RivenRecommendationProvider(path=sheets)
+    restarted.sheets = provider.sheets
+    restarted.restore(store.load_sheets())
+
+    lookup = WeaponLookup()
+    lookup.add("Lex", "/w/Lex")
+    [report] = await restarted.refresh(lookup)
+    assert not report.changed
+    assert lookup["Lex"].riven_recommendations is not None
+
+
+def test_rows_are_a_copy(tmp_path):
+    store = DataStore(str(tmp_path / "jericho.db"))
+    lookup, weapons, sheets = build()
+    rows = store_rows(lookup, weapons, sheets)
+    # Lookups keep changing the live state while the rows are written in another thread
+    lookup.record_lookup("Lex")
+    lookup.set_median_plat_price("Lex", 30)
+    sheets[0].recommendations.append(recommendations("Lex"))
+
+    store.save_rows(rows)
+    assert store.load_lookup().popularity == {"boltor_prime": 1}
+    assert store.load_lookup()["Lex"].median_plat_price is None
+    [sheet] = store.load_sheets()
+    assert len(sheet.recommendations) == 1
@@ -0,0 +1,43 @@
+import httpx
+from pathlib import Path
+from urllib.parse import unquote
+
+FIXTURES = Path(__file__).parent
+WIKI_FIXTURES = FIXTURES / "wiki"
+RIVEN_FIXTURES = FIXTURES / "riven"
+
+
+class WikiFixtureTransport(httpx.MockTransport):
+    """
+    Serve saved wiki pages from `test/fixtures/wiki` and record every request
+    """
+
+    def __init__(self, etag: str = '"fixture"'):
+        self.requests: list[httpx.Request] = []
+        self.etag = etag
+        super().__init__(self.handle)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.headers.get("If-None-Match") == self.etag:
+            return httpx.Response(304, request=request)
+
+        page = unquote(request.url.path.removeprefix("/w/"))
+        file_path = WIKI_FIXTURES / f"{page}.html"
+        if not file_path.exists():
+            return httpx.Response(404, request=request)
+        return httpx.Response(
+            200,
+            text=file_path.read_text("utf-8"),
+            headers={"ETag": self.etag, "Content-Type": "text/html"},
+            request=request,
+        )
+
+
+def offline_wiki(wiki, transport: httpx.MockTransport):
+    """
+    Route all requests of the given `WarframeWiki` through the transport
+    """
+    wiki.client.client = httpx.AsyncClient(transport=transport)
+    wiki.client.wait_time = 0
+    return wiki
@@ -0,0 +1,137 @@
+import asyncio
+import pytest
+import httpx
+from utils.http import HardenedHttpClient, HttpCache, SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_calls():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*[single_flight.do("key", work) for _ in range(5)])
+    assert results == [1] * 5
+    assert calls == 1
+    assert single_flight.dedup_rate == 0.8
+    assert single_flight.in_flight == {}
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_exceptions():
+    single_flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        *[single_flight.do("key", fail) for _ in range(3)], return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_survives_cancelled_caller():
+    single_flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    first = asyncio.ensure_future(single_flight.do("key", work))
+    second = asyncio.ensure_future(single_flight.do("key", work))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == "done"
+
+
+def cached_client(cache: HttpCache, etag: str = '"v1"', headers: dict = None):
+    requests = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, request=request)
+        return httpx.Response(
+            200,
+            content=b'{"median": 42}',
+            headers=headers if headers is not None else {"ETag": etag},
+            request=request,
+        )
+
+    client = HardenedHttpClient(
+        httpx.AsyncClient(transport=httpx.MockTransport(handle)), wait_time=0, cache=cache
+    )
+    return client, requests
+
+
+@pytest.mark.asyncio
+async def test_http_cache_revalidates():
+    cache = HttpCache()
+    client, requests = cached_client(cache)
+
+    first = await client.get("https://example.com/prices.json", params={"a": 1})
+    second = await client.get("https://example.com/prices.json", params={"a": 1})
+    assert second.status_code == 200
+    assert second.json() == first.json() == {"median": 42}
+    assert second.extensions["from_cache"]
+    assert requests[1].headers["If-None-Match"] == '"v1"'
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_http_cache_persists(tmp_path):
+    client, _ = cached_client(HttpCache(tmp_path))
+    await client.get("https://example.com/prices.json")
+
+    client, requests = cached_client(HttpCache(tmp_path))
+    response = await client.get("https://example.com/prices.json")
+    assert response.extensions["from_cache"]
+    assert response.text == '{"median": 42}'
+
+
+@pytest.mark.asyncio
+async def test_http_cache_skips_responses_without_validators():
+    cache = HttpCache()
+    client, requests = cached_client(cache, headers={})
+    await client.get("https://example.com/prices.json")
+    await client.get("https://example.com/prices.json")
+    assert "If-None-Match" not in requests[1].headers
+    assert len(cache.entries) == 0
+
+
+@pytest.mark.asyncio
+async def test_http_cache_is_bypassed_by_conditional_requests():
+    cache = HttpCache()
+    client, requests = cached_client(cache)
+    await client.get("https://example.com/prices.json")
+    response = await client.get(
+        "https://example.com/prices.json", headers={"If-None-Match": '"v1"'}
+    )
+    assert response.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_http_cache_files_are_bounded(tmp_path):
+    cache = HttpCache(tmp_path, max_entries=2)
+    client, _ = cached_client(cache)
+    for page in ["a", "b", "a", "c"]:
+        await client.get(f"https://example.com/{page}.json")
+    assert len(list(tmp_path.glob("*.json"))) == len(list(tmp_path.glob("*.body"))) == 2
+    # `a` was served from memory after `b` was stored, so the file of `b` is the one removed
+    stored = [
+        cache._file_path(HttpCache.key(f"https://example.com/{page}.json")).with_suffix(".json")
+        for page in ["a", "b", "c"]
+    ]
+    assert [file_path.exists() for file_path in stored] == [True, False, True]
+
+    # Files of an earlier run count against the limit as well
+    HttpCache(tmp_path, max_entries=1)
+    assert len(list(tmp_path.glob("*.json"))) == len(list(tmp_path.glob("*.body"))) == 1
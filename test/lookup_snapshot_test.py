@@ -0,0 +1,61 @@
+import json
+from model.rivens import RivenEffect
+from sources import WeaponLookup, save_snapshot, load_snapshot
+from sources.weapon_lookup import RivenRecommendations, WantedRivenStats
+
+
+def build_lookup() -> WeaponLookup:
+    lookup = WeaponLookup()
+    lookup.add("Braton", "/w/Braton")
+    lookup.add("Braton Prime", "/w/Braton_Prime")
+    lookup.add("Lex", "/w/Lex")
+    lookup.set_riven_recommendations(
+        "Braton",
+        RivenRecommendations(
+            weapon="BRATON",
+            comment="Test",
+            stats=[
+                WantedRivenStats(
+                    best=[RivenEffect.CC, RivenEffect.CD],
+                    wanted=[RivenEffect.MS],
+                    wanted_negatives=None,
+                )
+            ],
+        ),
+    )
+    lookup.set_median_plat_price("Braton", 42.5)
+    lookup.rebuild_weapon_relations()
+    lookup.record_lookup("Lex")
+    return lookup
+
+
+def test_snapshot_roundtrip(tmp_path):
+    path = tmp_path / "snapshot.json"
+    lookup = build_lookup()
+    save_snapshot(lookup, path)
+
+    loaded = load_snapshot(path)
+    assert loaded is not None
+    assert list(loaded.entries()) == list(lookup.entries())
+    assert loaded["Braton Prime"].base_weapon == "braton"
+    assert loaded["Braton Prime"].can_have_rivens
+    assert loaded["Braton"].weapon_variants == ["braton_prime"]
+    assert loaded["Braton"].median_plat_price == 42.5
+    assert loaded.popularity == {"lex": 1}
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_missing_snapshot(tmp_path):
+    assert load_snapshot(tmp_path / "snapshot.json") is None
+
+
+def test_incompatible_snapshot(tmp_path):
+    path = tmp_path / "snapshot.json"
+    save_snapshot(build_lookup(), path)
+    snapshot = json.loads(path.read_text("utf-8"))
+    snapshot["version"] = -1
+    path.write_text(json.dumps(snapshot), "utf-8")
+    assert load_snapshot(path) is None
+
+    path.write_text('{"version": 1, "entries": [', "utf-8")
+    assert load_snapshot(path) is None
@@ -0,0 +1,137 @@
+import asyncio
+import pytest
+from test.fixtures import offline_wiki
+from refresh import RefreshCoordinator
+from sources import WarframeWiki, WeaponLookup
+from sources.weapon_lookup import RivenRecommendations
+
+
+class FakeRivenProvider:
+    def __init__(self, started: asyncio.Event, release: asyncio.Event):
+        self.started = started
+        self.release = release
+
+    async def refresh(self, weapon_lookup: WeaponLookup, force_download: bool = False):
+        self.started.set()
+        await self.release.wait()
+        weapon_lookup.set_riven_recommendations(
+            "Boltor",
+            RivenRecommendations(weapon="BOLTOR", comment=None, stats=[]),
+        )
+
+
+class FakeWarframeAPI:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+
+    async def get_median_prices(self, weapon_lookup: WeaponLookup):
+        if self.fail:
+            raise RuntimeError("prices unavailable")
+        weapon_lookup.set_median_plat_price("Boltor", 100)
+
+
+def coordinator(wiki_transport, warframe_api=None, weapon_lookup=None):
+    started, release = asyncio.Event(), asyncio.Event()
+    data = RefreshCoordinator(
+        build_wiki=lambda lookup: offline_wiki(WarframeWiki(lookup), wiki_transport),
+        build_riven_provider=lambda: FakeRivenProvider(started, release),
+        warframe_api=warframe_api or FakeWarframeAPI(),
+        weapon_lookup=weapon_lookup,
+    )
+    return data, started, release
+
+
+@pytest.mark.asyncio
+async def test_readers_see_old_generation_until_published(wiki_transport):
+    old_lookup = WeaponLookup()
+    old_lookup.add("Braton", "/w/Braton")
+    old_lookup.record_lookup("Braton")
+    data, started, release = coordinator(wiki_transport, weapon_lookup=old_lookup)
+    old = data.current
+    assert old.number == 0
+    assert old.weapon_lookup is old_lookup
+
+    refresh = asyncio.create_task(data.refresh())
+    await started.wait()
+    # Halfway through the build nothing has changed for readers
+    assert data.current is old
+    assert len(data.current.weapon_lookup) == 1
+
+    release.set()
+    new = await refresh
+    assert data.current is new
+    assert new.number == 1
+    assert new.warframe_wiki.weapon_lookup is new.weapon_lookup
+    assert new.weapon_lookup["Boltor"].median_plat_price == 100
+    assert new.weapon_lookup["Boltor"].can_have_rivens
+    assert new.weapon_lookup["Boltor Prime"].can_have_rivens
+    assert new.weapon_lookup.popularity["braton"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refreshes_share_one_build(wiki_transport):
+    data, started, release = coordinator(wiki_transport)
+    release.set()
+    first, second = await asyncio.gather(data.refresh(), data.refresh())
+    assert first is second is data.current
+    assert data.current.number == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_current_generation(wiki_transport):
+    data, started, release = coordinator(wiki_transport, FakeWarframeAPI(fail=True))
+    release.set()
+    old = data.current
+    with pytest.raises(RuntimeError):
+        await data.refresh()
+    assert data.current is old
+
+
+def test_query_engine_is_rebuilt_after_changes(wiki_transport):
+    lookup = WeaponLookup()
+    lookup.add("Boltor", "/w/Boltor")
+    data, _, _ = coordinator(wiki_transport, weapon_lookup=lookup)
+    engine = data.current.query_engine()
+    assert data.current.query_engine() is engine
+    assert engine.rows["boltor"] == {}
+
+    lookup.set_median_plat_price("Boltor", 100)
+    rebuilt = data.current.query_engine()
+    assert rebuilt is not engine
+    assert rebuilt.rows["boltor"] == {"price": 100}
+
+
+@pytest.mark.asyncio
+async def test_prices_and_rivens_refresh_in_place(wiki_transport):
+    lookup = WeaponLookup()
+    lookup.add("Boltor", "/w/Boltor")
+    lookup.add("Boltor Prime", "/w/Boltor_Prime")
+    data, _, release = coordinator(wiki_transport, weapon_lookup=lookup)
+    release.set()
+    current = data.current
+
+    assert await data.refresh_prices() is current
+    assert lookup["Boltor"].median_plat_price == 100
+
+    assert await data.refresh_rivens() is current
+    assert data.current is current
+    assert lookup["Boltor Prime"].can_have_rivens
+
+
+@pytest.mark.asyncio
+async def test_partial_refreshes_wait_for_a_full_refresh(wiki_transport):
+    data, started, release = coordinator(wiki_transport)
+    old = data.current
+
+    refresh = asyncio.create_task(data.refresh())
+    await started.wait()
+    prices = asyncio.create_task(data.refresh_prices())
+    await asyncio.sleep(0)
+    # The full refresh is still building, the prices are not written into the old generation
+    assert not prices.done()
+    assert "boltor" not in old.weapon_lookup.weapon_lookup
+
+    release.set()
+    new = await refresh
+    assert await prices is new
+    assert new.weapon_lookup["Boltor"].median_plat_price == 100
@@ -0,0 +1,144 @@
+import math
+import numpy as np
+import pytest
+import random
+import statistics
+from datetime import date, timedelta
+from sources import DataStore, HistoryMetric, RivenHistory, WeaponLookup
+from sources.data_store import SCHEMA_VERSION
+from sources.riven_history import week_of
+
+MONDAY = date(2026, 1, 5)
+
+
+def test_weeks_are_appended():
+    history = RivenHistory(weeks=2, weapons=2)
+    # Any day of the week is recorded as its Monday
+    history.record(MONDAY + timedelta(days=3), HistoryMetric.Price, {"boltor": 100, "lex": 20})
+    history.record(MONDAY + timedelta(weeks=2), HistoryMetric.Price, {"boltor": 120, "skana": 5})
+    assert history.weeks == [MONDAY, MONDAY + timedelta(weeks=1), MONDAY + timedelta(weeks=2)]
+    assert history.last_week == week_of(MONDAY + timedelta(weeks=2, days=6))
+
+    boltor = history.series("boltor", HistoryMetric.Price)
+    assert boltor[0] == 100 and math.isnan(boltor[1]) and boltor[2] == 120
+    assert math.isnan(history.series("lex", HistoryMetric.Price)[2])
+    assert math.isnan(history.series("boltor", HistoryMetric.Disposition)[0])
+    assert len(history.series("unknown", HistoryMetric.Price)) == 3
+
+    # The latest week can be recorded again, earlier weeks are final
+    history.record(MONDAY + timedelta(weeks=2), HistoryMetric.Price, {"boltor": 125})
+    assert history.series("boltor", HistoryMetric.Price)[2] == 125
+    assert history.series("skana", HistoryMetric.Price)[2] == 5
+    with pytest.raises(ValueError):
+        history.record(MONDAY + timedelta(weeks=1), HistoryMetric.Price, {"boltor": 1})
+    with pytest.raises(ValueError):
+        history.matrix(HistoryMetric.Price)[0, 0] = 1
+
+
+def test_week_over_week_and_trend():
+    history = RivenHistory()
+    history.record(MONDAY, HistoryMetric.Price, {"boltor": 100, "lex": 0})
+    history.record(MONDAY + timedelta(weeks=1), HistoryMetric.Price, {"boltor": 150, "lex": 10})
+
+    previous, current = history.week_over_week(HistoryMetric.Price)
+    assert list(previous) == [100, 0]
+    assert list(current) == [150, 10]
+    trend = history.trend("boltor", HistoryMetric.Price)
+    assert (trend.previous, trend.current, trend.change) == (100, 150, 50)
+    assert trend.relative_change == 0.5
+    assert history.trend("lex", HistoryMetric.Price).relative_change is None
+    assert history.trend("boltor", HistoryMetric.Price, weeks=2) is None
+
+
+def build_random_history(weeks: int, weapons: int) -> RivenHistory:
+    rng = random.Random(3)
+    history = RivenHistory(weeks=4, weapons=8)
+    for week in range(weeks):
+        prices = {
+            f"weapon_{weapon}": float(rng.randint(0, 300))
+            for weapon in range(weapons)
+            if rng.random() < 0.8
+        }
+        history.record(MONDAY + timedelta(weeks=week), HistoryMetric.Price, prices)
+    return history
+
+
+@pytest.mark.parametrize("relative", [True, False])
+@pytest.mark.parametrize("rising", [True, False])
+def test_top_movers_match_brute_force(relative, rising):
+    history = build_random_history(weeks=6, weapons=50)
+    movers = history.top_movers(
+        HistoryMetric.Price, count=5, weeks=2, rising=rising, relative=relative
+    )
+
+    expected = []
+    for weapon in history.weapons:
+        series = history.series(weapon, HistoryMetric.Price)
+        previous, current = series[-3], series[-1]
+        if math.isnan(previous) or math.isnan(current):
+            continue
+        if relative and previous <= 0:
+            continue
+        change = (current - previous) / previous if relative else current - previous
+        change = change if rising else -change
+        if change > 0:
+            expected.append(change)
+    expected.sort(reverse=True)
+
+    scores = []
+    for trend in movers:
+        change = trend.relative_change if relative else trend.change
+        scores.append(change if rising else -change)
+    assert scores == expected[:5]
+
+
+def test_rolling_median_matches_brute_force():
+    history = build_random_history(weeks=7, weapons=20)
+    rolling = history.rolling_median(HistoryMetric.Price, window=3)
+    assert rolling.shape == (7, 20)
+    recent = history.rolling_median(HistoryMetric.Price, window=3, recent=2)
+    assert recent.shape == (2, 20)
+    np.testing.assert_array_equal(recent, rolling[-2:])
+    for weapon_id, weapon in enumerate(history.weapons):
+        series = history.series(weapon, HistoryMetric.Price)
+        for week in range(7):
+            values = [v for v in series[max(0, week - 2) : week + 1] if not math.isnan(v)]
+            if values:
+                assert rolling[week, weapon_id] == statistics.median(values)
+            else:
+                assert math.isnan(rolling[week, weapon_id])
+
+
+def test_history_is_stored(tmp_path):
+    store = DataStore(str(tmp_path / "jericho.db"))
+    store.save_history(
+        MONDAY, {HistoryMetric.Price: {"boltor": 100}, HistoryMetric.Disposition: {"boltor": 1.3}}
+    )
+    store.save_history(MONDAY + timedelta(weeks=1), {HistoryMetric.Price: {"boltor": 110}})
+    # The snapshot of a week is replaced when it is saved again
+    store.save_history(MONDAY + timedelta(weeks=1), {HistoryMetric.Price: {"boltor": 120}})
+
+    history = store.load_history()
+    assert history.weeks == [MONDAY, MONDAY + timedelta(weeks=1)]
+    assert list(history.series("boltor", HistoryMetric.Price)) == [100, 120]
+    assert history.series("boltor", HistoryMetric.Disposition)[0] == 1.3
+    assert DataStore(str(tmp_path / "empty.db")).load_history().weeks == []
+
+
+def test_history_survives_a_schema_change(tmp_path):
+    path = str(tmp_path / "jericho.db")
+    store = DataStore(path)
+    store.save_history(MONDAY, {HistoryMetric.Price: {"boltor": 100}})
+    lookup = WeaponLookup()
+    lookup.add("Boltor", "/w/Boltor")
+    store.save(lookup)
+    # A store written by an older release
+    store.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION - 1}")
+    store.close()
+
+    store = DataStore(path)
+    assert store.schema_version() == SCHEMA_VERSION
+    # The generation is built again by the next refresh, the history is kept
+    assert store.load_lookup() is None
+    assert store.generation() == 0
+    assert list(store.load_history().series("boltor", HistoryMetric.Price)) == [100]
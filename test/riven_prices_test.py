@@ -0,0 +1,113 @@
+import httpx
+import json
+import pytest
+from sources import RivenPriceTable, WeaponLookup
+from utils.json_stream import JsonArrayDecoder
+from warframe import WarframeAPI
+
+ITEMS = [
+    {"itemType": "Rifle Riven Mod", "rerolled": False, "avg": 10.5, "stddev": 4.2, "min": 5, "max": 30, "pop": 14, "median": 9},
+    {"itemType": "Rifle Riven Mod", "compatibility": "BOLTOR", "rerolled": False, "avg": 40.1, "stddev": 10.3, "min": 20, "max": 80, "pop": 3, "median": 35},
+    {"itemType": "Rifle Riven Mod", "compatibility": "BOLTOR", "rerolled": True, "avg": 120.7, "stddev": 50.2, "min": 50, "max": 300, "pop": 7, "median": 110},
+    {"itemType": "Pistol Riven Mod", "compatibility": "LEX", "rerolled": False, "avg": 25, "stddev": 0, "min": 25, "max": 25, "pop": 1, "median": 25},
+    {"itemType": "Melee Riven Mod", "compatibility": "SKANA", "rerolled": True, "avg": 15, "stddev": 0, "min": 15, "max": 15, "pop": 1},
+]
+
+
+def test_decoder_handles_any_chunking():
+    text = json.dumps(ITEMS + [12345, "]", [1, 2]], indent=2)
+    for size in [1, 2, 5, 64, len(text)]:
+        decoder = JsonArrayDecoder()
+        items = []
+        for start in range(0, len(text), size):
+            items.extend(decoder.feed(text[start : start + size]))
+        decoder.close()
+        assert items == ITEMS + [12345, "]", [1, 2]]
+        # Only the unfinished item is kept between chunks
+        assert decoder.buffer == ""
+
+
+@pytest.mark.parametrize("text", ["{}", "[1 2]", "[1, 2] 3"])
+def test_decoder_rejects_invalid_arrays(text):
+    with pytest.raises(ValueError):
+        list(JsonArrayDecoder().feed(text))
+
+
+def test_decoder_rejects_truncated_arrays():
+    decoder = JsonArrayDecoder()
+    assert list(decoder.feed('[{"a": 1}, {"a"')) == [{"a": 1}]
+    with pytest.raises(ValueError):
+        decoder.close()
+
+
+def test_price_table():
+    table = RivenPriceTable()
+    for item in ITEMS:
+        table.add(item)
+    assert len(table) == 4
+    assert table.skipped == 1
+
+    rolled = table.get("Boltor", rerolled=True)
+    assert rolled.weapon == "BOLTOR"
+    assert rolled.item_type == "Rifle Riven Mod"
+    assert (rolled.avg, rolled.min, rolled.max, rolled.pop) == (120.7, 50, 300, 7)
+    assert table.get("boltor").median == 35
+    assert table.get("Skana", rerolled=True).median is None
+    assert table.get("Lex", rerolled=True) is None
+
+    # The item of a weapon that comes last sets its price, rolled or not
+    assert table.median("Boltor") == 110
+    assert table.median("Lex") == 25
+    assert table.median("Skana") is None
+    assert dict(table.medians()) == {"BOLTOR": 110, "LEX": 25, "SKANA": None}
+
+    table.add({**ITEMS[1], "median": 36})
+    assert len(table) == 4
+    assert table.get("Boltor").median == 36
+    assert table.median("Boltor") == 36
+
+
+def test_last_item_sets_the_median():
+    table = RivenPriceTable()
+    for item in [ITEMS[2], ITEMS[1], {**ITEMS[3], "median": None}]:
+        table.add(item)
+    assert table.median("Boltor") == 35
+    # A later item without a median clears the price, like it did before the table
+    assert table.median("Lex") is None
+    table.add(ITEMS[2])
+    assert table.median("Boltor") == 110
+
+
+class PriceTransport(httpx.MockTransport):
+    def __init__(self):
+        self.requests: list[httpx.Request] = []
+        super().__init__(self.handle)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.headers.get("If-None-Match") == '"week"':
+            return httpx.Response(304, request=request)
+        return httpx.Response(
+            200, json=ITEMS, headers={"ETag": '"week"'}, request=request
+        )
+
+
+@pytest.mark.asyncio
+async def test_median_prices_are_streamed():
+    transport = PriceTransport()
+    api = WarframeAPI()
+    api.client.client = httpx.AsyncClient(transport=transport)
+    api.client.wait_time = 0
+    lookup = WeaponLookup()
+    lookup.add("Boltor", "/w/Boltor")
+    lookup.add("Skana", "/w/Skana")
+
+    await api.get_median_prices(lookup)
+    assert lookup["Boltor"].median_plat_price == 110
+    assert lookup["Skana"].median_plat_price is None
+    table = api.riven_prices
+    assert table.etag == '"week"'
+
+    # Unchanged prices are not downloaded again
+    assert await api.get_riven_prices() is table
+    assert transport.requests[-1].headers["If-None-Match"] == '"week"'
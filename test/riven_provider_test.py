@@ -1,5 +1,12 @@
 import pytest
+import shutil
 from src.sources import WarframeWiki, RivenRecommendationProvider
+from test.fixtures import RIVEN_FIXTURES
+from model.rivens import RivenEffect
+from model.weapon import WeaponModType
+from sources import WeaponLookup
+from sources import riven_provider
+from sources.riven_provider import parse_sheet
 
 
 # Test RivenProvider initialization
@@ -31,3 +38,83 @@ async def test_refresh():
     assert len(weapon_lookup) > 0
     # Access the weapon name correctly using the key
     assert weapon_lookup["Acceltra"].riven_recommendations is not None
+
+
+def fixture_lookup() -> WeaponLookup:
+    lookup = WeaponLookup()
+    for weapon in ["Lex", "Kunai", "Lato", "Atomos", "Skana"]:
+        lookup.add(weapon, f"/w/{weapon}")
+    return lookup
+
+
+def test_parse_sheet_reports_errors():
+    parsed = parse_sheet("Secondary", RIVEN_FIXTURES / "Secondary.csv")
+    assert parsed.report.rows == 6
+    # The unknown `XYZ` stat and the row missing its columns
+    assert parsed.report.errors == 2
+    assert [r.weapon for r in parsed.recommendations] == [
+        "LEX",
+        "KUNAI",
+        "LATO",
+        "ATOMOS",
+        "UNKNOWN GUN",
+    ]
+
+    kunai = parsed.recommendations[1]
+    assert len(kunai.stats) == 2
+    assert kunai.stats[0].wanted == [
+        RivenEffect.ELEC,
+        RivenEffect.TOX,
+        RivenEffect.HEAT,
+        RivenEffect.COLD,
+    ]
+    assert kunai.comment == "Elemental stats are interchangeable"
+    assert parsed.recommendations[2].stats[0].wanted == [
+        RivenEffect.MS,
+        RivenEffect.DMG,
+        RivenEffect.FR,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_refresh_parses_sheets_off_the_loop(tmp_path):
+    for sheet_name in ["Primary", "Secondary", "Melee", "Archgun", "Robotic"]:
+        shutil.copy(RIVEN_FIXTURES / "Secondary.csv", tmp_path / f"{sheet_name}.csv")
+    provider = RivenRecommendationProvider(path=tmp_path)
+    lookup = fixture_lookup()
+
+    reports = await provider.refresh(lookup)
+    assert [report.sheet for report in reports] == list(provider.sheets)
+    assert all(report.unknown_weapons == 1 for report in reports)
+    assert lookup["Lex"].riven_recommendations.stats[0].best == [
+        RivenEffect.CC,
+        RivenEffect.CD,
+    ]
+    assert lookup["Lex"].mod_type == WeaponModType.Pistol
+
+
+@pytest.mark.asyncio
+async def test_unchanged_sheets_are_not_parsed_again(tmp_path, monkeypatch):
+    for sheet_name in ["Primary", "Secondary", "Melee", "Archgun", "Robotic"]:
+        shutil.copy(RIVEN_FIXTURES / "Secondary.csv", tmp_path / f"{sheet_name}.csv")
+    provider = riven_provider.RivenRecommendationProvider(path=tmp_path)
+    reports = await provider.refresh(fixture_lookup())
+    assert all(report.changed for report in reports)
+    lex = provider.parsed_sheets["Melee"].recommendations[0]
+
+    with open(tmp_path / "Melee.csv", "a", encoding="utf-8") as file:
+        file.write(",SKANA,CC/CD DMG,,\n")
+    parsed = []
+    monkeypatch.setattr(
+        riven_provider,
+        "parse_sheet",
+        lambda *args: parsed.append(args[0]) or parse_sheet(*args),
+    )
+    lookup = fixture_lookup()
+    reports = await provider.refresh(lookup)
+    assert parsed == ["Melee"]
+    assert [report.sheet for report in reports if report.changed] == ["Melee"]
+    assert provider.parsed_sheets["Melee"].recommendations[0] is not lex
+    # Reused sheets still fill the new lookup
+    assert lookup["Kunai"].riven_recommendations is not None
+    assert lookup["Skana"].riven_recommendations.stats[0].wanted == [RivenEffect.DMG]
@@ -0,0 +1,52 @@
+import pytest
+from model.rivens import RIVEN_EFFECT_TOKENS, RivenEffect, parse_riven_effects
+
+
+@pytest.mark.parametrize(
+    "token, effect",
+    [
+        ("cc", RivenEffect.CC),
+        (" Critical Chance ", RivenEffect.CC),
+        ("ATTACK SPEED", RivenEffect.FR),
+        ("AS", RivenEffect.FR),
+        ("Melee Damage", RivenEffect.DMG),
+        ("Recoil", RivenEffect.REC),
+    ],
+)
+def test_try_parse(token: str, effect: RivenEffect):
+    assert RivenEffect.try_parse(token) == effect
+
+
+def test_try_parse_rejects_unknown_and_expanding_tokens():
+    with pytest.raises(ValueError):
+        RivenEffect.try_parse("XYZ")
+    with pytest.raises(ValueError):
+        RivenEffect.try_parse("ELEMENT")
+
+
+def test_every_effect_has_its_tokens():
+    for effect in RivenEffect:
+        assert RIVEN_EFFECT_TOKENS[effect.name] == (effect,)
+        assert RIVEN_EFFECT_TOKENS[effect.value.upper()] == (effect,)
+
+
+def test_parse_riven_effects():
+    effects, unknown = parse_riven_effects("CC/-zoom/ELEMENT/XYZ")
+    assert effects == (
+        RivenEffect.CC,
+        RivenEffect.ZOOM,
+        RivenEffect.ELEC,
+        RivenEffect.TOX,
+        RivenEffect.HEAT,
+        RivenEffect.COLD,
+    )
+    assert unknown == ("XYZ",)
+    # Repeated stat strings are served from the cache
+    assert parse_riven_effects("CC/-zoom/ELEMENT/XYZ")[0] is effects
+
+
+def test_parse_riven_effects_strips_spaced_negatives():
+    assert parse_riven_effects("- CC/ -  zoom") == (
+        (RivenEffect.CC, RivenEffect.ZOOM),
+        (),
+    )
@@ -0,0 +1,90 @@
+import pytest
+import random
+from scheduler import RefreshScheduler, SourceStatus
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_next_delay_backs_off_up_to_the_interval():
+    scheduler = RefreshScheduler(jitter=0, retry_delay=60)
+    status = SourceStatus(name="prices", interval=600, staleness_budget=3600)
+    assert scheduler.next_delay(status) == 600
+    delays = []
+    for failures in range(1, 6):
+        status.failures = failures
+        delays.append(scheduler.next_delay(status))
+    assert delays == [60, 120, 240, 480, 600]
+
+
+def test_next_delay_is_jittered():
+    scheduler = RefreshScheduler(jitter=0.1, rng=random.Random(1))
+    status = SourceStatus(name="prices", interval=1000, staleness_budget=3600)
+    delays = {scheduler.next_delay(status) for _ in range(100)}
+    assert len(delays) > 1
+    assert all(900 <= delay <= 1100 for delay in delays)
+
+
+def test_is_stale():
+    status = SourceStatus(name="rivens", interval=60, staleness_budget=100)
+    assert status.is_stale(0)
+    status.last_success = 1000
+    assert not status.is_stale(1100)
+    assert status.is_stale(1101)
+
+
+@pytest.mark.asyncio
+async def test_run_now_records_the_outcome():
+    clock = FakeClock()
+    scheduler = RefreshScheduler(jitter=0, retry_delay=10, clock=clock)
+    outcomes = [RuntimeError("sheet unavailable"), RuntimeError("still down"), None]
+
+    async def refresh():
+        outcome = outcomes.pop(0)
+        if outcome is not None:
+            raise outcome
+
+    scheduler.add("rivens", refresh, interval=600, staleness_budget=3600)
+    status = scheduler.sources["rivens"].status
+
+    assert not await scheduler.run_now("rivens")
+    assert status.failures == 1
+    assert status.last_error == "sheet unavailable"
+    assert status.last_success is None
+    assert status.next_run == clock.now + 10
+
+    clock.now += 10
+    assert not await scheduler.run_now("rivens")
+    assert status.failures == 2
+    assert status.next_run == clock.now + 20
+
+    clock.now += 20
+    assert await scheduler.run_now("rivens")
+    assert status.failures == 0
+    assert status.last_error is None
+    assert status.last_success == clock.now
+    assert status.next_run == clock.now + 600
+    assert not status.running
+
+
+def test_mark_fresh():
+    clock = FakeClock()
+    scheduler = RefreshScheduler(jitter=0, clock=clock)
+
+    async def refresh():
+        pass
+
+    scheduler.add("messages", refresh, interval=600, staleness_budget=3600)
+    status = scheduler.sources["messages"].status
+    status.failures = 3
+    scheduler.mark_fresh("messages", duration=1.5)
+    assert status.failures == 0
+    assert status.last_success == clock.now
+    assert status.last_duration == 1.5
+    assert status.next_run == clock.now + 600
+    assert not status.is_stale(clock.now)
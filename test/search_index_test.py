@@ -0,0 +1,200 @@
+import pytest
+from sources import WeaponLookup
+from sources.search_index import (
+    QueryCache,
+    TrigramIndex,
+    TypoIndex,
+    damerau_levenshtein,
+    tokenize,
+    trigrams,
+)
+from sources.weapon_lookup import RivenRecommendations
+
+WEAPONS = [
+    "Boltor",
+    "Boltor Prime",
+    "Telos Boltor",
+    "Braton",
+    "Braton Prime",
+    "Kuva Bramma",
+    "Bramma",
+    "Tigris",
+    "Sancti Tigris",
+    "Soma",
+    "Soma Prime",
+    "Akstiletto",
+    "Lex",
+]
+
+
+def build_lookup() -> WeaponLookup:
+    lookup = WeaponLookup()
+    for weapon in WEAPONS:
+        lookup.add(weapon, "/w/" + weapon.replace(" ", "_"))
+    return lookup
+
+
+def test_trigrams_are_padded():
+    assert trigrams("Lex") == {"  l", " le", "lex", "ex "}
+
+
+def test_index_shortlists_candidates():
+    index = TrigramIndex(shortlist_size=2)
+    index.build((name, name) for name in WEAPONS)
+    assert len(index) == len(WEAPONS)
+    assert index.search("Tigris", n=5) == ["Tigris", "Sancti Tigris"]
+    assert index.search("xyz") == []
+
+
+def test_fuzzy_search_ranking():
+    lookup = build_lookup()
+    assert lookup.fuzzy_search("bolt")[0].display_name == "Boltor"
+    assert lookup.fuzzy_search("tigirs")[0].display_name == "Tigris"
+    assert lookup.fuzzy_search("kuva bra")[0].display_name == "Kuva Bramma"
+    assert lookup.fuzzy_search("akst")[0].display_name == "Akstiletto"
+
+
+def test_fuzzy_search_filters_rivens():
+    lookup = build_lookup()
+    lookup.set_riven_recommendations(
+        "Soma Prime",
+        RivenRecommendations(weapon="SOMA PRIME", comment=None, stats=[]),
+    )
+    matches = lookup.fuzzy_search("soma", can_have_rivens=True)
+    assert [m.display_name for m in matches] == ["Soma Prime"]
+
+
+def test_fuzzy_search_sees_added_weapons():
+    lookup = build_lookup()
+    assert lookup.fuzzy_search("Gorgon", cutoff=0.8) == []
+    lookup.add("Gorgon", "/w/Gorgon")
+    assert lookup.fuzzy_search("Gorgon", cutoff=0.8)[0].display_name == "Gorgon"
+
+
+def test_tokenize():
+    assert tokenize("MK1-Braton") == ["mk1", "braton"]
+    assert tokenize("Kuva  Bramma") == ["kuva", "bramma"]
+
+
+def test_autocomplete_token_prefixes():
+    lookup = build_lookup()
+    names = lambda query: [m.display_name for m in lookup.autocomplete(query)]
+    assert names("kuva b") == ["Kuva Bramma"]
+    assert names("bram") == ["Bramma", "Kuva Bramma"]
+    assert names("bolt") == ["Boltor", "Boltor Prime", "Telos Boltor"]
+    assert names("prime b") == ["Boltor Prime", "Braton Prime"]
+    assert len(lookup.autocomplete("", n=5)) == 5
+
+
+def test_autocomplete_ranks_by_popularity():
+    lookup = build_lookup()
+    lookup.record_lookup("Boltor Prime")
+    lookup.record_lookup("Boltor Prime")
+    lookup.record_lookup("Telos Boltor")
+    names = [m.display_name for m in lookup.autocomplete("bolt")]
+    assert names == ["Boltor Prime", "Telos Boltor", "Boltor"]
+    assert lookup.autocomplete("", n=1)[0].display_name == "Boltor Prime"
+
+
+def test_autocomplete_falls_back_to_fuzzy_search():
+    lookup = build_lookup()
+    assert lookup.autocomplete("tigirs")[0].display_name == "Tigris"
+
+
+def test_autocomplete_filters_rivens():
+    lookup = build_lookup()
+    lookup.set_riven_recommendations(
+        "Telos Boltor",
+        RivenRecommendations(weapon="TELOS BOLTOR", comment=None, stats=[]),
+    )
+    matches = lookup.autocomplete("bolt", can_have_rivens=True)
+    assert [m.display_name for m in matches] == ["Telos Boltor"]
+
+
+def test_query_cache_eviction_and_versions():
+    cache = QueryCache(max_entries=2)
+    cache.put("a", 1, ["a"])
+    cache.put("b", 1, ["b"])
+    assert cache.get("a", 1) == ["a"]
+    cache.put("c", 1, ["c"])
+    assert cache.get("b", 1) is None
+    assert cache.get("c", 1) == ["c"]
+
+    assert cache.get("a", 2) is None
+    assert len(cache) == 0
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["invalidations"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+
+
+def test_autocomplete_is_cached_per_generation():
+    lookup = build_lookup()
+    first = lookup.autocomplete("Bolt")
+    assert lookup.autocomplete(" bolt ") == first
+    assert lookup.stats()["query_cache"]["hits"] == 1
+
+    lookup.add("Bolto", "/w/Bolto")
+    assert lookup.autocomplete("bolt")[0].display_name == "Bolto"
+
+    # Lookups change the ranking only once it is refreshed, until then results stay cached
+    lookup.record_lookup("Telos Boltor")
+    assert lookup.autocomplete("bolt")[0].display_name == "Bolto"
+    assert lookup.stats()["query_cache"]["hits"] == 2
+    lookup.rerank()
+    assert lookup.autocomplete("bolt")[0].display_name == "Telos Boltor"
+    assert lookup.stats()["query_cache"]["hits"] == 2
+
+
+def test_ranking_is_refreshed_after_the_interval(monkeypatch):
+    lookup = build_lookup()
+    lookup.rerank_interval = 60
+    now = [1000.0]
+    monkeypatch.setattr("sources.weapon_lookup.time.monotonic", lambda: now[0])
+    assert lookup.autocomplete("bolt")[0].display_name == "Boltor"
+    lookup.record_lookup("Telos Boltor")
+    now[0] += 59
+    assert lookup.autocomplete("bolt")[0].display_name == "Boltor"
+    now[0] += 1
+    assert lookup.autocomplete("bolt")[0].display_name == "Telos Boltor"
+
+
+def test_damerau_levenshtein():
+    assert damerau_levenshtein("bramma", "bramma") == 0
+    assert damerau_levenshtein("brama", "bramma") == 1
+    assert damerau_levenshtein("barmma", "bramma") == 1
+    assert damerau_levenshtein("ignus wrath", "ignis wraith") == 2
+    assert damerau_levenshtein("", "lex") == 3
+
+
+def test_typo_index_search():
+    index = TypoIndex()
+    index.build((name, name) for name in WEAPONS)
+    assert len(index) == len(WEAPONS)
+    assert index.search("Brama", max_distance=1) == [(1, "Bramma")]
+    assert index.search("sma", max_distance=1) == [(1, "Soma")]
+    assert index.search("Boltro", max_distance=2) == [(1, "Boltor")]
+    assert index.search("xyz", max_distance=1) == []
+
+
+@pytest.mark.parametrize("query", ["bolt", "brama", "kuva brama", "tigirs", "lexx"])
+def test_typo_index_matches_a_full_scan(query: str):
+    index = TypoIndex()
+    index.build((name, name) for name in WEAPONS)
+    expected = sorted(
+        (distance, name)
+        for name in WEAPONS
+        if (distance := damerau_levenshtein(query, TypoIndex.normalize(name))) <= 2
+    )
+    assert index.search(query, max_distance=2) == expected
+
+
+def test_typo_search():
+    lookup = build_lookup()
+    lookup.add("Ignis Wraith", "/w/Ignis_Wraith")
+    assert lookup.typo_search("ignus wrath")[0].display_name == "Ignis Wraith"
+    assert [m.display_name for m in lookup.typo_search("brama", max_distance=1)] == [
+        "Bramma"
+    ]
+    assert lookup.typo_search("kuva brama", max_distance=0) == []
@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from test.fixtures import offline_wiki
+from sources import WarframeWiki, WeaponLookup, WeaponCache
+from sources.weapon_lookup import RivenRecommendations
+
+
+def riven_lookup(*weapons: str) -> WeaponLookup:
+    lookup = WeaponLookup()
+    for weapon in weapons:
+        lookup.add(weapon, "/w/" + weapon.replace(" ", "_"))
+        lookup.set_riven_recommendations(
+            weapon,
+            RivenRecommendations(weapon=weapon.upper(), comment=None, stats=[]),
+        )
+    return lookup
+
+
+@pytest.mark.asyncio
+async def test_prefetch_warms_cache(wiki_transport):
+    lookup = riven_lookup("Boltor", "Sweeper")
+    lookup.add("Tombfinger", "/w/Tombfinger")  # no rivens, must not be fetched
+    wiki = offline_wiki(WarframeWiki(lookup, cache=WeaponCache(path=None)), wiki_transport)
+
+    progress = []
+    report = await wiki.prefetch(concurrency=2, progress=lambda d, t: progress.append(d))
+    assert report.total == 2
+    assert report.fetched == 2
+    assert report.failed == {}
+    assert progress[-1] == 2
+
+    requests = len(wiki_transport.requests)
+    assert (await wiki.weapon("Sweeper")).name == "Sweeper"
+    assert len(wiki_transport.requests) == requests
+
+
+@pytest.mark.asyncio
+async def test_prefetch_reports_partial_failures(wiki_transport):
+    lookup = riven_lookup("Boltor", "Missing Weapon")
+    wiki = offline_wiki(WarframeWiki(lookup, cache=WeaponCache(path=None)), wiki_transport)
+
+    report = await wiki.prefetch()
+    assert report.fetched == 1
+    assert list(report.failed) == ["missing_weapon"]
+
+
+@pytest.mark.asyncio
+async def test_prefetch_requires_cache(wiki_transport):
+    wiki = offline_wiki(WarframeWiki(riven_lookup("Boltor")), wiki_transport)
+    report = await wiki.prefetch()
+    assert report.total == 0
+    assert wiki_transport.requests == []
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_request(wiki_transport):
+    wiki = offline_wiki(WarframeWiki(riven_lookup("Boltor")), wiki_transport)
+    weapons = await asyncio.gather(*[wiki.weapon("Boltor") for _ in range(4)])
+    assert all(weapon == weapons[0] for weapon in weapons)
+    assert len(wiki_transport.requests) == 1
+    assert wiki.stats()["single_flight"]["dedup_rate"] == 0.75
+
+
+def test_mark_riven_capable():
+    lookup = riven_lookup("Boltor")
+    lookup.add("Lex", "/w/Lex")
+    recommendations = lookup["Boltor"].riven_recommendations
+    wiki = WarframeWiki(lookup)
+
+    wiki.mark_riven_capable("Lex")
+    wiki.mark_riven_capable("Boltor")
+    wiki.mark_riven_capable("Missing Weapon")
+    assert lookup["Lex"].can_have_rivens
+    assert "lex" in lookup.riven_capable
+    # Recommendations from the sheets are kept
+    assert lookup["Boltor"].riven_recommendations == recommendations
@@ -0,0 +1,76 @@
+import pytest
+from test.fixtures import offline_wiki
+from sources import WarframeWiki, WeaponLookup, WeaponCache
+from model.weapon import Weapon, RivenDisposition
+
+
+def make_weapon(name: str) -> Weapon:
+    return Weapon(
+        name=name,
+        url=f"https://wiki.warframe.com/w/{name}",
+        riven_disposition=RivenDisposition(disposition=1.05, symbol="●●●○○"),
+        mr=2,
+    )
+
+
+def make_wiki(transport, cache: WeaponCache) -> WarframeWiki:
+    lookup = WeaponLookup()
+    lookup.add("Boltor", "/w/Boltor")
+    return offline_wiki(WarframeWiki(lookup, cache=cache), transport)
+
+
+def test_counts_hits_and_misses():
+    cache = WeaponCache(path=None)
+    assert cache.get("boltor") is None
+    cache.put("boltor", make_weapon("Boltor"))
+    assert cache.get("boltor").name == "Boltor"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_expired_entries_miss():
+    cache = WeaponCache(path=None, ttl=0)
+    cache.put("boltor", make_weapon("Boltor"))
+    assert cache.get("boltor") is None
+    assert cache.peek("boltor") is not None
+
+
+def test_evicts_least_recently_used():
+    cache = WeaponCache(path=None, max_entries=2)
+    cache.put("boltor", make_weapon("Boltor"))
+    cache.put("braton", make_weapon("Braton"))
+    cache.get("boltor")
+    cache.put("burston", make_weapon("Burston"))
+    assert "braton" not in cache
+    assert "boltor" in cache
+    assert cache.evictions == 1
+
+
+def test_persists_entries(tmp_path):
+    cache = WeaponCache(path=tmp_path)
+    cache.put("boltor", make_weapon("Boltor"), etag='"abc"')
+
+    reloaded = WeaponCache(path=tmp_path)
+    assert reloaded.get("boltor").name == "Boltor"
+    assert reloaded.peek("boltor").etag == '"abc"'
+
+
+@pytest.mark.asyncio
+async def test_warm_lookup_skips_network(wiki_transport):
+    wiki = make_wiki(wiki_transport, WeaponCache(path=None))
+    first = await wiki.weapon("Boltor")
+    second = await wiki.weapon("Boltor")
+    assert first == second
+    assert len(wiki_transport.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_revalidated(wiki_transport):
+    cache = WeaponCache(path=None, ttl=0)
+    wiki = make_wiki(wiki_transport, cache)
+    await wiki.weapon("Boltor")
+    weapon = await wiki.weapon("Boltor")
+    assert weapon.name == "Boltor"
+    assert wiki_transport.requests[-1].headers["If-None-Match"] == '"fixture"'
+    assert cache.revalidations == 1
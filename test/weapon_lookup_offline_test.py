@@ -0,0 +1,139 @@
+from model.weapon import WeaponModType
+from sources import WeaponLookup, save_snapshot, load_snapshot
+from sources.weapon_lookup import RivenRecommendations, WeaponLookupEntry
+
+
+def recommendations(weapon: str) -> RivenRecommendations:
+    return RivenRecommendations(weapon=weapon.upper(), comment=None, stats=[])
+
+
+def build_lookup() -> WeaponLookup:
+    lookup = WeaponLookup()
+    for weapon in ["Boltor", "Boltor Prime", "Telos Boltor", "Lex", "Lex Prime"]:
+        lookup.add(weapon, "/w/" + weapon.replace(" ", "_"))
+    return lookup
+
+
+def names(entries) -> list[str]:
+    return sorted(entry.normalized_name for entry in entries)
+
+
+def test_riven_index_follows_recommendations():
+    lookup = build_lookup()
+    assert lookup.riven_capable_weapons() == []
+
+    lookup.set_riven_recommendations("Boltor", recommendations("Boltor"))
+    assert names(lookup.riven_capable_weapons()) == ["boltor"]
+
+    lookup.rebuild_weapon_relations()
+    assert names(lookup.riven_capable_weapons()) == [
+        "boltor",
+        "boltor_prime",
+        "telos_boltor",
+    ]
+
+    lookup.set_riven_recommendations("Telos Boltor", None)
+    assert "telos_boltor" not in lookup.riven_capable
+    assert not lookup["Telos Boltor"].can_have_rivens
+
+
+def test_mod_type_index():
+    lookup = build_lookup()
+    lookup.set_mod_type("Lex", WeaponModType.Pistol)
+    lookup.set_mod_type("Boltor", WeaponModType.Rifle)
+    assert names(lookup.weapons_by_mod_type(WeaponModType.Pistol)) == ["lex"]
+
+    lookup.set_mod_type("Lex", WeaponModType.Melee)
+    assert lookup.weapons_by_mod_type(WeaponModType.Pistol) == []
+    assert names(lookup.weapons_by_mod_type(WeaponModType.Melee)) == ["lex"]
+
+
+def test_family_index():
+    lookup = build_lookup()
+    assert names(lookup.weapon_family("Boltor")) == ["boltor"]
+
+    lookup.rebuild_weapon_relations()
+    family = ["boltor", "boltor_prime", "telos_boltor"]
+    assert names(lookup.weapon_family("Boltor")) == family
+    assert names(lookup.weapon_family("Telos Boltor")) == family
+    assert names(lookup.weapon_family("Lex Prime")) == ["lex", "lex_prime"]
+
+
+def test_snapshot_restores_indexes(tmp_path):
+    lookup = build_lookup()
+    lookup.set_riven_recommendations("Lex", recommendations("Lex"))
+    lookup.set_mod_type("Lex", WeaponModType.Pistol)
+    lookup.rebuild_weapon_relations()
+    save_snapshot(lookup, tmp_path / "snapshot.json")
+
+    loaded = load_snapshot(tmp_path / "snapshot.json")
+    assert loaded.riven_capable == lookup.riven_capable
+    assert loaded.by_mod_type == lookup.by_mod_type
+    assert loaded.families == lookup.families
+
+
+def test_relations_are_idempotent():
+    lookup = build_lookup()
+    lookup.rebuild_weapon_relations()
+    lookup.rebuild_weapon_relations()
+    assert lookup["Boltor"].weapon_variants == ["boltor_prime", "telos_boltor"]
+    assert lookup["Lex"].weapon_variants == ["lex_prime"]
+
+
+def test_relations_strip_several_tokens():
+    lookup = WeaponLookup()
+    for weapon in [
+        "Dual Cleavers",
+        "Prisma Dual Cleavers",
+        "Dex Dual Cleavers Prime",
+        "Dual Cleavers Prime",
+        "MK1-Braton",
+        "Braton",
+    ]:
+        lookup.add(weapon, "/w/" + weapon.replace(" ", "_"))
+    lookup.set_riven_recommendations("Dual Cleavers", recommendations("Dual Cleavers"))
+    lookup.rebuild_weapon_relations()
+
+    assert lookup["Dual Cleavers"].weapon_variants == [
+        "dex_dual_cleavers_prime",
+        "dual_cleavers_prime",
+        "prisma_dual_cleavers",
+    ]
+    # Linked to `dual_cleavers_prime` first, then to its base
+    assert lookup["Dex Dual Cleavers Prime"].base_weapon == "dual_cleavers"
+    assert lookup["Dex Dual Cleavers Prime"].can_have_rivens
+    assert lookup["MK1-Braton"].base_weapon == "braton"
+    assert lookup["Dual Cleavers"].base_weapon is None
+    assert [w.display_name for w in lookup.weapon_family("Prisma Dual Cleavers")] == [
+        "Dual Cleavers",
+        "Dual Cleavers Prime",
+        "Prisma Dual Cleavers",
+        "Dex Dual Cleavers Prime",
+    ]
+
+
+def test_records_share_recommendations():
+    lookup = build_lookup()
+    lookup.set_riven_recommendations("Boltor", recommendations("Boltor"))
+    lookup.set_riven_recommendations("Telos Boltor", recommendations("Telos Boltor"))
+    lookup.rebuild_weapon_relations()
+
+    family = ["boltor", "boltor_prime", "telos_boltor"]
+    records = [lookup.weapon_lookup[name] for name in family]
+    assert len({record.recommendations_id for record in records}) == 1
+    # The replaced recommendations of Telos Boltor are not kept around
+    assert len(lookup.recommendations) == 1
+    assert lookup["Telos Boltor"].riven_recommendations.weapon == "BOLTOR"
+
+
+def test_entries_are_built_at_the_boundary():
+    lookup = build_lookup()
+    lookup.set_median_plat_price("Lex", 15)
+    entry = lookup["Lex"]
+    assert isinstance(entry, WeaponLookupEntry)
+    assert entry.median_plat_price == 15
+
+    # Entries are copies, changes go through the setters
+    entry.median_plat_price = 20
+    assert lookup["Lex"].median_plat_price == 15
+    assert len(list(lookup.entries())) == len(lookup)
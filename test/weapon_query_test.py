@@ -0,0 +1,135 @@
+import random
+import pytest
+from model.weapon import RivenDisposition, Weapon, WeaponModType
+from sources import WeaponAttribute, WeaponLookup, WeaponQuery, WeaponQueryEngine
+
+
+def weapon(name: str, disposition: float, mr: int, mod_type: WeaponModType) -> Weapon:
+    return Weapon(
+        name=name,
+        url="/w/" + name,
+        riven_disposition=RivenDisposition(disposition=disposition),
+        mr=mr,
+        mod_type=mod_type,
+    )
+
+
+def build_engine() -> WeaponQueryEngine:
+    lookup = WeaponLookup()
+    weapons = {}
+    catalogue = [
+        ("Lex", 1.35, 3, WeaponModType.Pistol, 40),
+        ("Lex Prime", 1.2, 8, WeaponModType.Pistol, None),
+        ("Kunai", 1.45, 0, WeaponModType.Pistol, 15),
+        ("Lato", 1.5, 0, WeaponModType.Pistol, 200),
+        ("Boltor", 1.3, 2, WeaponModType.Rifle, 30),
+        ("Skana", 1.4, 0, WeaponModType.Melee, None),
+    ]
+    for name, disposition, mr, mod_type, price in catalogue:
+        lookup.add(name, "/w/" + name.replace(" ", "_"))
+        weapons[lookup[name].normalized_name] = weapon(name, disposition, mr, mod_type)
+        if price is not None:
+            lookup.set_median_plat_price(name, price)
+    # Known to the lookup, but without any wiki data
+    lookup.add("Gaze", "/w/Gaze")
+    lookup.rebuild_weapon_relations()
+    return WeaponQueryEngine(lookup, weapons)
+
+
+def names(results) -> list[str]:
+    return [result.weapon.display_name for result in results]
+
+
+def test_filters_and_orders():
+    engine = build_engine()
+    results = engine.search(
+        WeaponQuery(mod_type=WeaponModType.Pistol, min_disposition=1.3, max_price=100)
+    )
+    assert names(results) == ["Kunai", "Lex"]
+    assert results[1].median_plat_price == 40
+    assert results[1].mr == 3
+
+
+def test_variants_use_the_base_price():
+    engine = build_engine()
+    results = engine.search(WeaponQuery(min_mr=5))
+    assert names(results) == ["Lex Prime"]
+    assert results[0].median_plat_price == 40
+
+
+def test_top_k_and_missing_values():
+    engine = build_engine()
+    query = WeaponQuery(order_by=WeaponAttribute.Price, descending=False, limit=3)
+    assert names(engine.search(query)) == ["Kunai", "Boltor", "Lex"]
+
+    # Weapons without wiki data have no disposition to order by
+    assert "Gaze" not in names(engine.search(WeaponQuery(limit=100)))
+
+
+def test_placeholder_dispositions_are_not_indexed():
+    lookup = WeaponLookup()
+    lookup.add("Gaze", "/w/Gaze")
+    placeholder = weapon("Gaze", 0.5, 0, WeaponModType.Pistol)
+    placeholder.riven_disposition.known = False
+    engine = WeaponQueryEngine(lookup, {"gaze": placeholder})
+    assert engine.rows["gaze"] == {WeaponAttribute.MasteryRank: 0}
+    assert engine.search(WeaponQuery(max_disposition=1)) == []
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_a_full_scan(seed: int):
+    rng = random.Random(seed)
+    lookup = WeaponLookup()
+    weapons = {}
+    mod_types = [WeaponModType.Pistol, WeaponModType.Rifle, WeaponModType.Melee]
+    for i in range(300):
+        name = f"Weapon {i}"
+        lookup.add(name, f"/w/Weapon_{i}")
+        key = lookup[name].normalized_name
+        if rng.random() < 0.8:
+            weapons[key] = weapon(
+                name, round(rng.uniform(0.5, 1.55), 2), rng.randint(0, 16), rng.choice(mod_types)
+            )
+        if rng.random() < 0.6:
+            lookup.set_median_plat_price(name, rng.randint(10, 500))
+    engine = WeaponQueryEngine(lookup, weapons)
+
+    for _ in range(50):
+        query = WeaponQuery(
+            mod_type=rng.choice([None, *mod_types]),
+            min_disposition=rng.choice([None, 0.8, 1.3]),
+            max_price=rng.choice([None, 50, 200]),
+            min_mr=rng.choice([None, 4, 12]),
+            order_by=rng.choice(list(WeaponAttribute)),
+            descending=rng.random() < 0.5,
+            limit=rng.choice([1, 10, 500]),
+        )
+        rows = []
+        for key in lookup.weapon_lookup:
+            wiki = weapons.get(key)
+            price = lookup[key].median_plat_price
+            values = {
+                WeaponAttribute.Disposition: wiki.riven_disposition.disposition if wiki else None,
+                WeaponAttribute.MasteryRank: wiki.mr if wiki else None,
+                WeaponAttribute.Price: price,
+            }
+            if values[query.order_by] is None:
+                continue
+            if query.mod_type is not None and (not wiki or wiki.mod_type != query.mod_type):
+                continue
+            if query.min_disposition is not None and (
+                values[WeaponAttribute.Disposition] is None
+                or values[WeaponAttribute.Disposition] < query.min_disposition
+            ):
+                continue
+            if query.max_price is not None and (price is None or price > query.max_price):
+                continue
+            if query.min_mr is not None and (
+                values[WeaponAttribute.MasteryRank] is None
+                or values[WeaponAttribute.MasteryRank] < query.min_mr
+            ):
+                continue
+            rows.append((values[query.order_by], key))
+        rows.sort(reverse=query.descending)
+        expected = [key for _, key in rows[: query.limit]]
+        assert [r.weapon.normalized_name for r in engine.search(query)] == expected
@@ -0,0 +1,102 @@
+import pytest
+from bs4.builder import builder_registry
+from test.fixtures import WIKI_FIXTURES
+from sources.wiki_parser import (
+    SoupWikiParser,
+    StreamingWikiParser,
+    WikiParser,
+    get_wiki_parser,
+)
+
+BASE_URL = "https://wiki.warframe.com"
+PAGES = ["Boltor", "Ack_&_Brunt", "Tombfinger", "Sweeper", "Cryophon_MK_III"]
+BACKENDS = [
+    StreamingWikiParser(),
+    pytest.param(
+        SoupWikiParser("lxml"),
+        marks=pytest.mark.skipif(
+            builder_registry.lookup("lxml") is None, reason="lxml is not installed"
+        ),
+    ),
+]
+
+EDGE_CASES = {
+    "value_before_label": """
+        <h1 id="firstHeading"><span>Edge <b>Case</b></span></h1>
+        <div><div class="row"><div class="value">Primary</div><div><a>Slot</a></div></div></div>
+    """,
+    "hidden_text": """
+        <h1 id="firstHeading"><span>Edge</span></h1>
+        <div><div><div><a>Type</a></div><div class="value">Rifle<script>var x;</script><!-- c --></div></div></div>
+    """,
+    "label_with_nested_text": """
+        <h1 id="firstHeading"><span>Edge</span></h1>
+        <div><div><div><a>Type <i>x</i></a></div><div class="value">Wrong</div></div></div>
+        <div><div><div><a>Type</a></div><div class="value">Right</div></div></div>
+    """,
+    "unclosed_elements": """
+        <h1 id="firstHeading"><span>Edge</h1>
+        <span class="main-image"><img alt="x"></span>
+        <div><div><div><a>Slot</a></div><div class="value">Melee<span> &amp; more</div></div></div>
+    """,
+}
+
+
+def page(name: str) -> str:
+    return (WIKI_FIXTURES / f"{name}.html").read_text("utf-8")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("name", PAGES)
+def test_backends_match_html_parser(backend, name: str):
+    url = f"{BASE_URL}/w/{name}"
+    expected = SoupWikiParser().parse_weapon_page(page(name), url, BASE_URL)
+    assert backend.parse_weapon_page(page(name), url, BASE_URL) == expected
+
+
+@pytest.mark.parametrize("name", EDGE_CASES)
+def test_streaming_matches_edge_cases(name: str):
+    html = EDGE_CASES[name]
+    expected = SoupWikiParser().parse_weapon_page(html, BASE_URL, BASE_URL)
+    assert StreamingWikiParser().parse_weapon_page(html, BASE_URL, BASE_URL) == expected
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_weapon_lists_match(backend):
+    expected = SoupWikiParser().parse_weapon_list(page("Weapons"))
+    assert len(expected) == 12
+    assert backend.parse_weapon_list(page("Weapons")) == expected
+
+
+def test_parses_fixture_values():
+    weapon = StreamingWikiParser().parse_weapon_page(page("Boltor"), BASE_URL, BASE_URL)
+    assert weapon.name == "Boltor"
+    assert weapon.riven_disposition.disposition == 1.05
+    assert weapon.mr == 2
+    assert weapon.slot == "Primary"
+
+
+def test_falls_back_without_heading():
+    with pytest.raises(AttributeError):
+        StreamingWikiParser().parse_weapon_page("<p>Not a weapon</p>", BASE_URL, BASE_URL)
+
+
+def test_unknown_backend_falls_back():
+    assert get_wiki_parser("streaming").name == "streaming"
+    assert get_wiki_parser("does-not-exist").name == "html.parser"
+
+
+def test_incomplete_parsers_fail_on_construction():
+    class PageOnlyParser(WikiParser):
+        def parse_weapon_page(self, html: str, url: str, base_url: str):
+            return None
+
+    with pytest.raises(TypeError):
+        PageOnlyParser()
+
+
+def test_missing_disposition_is_a_placeholder():
+    parser = StreamingWikiParser()
+    edge_case = parser.parse_weapon_page(EDGE_CASES["value_before_label"], BASE_URL, BASE_URL)
+    assert not edge_case.riven_disposition.known
+    assert parser.parse_weapon_page(page("Boltor"), BASE_URL, BASE_URL).riven_disposition.known